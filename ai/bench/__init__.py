@@ -0,0 +1,12 @@
+"""
+Benchmark and load-test suite for the API (run from ai/).
+
+    python -m bench.gbif_stub   local GBIF API stand-in (record/replay, injected latency)
+    python -m bench.images      synthetic JPEG/PNG test images up to 48 MP
+    python -m bench.micro       risk scoring, decode, pixel analysis, model forward
+    python -m bench.load        async per-endpoint load driver (throughput, p50/p95/p99)
+    python -m bench.run         all of the above against a freshly started server
+    python -m bench.compare     diff two result files, exit 1 on regressions
+
+Results are JSON files under bench/results/ tagged with the git commit.
+"""
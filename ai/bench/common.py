@@ -0,0 +1,70 @@
+"""Shared helpers: latency summaries, run environment and JSON result files."""
+import json
+import os
+import platform
+import subprocess
+import time
+from importlib import metadata
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def summarize(samples_ms: Iterable[float]) -> Dict[str, Optional[float]]:
+    """count / mean / min / max and p50, p95, p99 of latencies in ms"""
+    values = np.asarray(list(samples_ms), dtype=np.float64)
+    if values.size == 0:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "mean_ms": round(float(values.mean()), 3),
+        "min_ms": round(float(values.min()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def _git(*args) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *args], cwd=BENCH_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _version(package: str) -> Optional[str]:
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def environment() -> dict:
+    """What a result was measured on, so runs can be compared like for like"""
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": {name: _version(name) for name in ("numpy", "Pillow", "torch", "transformers", "fastapi")},
+    }
+
+
+def write_results(kind: str, payload: dict, out: Optional[str] = None) -> str:
+    """Write {"environment", **payload} to out (default bench/results/<kind>-<commit>-<time>.json)"""
+    env = environment()
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(RESULTS_DIR, f"{kind}-{env['commit'] or 'nogit'}-{stamp}.json")
+    with open(out, "w") as f:
+        json.dump({"kind": kind, "environment": env, **payload}, f, indent=2)
+    return out
@@ -0,0 +1,67 @@
+"""
+Compare two benchmark result files (bench.micro / bench.load / bench.run).
+
+Lists every metric present in both, with the relative change, and exits 1
+when any latency grows or throughput drops by more than --threshold percent.
+
+    python -m bench.compare results/run-abc123-....json results/run-def456-....json
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Tuple
+
+
+def metrics(result: dict) -> Dict[str, Tuple[float, bool]]:
+    """metric name -> (value, higher_is_better)"""
+    flat = {}
+    for name, entry in (result.get("micro") or {}).items():
+        if "p50_ms" in entry:
+            flat[f"micro.{name}.p50_ms"] = (entry["p50_ms"], False)
+    for name, entry in (result.get("load") or {}).items():
+        flat[f"load.{name}.throughput_rps"] = (entry["throughput_rps"], True)
+        for q in ("p50_ms", "p95_ms", "p99_ms"):
+            if q in entry["latency"]:
+                flat[f"load.{name}.{q}"] = (entry["latency"][q], False)
+        if entry["requests"]:
+            flat[f"load.{name}.error_rate"] = (entry["errors"] / entry["requests"], False)
+    return flat
+
+
+def compare(before: dict, after: dict, threshold_pct: float) -> Tuple[list, list]:
+    old, new = metrics(before), metrics(after)
+    rows, regressions = [], []
+    for name in sorted(set(old) & set(new)):
+        (a, higher_is_better), (b, _) = old[name], new[name]
+        change = (b - a) / a * 100.0 if a else (0.0 if b == a else float("inf"))
+        worse = -change if higher_is_better else change
+        rows.append((name, a, b, change))
+        if worse > threshold_pct and not (name.endswith("error_rate") and b - a < 0.01):
+            regressions.append(name)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diff two benchmark result files")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    args = parser.parse_args(argv)
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print(f"before: {before['environment']['commit']}  after: {after['environment']['commit']}")
+    rows, regressions = compare(before, after, args.threshold)
+    for name, a, b, change in rows:
+        flag = "  REGRESSION" if name in regressions else ""
+        print(f"{name:45s} {a:12.3f} {b:12.3f} {change:+8.1f}%{flag}")
+    if regressions:
+        print(f"[WARNING] {len(regressions)} metric(s) regressed by more than {args.threshold:g}%")
+        sys.exit(1)
+    print("[OK] No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Local stand-in for api.gbif.org with configurable latency.
+
+Serves /v1/occurrence/search and /v1/species/match. Responses recorded in
+the fixtures file are replayed for identical queries; anything else gets a
+deterministic synthetic response in the same shape, so any load pattern
+works offline. --record-from proxies misses to the real API once and adds
+them to the fixtures file.
+
+    python -m bench.gbif_stub --port 8081 --latency-ms 120 --jitter-ms 40
+    GBIF_API_URL=http://127.0.0.1:8081/v1 uvicorn gbif_ml_api:app
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+from typing import Optional
+from urllib.parse import urlencode
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from bench.common import BENCH_DIR
+
+DEFAULT_FIXTURES = os.path.join(BENCH_DIR, "fixtures", "gbif_responses.json")
+
+
+def fixture_key(path: str, params: dict) -> str:
+    return f"{path.strip('/')}?{urlencode(sorted((k, str(v)) for k, v in params.items()))}"
+
+
+def _seed(*parts) -> int:
+    return int(hashlib.sha256("\0".join(str(p) for p in parts).encode()).hexdigest()[:8], 16)
+
+
+def synthetic_response(path: str, params: dict) -> dict:
+    """Deterministic GBIF-shaped response for queries with no recording"""
+    path = path.strip("/")
+    if path == "species/match":
+        name = params.get("name", "")
+        return {
+            "usageKey": 1000000 + _seed(name) % 9000000,
+            "scientificName": name,
+            "canonicalName": name,
+            "rank": "SPECIES",
+            "status": "ACCEPTED",
+            "confidence": 97,
+            "matchType": "EXACT",
+            "kingdom": "Animalia",
+            "synonym": False,
+        }
+    seed = _seed(params.get("scientificName"), params.get("decimalLatitude"),
+                 params.get("decimalLongitude"), params.get("radius"))
+    count = seed % 400
+    if params.get("toDate"):
+        count = count * 3 // 4
+    limit = int(params.get("limit", 20) or 0)
+    rng = random.Random(seed)
+    return {
+        "offset": 0,
+        "limit": limit,
+        "endOfRecords": limit >= count,
+        "count": count,
+        "results": [{
+            "key": seed + i,
+            "scientificName": params.get("scientificName"),
+            "decimalLatitude": float(params.get("decimalLatitude", 0)) + rng.uniform(-0.2, 0.2),
+            "decimalLongitude": float(params.get("decimalLongitude", 0)) + rng.uniform(-0.2, 0.2),
+            "eventDate": f"{rng.randint(2000, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        } for i in range(min(limit, count))],
+        "facets": [],
+    }
+
+
+def create_app(fixtures_path: str = DEFAULT_FIXTURES, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+               error_rate: float = 0.0, record_from: Optional[str] = None) -> FastAPI:
+    app = FastAPI(title="GBIF stub")
+    fixtures = {}
+    if os.path.exists(fixtures_path):
+        with open(fixtures_path) as f:
+            fixtures = {k: v for k, v in json.load(f).items() if not k.startswith("_")}
+    stats = {"requests": 0, "replayed": 0, "synthetic": 0, "recorded": 0, "errors": 0}
+
+    @app.get("/stats")
+    def stub_stats():
+        return stats
+
+    @app.get("/v1/{path:path}")
+    async def gbif(path: str, request: Request):
+        stats["requests"] += 1
+        delay = max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000.0
+        if delay:
+            await asyncio.sleep(delay)
+        if error_rate and random.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse(status_code=503, content={"error": "stub overload"},
+                                headers={"Retry-After": "0"})
+        params = dict(request.query_params)
+        key = fixture_key(path, params)
+        if key in fixtures:
+            stats["replayed"] += 1
+            return fixtures[key]
+        if record_from:
+            import httpx
+
+            async with httpx.AsyncClient(timeout=30) as client:
+                upstream = await client.get(f"{record_from.rstrip('/')}/{path}", params=params)
+            if upstream.status_code == 200:
+                fixtures[key] = upstream.json()
+                stats["recorded"] += 1
+                _save(fixtures_path, fixtures)
+                return fixtures[key]
+        stats["synthetic"] += 1
+        return synthetic_response(path, params)
+
+    return app
+
+
+def _save(path: str, fixtures: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp = path + ".tmp"
+    with open(temp, "w") as f:
+        json.dump(fixtures, f, indent=1, sort_keys=True)
+    os.replace(temp, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local GBIF API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction answered 503 (exercises retries)")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--record-from", help="Proxy misses to this API (e.g. https://api.gbif.org/v1) and save them")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    app = create_app(args.fixtures, args.latency_ms, args.jitter_ms, args.error_rate, args.record_from)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Deterministic synthetic test images (JPEG / PNG, up to 48 MP).
+
+Content is a smooth gradient with blocky shapes plus sensor-like noise, so
+encoders, decoders and the pixel forensics see camera-like statistics rather
+than a flat fill. Encoded files are cached under bench/.images.
+
+    python -m bench.images --sizes 0.3,2,12,48 --formats jpeg,png
+"""
+import argparse
+import math
+import os
+from typing import Iterable, List
+
+import numpy as np
+from PIL import Image
+
+from bench.common import BENCH_DIR
+
+CACHE_DIR = os.path.join(BENCH_DIR, ".images")
+DEFAULT_SIZES_MP = (0.3, 2.0, 12.0, 48.0)
+FORMATS = {"jpeg": ("JPEG", ".jpg"), "png": ("PNG", ".png")}
+_BAND_ROWS = 512  # noise is added in bands to bound peak memory at 48 MP
+
+
+def dimensions(megapixels: float, aspect: float = 4 / 3) -> tuple:
+    width = int(math.sqrt(megapixels * 1e6 * aspect))
+    return width, int(megapixels * 1e6 / width)
+
+
+def synthetic_array(megapixels: float, seed: int = 0, aspect: float = 4 / 3) -> np.ndarray:
+    """HxWx3 uint8 image of about megapixels"""
+    width, height = dimensions(megapixels, aspect)
+    rng = np.random.default_rng(seed)
+    # low-resolution structure, upsampled: gradient + random blocks
+    small_w, small_h = max(8, width // 64), max(8, height // 64)
+    yy, xx = np.mgrid[0:small_h, 0:small_w]
+    base = np.stack([xx * 255 / small_w, yy * 255 / small_h,
+                     (xx + yy) * 127 / (small_w + small_h)], axis=-1)
+    for _ in range(12):
+        x0, y0 = rng.integers(0, small_w), rng.integers(0, small_h)
+        base[y0:y0 + small_h // 4, x0:x0 + small_w // 4] = rng.integers(0, 256, 3)
+    image = np.asarray(Image.fromarray(base.astype(np.uint8)).resize((width, height), Image.BILINEAR))
+    image = image.copy()
+    for top in range(0, height, _BAND_ROWS):
+        band = image[top:top + _BAND_ROWS].astype(np.int16)
+        band += rng.integers(-12, 13, band.shape, dtype=np.int16)
+        image[top:top + _BAND_ROWS] = np.clip(band, 0, 255).astype(np.uint8)
+    return image
+
+
+def synthetic_image(megapixels: float, fmt: str = "jpeg", seed: int = 0, quality: int = 90) -> bytes:
+    """Encoded image bytes, cached on disk by (size, format, seed)"""
+    path = image_path(megapixels, fmt, seed, quality)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def image_path(megapixels: float, fmt: str = "jpeg", seed: int = 0, quality: int = 90) -> str:
+    """Path of the cached encoded image, generating it on first use"""
+    pil_format, extension = FORMATS[fmt.lower()]
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"{megapixels:g}mp-s{seed}-q{quality}{extension}")
+    if not os.path.exists(path):
+        image = Image.fromarray(synthetic_array(megapixels, seed))
+        temp = path + ".tmp"
+        options = {"quality": quality} if pil_format == "JPEG" else {"compress_level": 1}
+        image.save(temp, pil_format, **options)
+        os.replace(temp, path)
+    return path
+
+
+def image_set(sizes: Iterable[float] = DEFAULT_SIZES_MP, formats: Iterable[str] = ("jpeg",),
+              seeds: Iterable[int] = (0,)) -> List[str]:
+    return [image_path(mp, fmt, seed) for mp in sizes for fmt in formats for seed in seeds]
+
+
+def parse_sizes(value: str) -> List[float]:
+    return [float(s) for s in value.split(",") if s.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic benchmark images")
+    parser.add_argument("--sizes", default=",".join(f"{s:g}" for s in DEFAULT_SIZES_MP), help="Megapixels, comma separated")
+    parser.add_argument("--formats", default="jpeg", help="jpeg,png")
+    parser.add_argument("--seeds", type=int, default=1, help="Distinct images per size/format")
+    args = parser.parse_args(argv)
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    for path in image_set(parse_sizes(args.sizes), formats, range(args.seeds)):
+        print(f"{os.path.getsize(path) / 1e6:8.2f} MB  {path}")
+
+
+if __name__ == "__main__":
+    main()
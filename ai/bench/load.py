@@ -0,0 +1,172 @@
+"""
+Async load driver for a running API (gbif_ml_api.py or the root app.py).
+
+Each endpoint is driven on its own by a fixed number of concurrent clients
+for a fixed duration (closed loop); the report gives throughput, errors,
+status codes and p50/p95/p99 latency per endpoint.
+
+    python -m bench.load --base-url http://127.0.0.1:8000 \\
+        --endpoints gbif_classify,satellite,classify_image --concurrency 16 --duration 20
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from typing import Callable, Dict, List
+
+import httpx
+
+from bench.common import summarize, write_results
+from bench.images import synthetic_image
+
+SPECIES = ["Panthera tigris", "Elephas maximus", "Rhinoceros unicornis", "Gavialis gangeticus",
+           "Platanista gangetica", "Axis axis", "Bubalus arnee", "Melursus ursinus"]
+# Sample points along the Ganga basin (lat, lon)
+POINTS = [(29.95, 78.16), (27.18, 79.94), (25.44, 81.85), (25.32, 83.01),
+          (25.61, 85.14), (25.25, 87.01), (24.78, 88.07), (22.57, 88.36)]
+
+
+def _point(rng: random.Random) -> tuple:
+    lat, lon = rng.choice(POINTS)
+    return round(lat + rng.uniform(-0.3, 0.3), 3), round(lon + rng.uniform(-0.3, 0.3), 3)
+
+
+def _image_files(images: List[bytes]) -> Callable:
+    def make(rng: random.Random) -> dict:
+        return {"method": "POST", "files": {"file": ("bench.jpg", rng.choice(images), "image/jpeg")}}
+    return make
+
+
+def scenarios(image_mp: float, unique_images: int) -> Dict[str, Callable]:
+    """name -> (rng -> httpx request kwargs plus "path")"""
+    def gbif_classify(rng):
+        lat, lon = _point(rng)
+        return {"method": "POST", "path": "/gbif/classify",
+                "json": {"species": rng.choice(SPECIES), "lat": lat, "lon": lon, "radius": 25}}
+
+    def gbif_search(rng):
+        return {"method": "GET", "path": "/gbif/search", "params": {"q": rng.choice(SPECIES)[:rng.randint(4, 12)]}}
+
+    def gbif_riskmap(rng):
+        lat, lon = _point(rng)
+        aoi = {"minLat": lat - 0.25, "maxLat": lat + 0.25, "minLon": lon - 0.25, "maxLon": lon + 0.25}
+        return {"method": "POST", "path": "/gbif/riskmap",
+                "json": {"species": rng.choice(SPECIES), "aoi": aoi, "cellDeg": 0.1}}
+
+    def satellite(rng):
+        lat, lon = _point(rng)
+        return {"method": "POST", "path": "/satellite/analyze",
+                "json": {"aoi": {"lat": lat, "lon": lon, "radiusKm": 50}, "layers": ["fire", "vegetation"]}}
+
+    images = []
+
+    def image_route(path):
+        def make(rng):
+            if not images:
+                images.extend(synthetic_image(image_mp, "jpeg", seed) for seed in range(unique_images))
+            return {**_image_files(images)(rng), "path": path}
+        return make
+
+    return {
+        "health": lambda rng: {"method": "GET", "path": "/health/live"},
+        "gbif_classify": gbif_classify,
+        "gbif_search": gbif_search,
+        "gbif_riskmap": gbif_riskmap,
+        "satellite": satellite,
+        "classify_image": image_route("/classify/image"),
+        "analyze_image": image_route("/classify/image/analyze"),
+        # root app.py
+        "app_health": lambda rng: {"method": "GET", "path": "/api/health"},
+        "app_analyze_image": image_route("/api/classify/image/analyze"),
+    }
+
+
+def _is_error(response: httpx.Response) -> bool:
+    if response.status_code >= 400:
+        return True
+    if response.headers.get("content-type", "").startswith("application/json"):
+        body = response.json()
+        return isinstance(body, dict) and bool(body.get("error"))
+    return False
+
+
+async def drive(client: httpx.AsyncClient, make_request: Callable, concurrency: int,
+                duration_s: float, seed: int = 0) -> dict:
+    """Run concurrency closed-loop clients against one endpoint for duration_s"""
+    latencies: List[float] = []
+    statuses = Counter()
+    errors = 0
+    deadline = time.perf_counter() + duration_s
+
+    async def worker(worker_id: int):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.perf_counter() < deadline:
+            request = make_request(rng)
+            path = request.pop("path")
+            started = time.perf_counter()
+            try:
+                response = await client.request(url=path, **request)
+                failed = _is_error(response)
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                failed = True
+                statuses[type(e).__name__] += 1
+            latencies.append((time.perf_counter() - started) * 1000.0)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "statuses": dict(statuses),
+        "latency": summarize(latencies),
+    }
+
+
+async def run_load(base_url: str, endpoints: List[str], concurrency: int, duration_s: float,
+                   warmup_s: float = 2.0, image_mp: float = 2.0, unique_images: int = 8,
+                   timeout_s: float = 60.0) -> dict:
+    available = scenarios(image_mp, unique_images)
+    unknown = [name for name in endpoints if name not in available]
+    if unknown:
+        raise SystemExit(f"Unknown endpoints {unknown}; choose from {sorted(available)}")
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout_s, limits=limits) as client:
+        for name in endpoints:
+            if warmup_s > 0:
+                await drive(client, available[name], concurrency, warmup_s, seed=1)
+            results[name] = await drive(client, available[name], concurrency, duration_s)
+            latency = results[name]["latency"]
+            print(f"[OK] {name:18s} {results[name]['throughput_rps']:9.1f} req/s  "
+                  f"p50 {latency.get('p50_ms', 0):8.1f}  p95 {latency.get('p95_ms', 0):8.1f}  "
+                  f"p99 {latency.get('p99_ms', 0):8.1f} ms  errors {results[name]['errors']}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Closed-loop HTTP load test, per endpoint")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoints", default="health,gbif_classify,gbif_search,satellite,classify_image")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per endpoint")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds per endpoint")
+    parser.add_argument("--image-mp", type=float, default=2.0)
+    parser.add_argument("--unique-images", type=int, default=8, help="Distinct uploads (1 = all cache hits)")
+    parser.add_argument("--out", help="Result JSON path (default bench/results/)")
+    args = parser.parse_args(argv)
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    results = asyncio.run(run_load(args.base_url, endpoints, args.concurrency, args.duration,
+                                   args.warmup, args.image_mp, args.unique_images))
+    path = write_results("load", {"config": vars(args), "load": results}, args.out)
+    print(f"[OK] Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+In-process micro-benchmarks of the hot paths behind the API routes.
+
+    risk_score_scalar       gbif_risk_score, per call
+    risk_score_vectorized   gbif_risk_score_vectorized over a 100k-cell grid
+    decode_<N>mp            JPEG decode to model input size / full resolution
+    pixels_<N>mp            pixel_analysis.analyze_pixels at full resolution
+    forward_b<B>            model_precision.predict (processor + forward pass)
+
+The model benchmarks load the configured classifier (IMAGE_MODEL_ID,
+IMAGE_MODEL_PRECISION) and are reported as skipped if it cannot load.
+
+    python -m bench.micro --sizes 2,12,48 --repeat 5
+"""
+import argparse
+import json
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from bench.common import summarize, write_results
+from bench.images import parse_sizes, synthetic_image
+
+
+def timed(fn: Callable, repeat: int, warmup: int = 1, inner: int = 1) -> dict:
+    """Latency summary of fn() over repeat samples (each averaged over inner calls)"""
+    for _ in range(warmup):
+        fn()
+    samples: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(inner):
+            fn()
+        samples.append((time.perf_counter() - started) * 1000.0 / inner)
+    return summarize(samples)
+
+
+def bench_risk_score(repeat: int) -> dict:
+    from gbif_ml_api import gbif_risk_score, gbif_risk_score_vectorized
+
+    rng = np.random.default_rng(0)
+    cells = 100_000
+    recent = rng.integers(0, 200, cells)
+    historical = rng.integers(0, 200, cells)
+    endangered = rng.random(cells) < 0.3
+    proximity = rng.random(cells)
+    i = iter(range(1 << 62))
+
+    def scalar():
+        k = next(i) % cells
+        gbif_risk_score(int(recent[k]), int(historical[k]), bool(endangered[k]), float(proximity[k]))
+
+    return {
+        "risk_score_scalar": timed(scalar, repeat, inner=2000),
+        "risk_score_vectorized_100k": timed(
+            lambda: gbif_risk_score_vectorized(recent, historical, endangered, proximity), repeat),
+    }
+
+
+def bench_images(sizes: List[float], repeat: int) -> dict:
+    from image_decode import decode_image
+    from pixel_analysis import analyze_pixels
+
+    results = {}
+    for mp in sizes:
+        data = synthetic_image(mp, "jpeg")
+        results[f"decode_{mp:g}mp_model"] = timed(lambda: decode_image(data, 224), repeat)
+        results[f"decode_{mp:g}mp_full"] = timed(lambda: decode_image(data), repeat)
+        image = decode_image(data)
+        results[f"pixels_{mp:g}mp"] = timed(lambda: analyze_pixels(image), repeat)
+    return results
+
+
+def bench_forward(batch_sizes: List[int], repeat: int) -> dict:
+    from image_decode import decode_image
+
+    try:
+        import torch  # noqa: F401  (predict needs it; get_classifier only reports None)
+
+        from gbif_ml_api import MODEL_INPUT_SIDE, get_classifier
+        from model_precision import predict
+
+        clf = get_classifier()
+    except Exception as e:
+        return {f"forward_b{b}": {"skipped": f"classifier unavailable: {e}"} for b in batch_sizes}
+    if clf is None:
+        return {f"forward_b{b}": {"skipped": "classifier unavailable: model failed to load"}
+                for b in batch_sizes}
+    images = [decode_image(synthetic_image(2.0, "jpeg", seed), MODEL_INPUT_SIDE)
+              for seed in range(max(batch_sizes))]
+    results = {}
+    for b in batch_sizes:
+        entry = timed(lambda: predict(clf, images[:b]), repeat)
+        entry["precision"] = clf["precision"]
+        entry["images_per_s"] = round(b * 1000.0 / entry["p50_ms"], 2)
+        results[f"forward_b{b}"] = entry
+    return results
+
+
+def run_micro(sizes: List[float], repeat: int, batch_sizes: List[int], model: bool = True) -> dict:
+    results = bench_risk_score(repeat)
+    results.update(bench_images(sizes, repeat))
+    if model:
+        results.update(bench_forward(batch_sizes, repeat))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of scoring, pixel analysis and model forward")
+    parser.add_argument("--sizes", default="2,12,48", help="Image megapixels, comma separated")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--batch-sizes", default="1,8")
+    parser.add_argument("--no-model", action="store_true", help="Skip the model forward benchmarks")
+    parser.add_argument("--out", help="Result JSON path (default bench/results/)")
+    args = parser.parse_args(argv)
+
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",") if b.strip()]
+    results = run_micro(parse_sizes(args.sizes), args.repeat, batch_sizes, not args.no_model)
+    path = write_results("micro", {"config": vars(args), "micro": results}, args.out)
+    print(json.dumps(results, indent=2))
+    print(f"[OK] Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+One-shot reproducible run: GBIF stub + API server + micro and load benchmarks.
+
+Starts bench.gbif_stub with the given latency, starts the API with
+GBIF_API_URL pointed at it (local occurrence store and on-disk image cache
+disabled, so GBIF traffic reaches the stub and every run starts cold), runs
+the micro-benchmarks in-process and the load driver against the server, and
+writes one JSON file for bench.compare.
+
+    cd ai && python -m bench.run --gbif-latency-ms 120 --duration 15
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench.common import BENCH_DIR, write_results
+from bench.load import run_load
+from bench.micro import run_micro
+from bench.images import parse_sizes
+
+AI_DIR = os.path.dirname(BENCH_DIR)
+TARGETS = {
+    "ml": (AI_DIR, "gbif_ml_api:app"),
+    "app": (os.path.dirname(AI_DIR), "app:app"),
+}
+IMAGE_ENDPOINTS = ("classify_image", "analyze_image")
+
+
+def _wait_for(url: str, timeout_s: float, ok_status=(200,)) -> bool:
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=2).status_code in ok_status:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    return False
+
+
+def _spawn(args: list, cwd: str, env: dict, log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(args, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stub GBIF + API server + micro/load benchmarks")
+    parser.add_argument("--target", choices=sorted(TARGETS), default="ml")
+    parser.add_argument("--endpoints", default="health,gbif_classify,gbif_search,gbif_riskmap,satellite,classify_image,analyze_image")
+    parser.add_argument("--gbif-latency-ms", type=float, default=100.0)
+    parser.add_argument("--gbif-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--gbif-error-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--image-mp", type=float, default=2.0)
+    parser.add_argument("--unique-images", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--micro-sizes", default="2,12,48")
+    parser.add_argument("--micro-repeat", type=int, default=5)
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--stub-port", type=int, default=8081)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--out", help="Result JSON path (default bench/results/)")
+    args = parser.parse_args(argv)
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    if args.target == "app":
+        endpoints = [e for e in endpoints if e.startswith("app_")] or ["app_health", "app_analyze_image"]
+    payload = {"config": vars(args)}
+
+    if not args.skip_micro:
+        print("[OK] Running micro-benchmarks")
+        payload["micro"] = run_micro(parse_sizes(args.micro_sizes), args.micro_repeat, [1, 8])
+
+    if not args.skip_load:
+        workdir = tempfile.mkdtemp(prefix="bench-")
+        env = dict(os.environ,
+                   GBIF_API_URL=f"http://127.0.0.1:{args.stub_port}/v1",
+                   OCCURRENCE_DB="",
+                   IMAGE_CACHE_DB="",
+                   WATCHLIST_ENABLED="0",  # background refreshes would skew load and stub counters
+                   PYTHONPATH=AI_DIR)
+        stub = _spawn([sys.executable, "-m", "bench.gbif_stub", "--port", str(args.stub_port),
+                       "--latency-ms", str(args.gbif_latency_ms), "--jitter-ms", str(args.gbif_jitter_ms),
+                       "--error-rate", str(args.gbif_error_rate)],
+                      AI_DIR, env, os.path.join(workdir, "stub.log"))
+        cwd, app = TARGETS[args.target]
+        server = _spawn([sys.executable, "-m", "uvicorn", app, "--port", str(args.port),
+                         "--workers", str(args.workers), "--log-level", "warning"],
+                        cwd, env, os.path.join(workdir, "server.log"))
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            health = "/api/health" if args.target == "app" else "/health/live"
+            if not _wait_for(f"http://127.0.0.1:{args.stub_port}/stats", 30) or not _wait_for(base_url + health, 120):
+                raise SystemExit(f"[ERROR] Servers did not start, see logs in {workdir}")
+            if args.target == "ml" and any(e in IMAGE_ENDPOINTS for e in endpoints):
+                if not _wait_for(base_url + "/health/ready", 300):
+                    print("[WARNING] Classifier not ready, skipping image endpoints")
+                    endpoints = [e for e in endpoints if e not in IMAGE_ENDPOINTS]
+            payload["load"] = asyncio.run(run_load(base_url, endpoints, args.concurrency, args.duration,
+                                                   args.warmup, args.image_mp, args.unique_images))
+            payload["gbif_stub"] = httpx.get(f"http://127.0.0.1:{args.stub_port}/stats").json()
+        finally:
+            for process in (server, stub):
+                process.terminate()
+                process.wait(timeout=30)
+        print(f"[OK] Server logs in {workdir}")
+
+    path = write_results("run", payload, args.out)
+    print(f"[OK] Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
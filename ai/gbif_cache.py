@@ -0,0 +1,109 @@
+"""
+TTL + stale-while-revalidate cache for GBIF lookups.
+
+Fresh entries are served directly; stale entries are served while one
+background refresh runs; identical in-flight misses share a single
+request. Failed fetches (exceptions or None) are never cached.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+DEFAULT_TTL_S = float(os.getenv("GBIF_CACHE_TTL_S", "3600"))
+DEFAULT_STALE_S = float(os.getenv("GBIF_CACHE_STALE_S", "86400"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("GBIF_CACHE_SIZE", "10000"))
+DEFAULT_CELL_DEG = float(os.getenv("GBIF_CACHE_CELL_DEG", "0.01"))  # ~1 km
+
+
+def snap_to_cell(value: float, cell_deg: float = DEFAULT_CELL_DEG) -> float:
+    """Snap a coordinate to the centre of its grid cell"""
+    if cell_deg <= 0:
+        return value
+    return round((int(value // cell_deg) + 0.5) * cell_deg, 6)
+
+
+class SWRCache:
+    """Async TTL cache with stale-while-revalidate and request coalescing"""
+
+    def __init__(self, name: str, ttl: float = DEFAULT_TTL_S,
+                 stale: float = DEFAULT_STALE_S,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.stale = stale
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._inflight = {}  # key -> asyncio.Task
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.evictions = 0
+
+    async def get(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            if age < self.ttl + self.stale:
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    self.refreshes += 1
+                    self._start(key, fetch)
+                return value
+            del self._entries[key]
+
+        self.misses += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._start(key, fetch)
+        else:
+            self.coalesced += 1
+        # Shield so a cancelled caller does not cancel the shared fetch
+        return await asyncio.shield(task)
+
+    def _start(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+        self._inflight[key] = task
+
+        def _done(t: asyncio.Task):
+            self._inflight.pop(key, None)
+            if not t.cancelled():
+                t.exception()  # background refresh errors are logged by the fetcher
+
+        task.add_done_callback(_done)
+        return task
+
+    async def _fetch_and_store(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        value = await fetch()
+        if value is not None:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+            "ttl_s": self.ttl,
+            "stale_s": self.stale,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else None,
+        }
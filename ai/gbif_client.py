@@ -0,0 +1,114 @@
+"""
+Shared async client for api.gbif.org.
+
+One keep-alive connection pool per worker, a per-host concurrency limit,
+and retry with full-jitter exponential backoff on 429 / 5xx / transport
+errors (honouring Retry-After when GBIF sends it).
+"""
+import asyncio
+import os
+import random
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from metrics import REGISTRY
+
+GBIF_API_URL = os.getenv("GBIF_API_URL", "https://api.gbif.org/v1")
+DEFAULT_MAX_CONNECTIONS = int(os.getenv("GBIF_MAX_CONNECTIONS", "32"))
+DEFAULT_PER_HOST_LIMIT = int(os.getenv("GBIF_PER_HOST_LIMIT", "8"))
+DEFAULT_RETRIES = int(os.getenv("GBIF_RETRIES", "3"))
+DEFAULT_TIMEOUT_S = float(os.getenv("GBIF_TIMEOUT_S", "15"))
+BACKOFF_BASE_S = 0.25
+BACKOFF_MAX_S = 8.0
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+GBIF_HTTP_MS = REGISTRY.histogram(
+    "gbif_http_request_ms", "GBIF HTTP attempt latency incl. per-host queueing (ms)", ("endpoint", "outcome"))
+GBIF_RETRIES = REGISTRY.counter("gbif_http_retries_total", "GBIF attempts retried", ("endpoint",))
+
+
+class GBIFError(Exception):
+    """GBIF request failed after all retries"""
+
+
+class GBIFClient:
+    """Pooled, rate-limited GBIF HTTP client"""
+
+    def __init__(self, base_url: str = GBIF_API_URL,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 per_host_limit: int = DEFAULT_PER_HOST_LIMIT,
+                 retries: int = DEFAULT_RETRIES,
+                 timeout: float = DEFAULT_TIMEOUT_S):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.per_host_limit = max(1, per_host_limit)
+        self.retries = max(0, retries)
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=5.0),
+                headers={"User-Agent": "BioSentinel-ML-API"},
+            )
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+    @staticmethod
+    def _backoff(attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(BACKOFF_MAX_S, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** attempt)))
+
+    async def get_json(self, path: str, params: Optional[dict] = None) -> dict:
+        """GET {base_url}/{path} and decode JSON, retrying transient failures"""
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        endpoint = path.strip("/")
+        last_error = None
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            started = time.perf_counter()
+            try:
+                async with self._host_limit(url):
+                    response = await self.client.get(url, params=params)
+                GBIF_HTTP_MS.observe((time.perf_counter() - started) * 1000.0, endpoint, response.status_code)
+                if response.status_code in RETRY_STATUSES:
+                    retry_after = response.headers.get("Retry-After")
+                    last_error = f"HTTP {response.status_code}"
+                else:
+                    response.raise_for_status()
+                    return response.json()
+            except httpx.TransportError as e:
+                GBIF_HTTP_MS.observe((time.perf_counter() - started) * 1000.0, endpoint, "error")
+                last_error = str(e) or type(e).__name__
+            except (httpx.HTTPStatusError, ValueError) as e:
+                raise GBIFError(str(e)) from e
+            if attempt < self.retries:
+                GBIF_RETRIES.inc(endpoint)
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+        raise GBIFError(f"GBIF request to {path} failed: {last_error}")
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._host_limits.clear()
@@ -1,18 +1,72 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional
+from contextlib import asynccontextmanager
+import asyncio
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.staticfiles import StaticFiles
-import requests
 import json
 from datetime import datetime, timedelta
 import base64
-import io
+import os
+import threading
+import time
 from PIL import Image
-import torch
 import numpy as np
-from transformers import AutoProcessor, AutoModelForImageClassification
+from inference_batcher import InferenceBatcher
+from inference_executor import InferenceExecutor, InferenceOverloaded
+from result_cache import ResultCache
+from pixel_analysis import DEFAULT_MAX_PIXELS as PIXEL_ANALYSIS_MAX_PIXELS
+from image_decode import ImageTooLarge, hash_upload
+from image_pipeline import ImagePipeline
+from perceptual_hash import NearDuplicateIndex
+from image_fetch import ImageFetcher
+from gbif_client import GBIFClient, GBIFError
+from gbif_cache import SWRCache, snap_to_cell
+from occurrence_store import OccurrenceStore
+from sighting_series import SightingSeries
+from taxonomy_index import TaxonomyIndex, normalize_name
+from watchlist import WatchlistScheduler, load_points
+from settlement_raster import SettlementRaster
+from risk_grid import TooManyCells, aoi_cells, cell_radius_km, corridor_cells
+from raster_tiles import TileStore
+from hotspot_index import HotspotIndex, radius_bbox
+from worker_memory import process_memory
+from metrics import MetricsMiddleware, PROMETHEUS_CONTENT_TYPE, REGISTRY
+from model_precision import DEFAULT_CHANNELS_LAST, DEFAULT_PRECISION as MODEL_PRECISION, prepare_model
+import sqlite3
+
+# Shared keep-alive pool for all GBIF calls in this worker
+gbif_client = GBIFClient()
+
+# Occurrence counts keyed by (species, snapped grid cell, radius, date window);
+# species/match results change rarely and get a long-lived cache of their own
+gbif_count_cache = SWRCache("gbif_occurrence_counts")
+gbif_species_cache = SWRCache(
+    "gbif_species_match",
+    ttl=float(os.getenv("GBIF_SPECIES_CACHE_TTL_S", str(7 * 86400))),
+    stale=float(os.getenv("GBIF_SPECIES_CACHE_STALE_S", str(30 * 86400)))
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if MODEL_WARMUP:
+        # Load in the background (or just warm up weights preloaded before fork);
+        # GBIF and satellite routes serve immediately
+        if classifier is None:
+            model_status["state"] = "loading"
+        asyncio.ensure_future(inference_executor.run(warm_up_classifier))
+    if watchlist is not None:
+        watchlist.start()
+    yield
+    if watchlist is not None:
+        await watchlist.stop()
+    await gbif_client.aclose()
+    await image_fetcher.aclose()
+    inference_executor.shutdown()
+    image_pipeline.shutdown()
 
 app = FastAPI(
     title="BioSentinel AI API",
@@ -30,25 +84,152 @@ BioSentinel AI API for biodiversity monitoring and image analysis.
     """,
     version="1.0.0",
     docs_url=None,
-    redoc_url=None
+    redoc_url=None,
+    lifespan=lifespan
 )
 
-# Initialize image classifier (lazy loading)
+# Image classifier model (id + revision also key the result cache)
+MODEL_ID = os.getenv("IMAGE_MODEL_ID", "Ateeqq/ai-vs-human-image-detector")
+MODEL_REVISION = os.getenv("IMAGE_MODEL_REVISION", "main")
+MODEL_INPUT_SIDE = int(os.getenv("IMAGE_MODEL_INPUT_SIDE", "224"))
+MODEL_WARMUP = os.getenv("IMAGE_MODEL_WARMUP", "1") == "1"
+MODEL_LOADING_RETRY_AFTER_S = int(os.getenv("IMAGE_MODEL_LOADING_RETRY_AFTER_S", "5"))
+
+# Initialize image classifier (lazy loading; torch/transformers are imported here, not at startup)
 classifier = None
+_classifier_lock = threading.Lock()
+model_status = {"state": "not_loaded", "error": None, "load_seconds": None, "warmup_ms": None,
+                "precision": None}
 
 def get_classifier():
     global classifier
     if classifier is None:
-        try:
-            from transformers import AutoProcessor, AutoModelForImageClassification
-            processor = AutoProcessor.from_pretrained("Ateeqq/ai-vs-human-image-detector")
-            model = AutoModelForImageClassification.from_pretrained("Ateeqq/ai-vs-human-image-detector")
-            classifier = {"processor": processor, "model": model}
-            print("[OK] Image classifier loaded successfully")
-        except Exception as e:
-            print(f"[ERROR] Failed to load image classifier: {e}")
+        with _classifier_lock:
+            if classifier is None:
+                model_status["state"] = "loading"
+                started = time.perf_counter()
+                try:
+                    from transformers import AutoProcessor, AutoModelForImageClassification
+                    processor = AutoProcessor.from_pretrained(MODEL_ID, revision=MODEL_REVISION)
+                    model = AutoModelForImageClassification.from_pretrained(MODEL_ID, revision=MODEL_REVISION)
+                    # fp32 / int8 / bf16 per IMAGE_MODEL_PRECISION (see model_precision.py)
+                    model, precision = prepare_model(model, MODEL_PRECISION)
+                    classifier = {"processor": processor, "model": model, "precision": precision,
+                                  "channels_last": DEFAULT_CHANNELS_LAST}
+                    model_status.update(state="ready", error=None, precision=precision,
+                                        load_seconds=round(time.perf_counter() - started, 2))
+                    print(f"[OK] Image classifier loaded successfully ({precision}, {model_status['load_seconds']}s)")
+                except Exception as e:
+                    model_status.update(state="failed", error=str(e))
+                    print(f"[ERROR] Failed to load image classifier: {e}")
     return classifier
 
+def share_classifier_before_fork():
+    """
+    Load the model in the gunicorn master (see gunicorn.conf.py) so forked
+    workers share the weight pages copy-on-write instead of loading a copy each.
+    No forward pass runs here: torch thread pools must not exist before fork.
+    """
+    # prepare_model already disabled gradients, so nothing writes to the weight pages
+    return get_classifier()
+
+def warm_up_classifier():
+    """Load the model and run one dummy forward so the first real request is fast"""
+    if get_classifier() is None:
+        return
+    started = time.perf_counter()
+    try:
+        inference_batcher.run_batch([Image.new("RGB", (MODEL_INPUT_SIDE, MODEL_INPUT_SIDE))])
+        model_status["warmup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        print(f"[OK] Image classifier warmed up ({model_status['warmup_ms']} ms)")
+    except Exception as e:
+        print(f"[WARNING] Image classifier warm-up failed: {e}")
+
+async def load_classifier():
+    """Classifier for the image routes; fast 503 + Retry-After while it is still loading"""
+    if classifier is None and model_status["state"] == "loading":
+        raise InferenceOverloaded(MODEL_LOADING_RETRY_AFTER_S, "Image model is loading, retry later")
+    return await inference_executor.run(get_classifier)
+
+# Decode, preprocessing and inference run on a dedicated pool, never on the event loop
+inference_executor = InferenceExecutor()
+
+# Shared micro-batching queue for all image classification routes
+inference_batcher = InferenceBatcher(get_classifier, executor=inference_executor)
+
+# Repeat uploads (and gateway retries) skip the forward pass entirely
+result_cache = ResultCache(namespace=f"{MODEL_ID}@{MODEL_REVISION}"
+                           + ("" if MODEL_PRECISION == "fp32" else f":{MODEL_PRECISION}"))
+
+# Resized / recompressed re-uploads reuse the earlier verdict (perceptual hash, see perceptual_hash.py)
+duplicate_index = NearDuplicateIndex() if os.getenv("IMAGE_DEDUP", "1") == "1" else None
+
+# Decode once, then model / pixel forensics / EXIF stages concurrently (see image_pipeline.py)
+image_pipeline = ImagePipeline(inference_batcher, result_cache, MODEL_INPUT_SIDE,
+                               pixel_max_pixels=PIXEL_ANALYSIS_MAX_PIXELS,
+                               duplicates=duplicate_index)
+
+async def image_route(handler, error_label: str):
+    """Admission, model loading and error mapping shared by the image routes"""
+    try:
+        with inference_executor.slot():
+            # Load classifier if not already loaded
+            clf = await load_classifier()
+            if clf is None:
+                return {"error": "Image classifier not available. Please install dependencies."}
+            return await handler(clf)
+    except InferenceOverloaded as e:
+        return overloaded_response(e)
+    except ImageTooLarge as e:
+        return too_large_response(e)
+    except Exception as e:
+        print(f"{error_label}: {e}")
+        return {"error": str(e)}
+
+def stage_timings(result: dict) -> dict:
+    """Per-stage timings for responses that asked for them (?timings=true)"""
+    return {"timings_ms": result["timings_ms"], "cached": result["cached"]}
+
+def duplicate_submission(result: dict) -> dict:
+    """Whether the upload repeats an earlier one (same bytes, or the same photo resized)"""
+    duplicate = result["duplicate"]
+    return {
+        "is_duplicate": duplicate is not None,
+        "duplicate_of": duplicate["of"] if duplicate else None,
+        "hamming_distance": duplicate["distance"] if duplicate else None
+    }
+
+# Pooled, size-capped downloads for the URL routes
+image_fetcher = ImageFetcher()
+
+def format_predictions(clf: dict, probabilities: List[float]) -> dict:
+    """Labelled predictions (highest first) and the AI / Human verdict"""
+    labels = clf["model"].config.id2label
+    predictions = sorted(
+        ({"label": labels[idx], "confidence": p} for idx, p in enumerate(probabilities)),
+        key=lambda x: x["confidence"], reverse=True
+    )
+    top_prediction = predictions[0]
+    label_lower = top_prediction["label"].lower()
+    is_ai = "ai" in label_lower or "artificial" in label_lower
+    return {
+        "predictions": predictions,
+        "result": "AI-Generated" if is_ai else "Human-Created",
+        "confidence": top_prediction["confidence"],
+        "is_ai_generated": is_ai
+    }
+
+def overloaded_response(e: InferenceOverloaded) -> JSONResponse:
+    """Fast rejection when too many image requests are in flight"""
+    return JSONResponse(
+        status_code=503,
+        content={"error": str(e)},
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+def too_large_response(e: ImageTooLarge) -> JSONResponse:
+    return JSONResponse(status_code=413, content={"error": str(e)})
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -57,12 +238,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency / status / in-flight, plus the opt-in slow-request profiler (PROFILE_SLOW_MS)
+app.add_middleware(MetricsMiddleware)
+
+# Scrape-time gauges over the stats the subsystems already keep
+for histogram in (inference_batcher.batch_size_hist, inference_batcher.queue_wait_hist,
+                  inference_batcher.forward_hist):
+    REGISTRY.register(histogram)
+REGISTRY.gauge("model_load_seconds", "Image model load time",
+               fn=lambda: model_status["load_seconds"])
+REGISTRY.gauge("model_warmup_ms", "Image model warm-up forward time",
+               fn=lambda: model_status["warmup_ms"])
+REGISTRY.gauge("model_ready", "1 once the image model is loaded",
+               fn=lambda: 1 if classifier is not None else 0)
+REGISTRY.gauge("inference_in_flight", "Admitted image requests",
+               fn=lambda: inference_executor.in_flight)
+REGISTRY.gauge("inference_rejected_total", "Image requests rejected with 503",
+               fn=lambda: inference_executor.rejected, type="counter")
+REGISTRY.gauge("inference_queue_depth", "Images waiting for a batch",
+               fn=lambda: inference_batcher.stats()["queued"])
+REGISTRY.gauge("result_cache_lookups_total", "Image result cache lookups", ("result",), type="counter",
+               fn=lambda: {"memory_hit": result_cache.hits,
+                           "disk_hit": result_cache.disk_hits, "miss": result_cache.misses})
+REGISTRY.gauge("result_cache_hit_ratio", "Image result cache hit ratio",
+               fn=lambda: result_cache.stats()["hit_ratio"])
+GBIF_CACHES = (gbif_count_cache, gbif_species_cache)
+REGISTRY.gauge("gbif_cache_lookups_total", "GBIF cache lookups", ("cache", "result"), type="counter",
+               fn=lambda: {(c.name, result): getattr(c, attr) for c in GBIF_CACHES
+                           for result, attr in (("hit", "hits"), ("stale_hit", "stale_hits"),
+                                                ("miss", "misses"), ("coalesced", "coalesced"))})
+REGISTRY.gauge("gbif_cache_hit_ratio", "GBIF cache hit ratio (fresh + stale)", ("cache",),
+               fn=lambda: {c.name: c.stats()["hit_ratio"] for c in GBIF_CACHES})
+REGISTRY.gauge("gbif_cache_in_flight", "GBIF fetches in flight", ("cache",),
+               fn=lambda: {c.name: c.stats()["in_flight"] for c in GBIF_CACHES})
+REGISTRY.gauge("image_duplicate_lookups_total", "Near-duplicate index lookups", ("result",), type="counter",
+               fn=lambda: {"duplicate": duplicate_index.duplicates,
+                           "new": duplicate_index.lookups - duplicate_index.duplicates}
+               if duplicate_index else None)
+REGISTRY.gauge("image_fetch_total", "Image URL downloads", ("result",), type="counter",
+               fn=lambda: {"ok": image_fetcher.fetched, "failed": image_fetcher.failed})
+
 # Endangered species list (expandable)
 ENDANGERED_SPECIES = {
     "Panthera tigris",  # Tiger
     "Panthera leo",     # Lion
     "Panthera onca",    # Jaguar
-    "Snow Leopard",      # Uncia uncia
+    "Panthera uncia",    # Snow Leopard (syn. Uncia uncia)
     "Elephas maximus",   # Asian Elephant
     "Rhinoceros unicornis",  # Indian Rhino
     "Gorilla beringei",  # Mountain Gorilla
@@ -75,12 +296,57 @@ ENDANGERED_SPECIES = {
     "Macaca fascicularis",  # Crab-eating Macaque
 }
 
+# Common names and synonyms matched when no taxonomy index is loaded
+ENDANGERED_ALIASES = {
+    "Tiger": "Panthera tigris",
+    "Lion": "Panthera leo",
+    "Jaguar": "Panthera onca",
+    "Snow Leopard": "Panthera uncia",
+    "Uncia uncia": "Panthera uncia",
+    "Asian Elephant": "Elephas maximus",
+    "Indian Rhino": "Rhinoceros unicornis",
+    "Mountain Gorilla": "Gorilla beringei",
+    "Sumatran Orangutan": "Pongo abelii",
+    "Giant Panda": "Ailuropoda melanoleuca",
+    "Andean Condor": "Vultur gryphus",
+    "Golden Eagle": "Aquila chrysaetos",
+    "Nile Crocodile": "Crocodylus niloticus",
+    "Reticulated Python": "Python reticulatus",
+    "Crab-eating Macaque": "Macaca fascicularis",
+}
+
+# Local GBIF backbone names / synonyms / vernacular names (TAXONOMY_DB, see taxonomy_index.py)
+taxonomy_index = TaxonomyIndex.open_if_configured()
+# IUCN categories that count as endangered on top of ENDANGERED_SPECIES
+TAXONOMY_ENDANGERED_CATEGORIES = {
+    c.strip().upper() for c in os.getenv("TAXONOMY_ENDANGERED_CATEGORIES", "CR,EN").split(",") if c.strip()
+}
+ENDANGERED_NAMES = {normalize_name(name) for name in (*ENDANGERED_SPECIES, *ENDANGERED_ALIASES)}
+ENDANGERED_KEYS = set()
+if taxonomy_index is not None:
+    for name in ENDANGERED_SPECIES:
+        match = taxonomy_index.resolve(name)
+        if match is None:
+            print(f"[WARNING] Endangered species not in taxonomy index: {name}")
+        else:
+            ENDANGERED_KEYS.add(match.taxon.key)
+
+def is_endangered_species(species: str) -> bool:
+    """
+    Endangered check by accepted taxon key, so synonyms, vernacular names and
+    case variants match; a normalised name comparison without the index.
+    """
+    if taxonomy_index is not None:
+        match = taxonomy_index.resolve(species)
+        if match is not None:
+            return match.taxon.key in ENDANGERED_KEYS or match.taxon.iucn in TAXONOMY_ENDANGERED_CATEGORIES
+    return normalize_name(species) in ENDANGERED_NAMES
+
 class GBIFInput(BaseModel):
     species: str
     lat: float
     lon: float
     radius: int = 25
-    limit: int = 300
 
 class GBIFOutput(BaseModel):
     riskScore: float
@@ -90,64 +356,146 @@ class GBIFOutput(BaseModel):
     trendRatio: float
     isEndangered: bool
     humanProximity: float
+    dataAgeSeconds: Optional[float] = None  # set when served from the watchlist snapshot
 
-def fetch_gbif_occurrences(species: str, lat: float, lon: float, radius: int, limit: int):
-    """Fetch occurrence data from GBIF API"""
-    url = "https://api.gbif.org/v1/occurrence/search"
-    params = {
+def gbif_occurrence_params(species: str, lat: float, lon: float, radius: int) -> dict:
+    """Base occurrence/search filter for count queries"""
+    return {
         "scientificName": species,
         "decimalLatitude": lat,
         "decimalLongitude": lon,
-        "radius": radius,
-        "limit": limit
+        "radius": radius
     }
+
+async def count_gbif_occurrences(species: str, lat: float, lon: float, radius: int,
+                                 to_date: Optional[str] = None) -> Optional[int]:
+    """Exact occurrence count for the grid cell around (lat, lon); None on failure"""
+    lat, lon = snap_to_cell(lat), snap_to_cell(lon)
+    key = ("count", species, lat, lon, radius, to_date)
+    return await gbif_count_cache.get(
+        key, lambda: _fetch_gbif_count(species, lat, lon, radius, to_date)
+    )
+
+async def _fetch_gbif_count(species: str, lat: float, lon: float, radius: int,
+                            to_date: Optional[str]) -> Optional[int]:
+    """Count via limit=0 (no records transferred)"""
+    params = gbif_occurrence_params(species, lat, lon, radius)
+    params["limit"] = 0
+    if to_date:
+        params["toDate"] = to_date
     
     try:
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        return response.json()["results"]
-    except requests.exceptions.RequestException as e:
+        response = await gbif_client.get_json("occurrence/search", params)
+        return int(response["count"])
+    except (GBIFError, KeyError, TypeError, ValueError) as e:
         print(f"GBIF API Error: {e}")
-        return []
+        return None
+
+def historical_cutoff() -> str:
+    """Records on or before this date form the historical baseline"""
+    return (datetime.now() - timedelta(days=90)).strftime("%Y-%m-%d")
 
-def get_historical_average(species: str, lat: float, lon: float, radius: int):
-    """Get historical average from older data (90+ days ago)"""
-    url = "https://api.gbif.org/v1/occurrence/search"
-    to_date = (datetime.now() - timedelta(days=90)).strftime("%Y-%m-%d")
+async def get_historical_average(species: str, lat: float, lon: float, radius: int) -> Optional[int]:
+    """Get historical count from older data (90+ days ago); None on failure"""
+    to_date = historical_cutoff()
+    return await count_gbif_occurrences(species, lat, lon, radius, to_date=to_date)
+
+# Optional local copy of GBIF downloads (OCCURRENCE_DB, see occurrence_store.py)
+occurrence_store = OccurrenceStore.open_if_configured()
+
+async def local_occurrence_counts(species: str, lat: float, lon: float, radius: int):
+    """
+    (recent, historical) counts from the local store, or None if it does not
+    cover the point or never ingested the species (absence there is not data)
+    """
+    if occurrence_store is None or not occurrence_store.covers(lat, lon):
+        return None
+    to_date = historical_cutoff()
     
-    params = {
-        "scientificName": species,
-        "decimalLatitude": lat,
-        "decimalLongitude": lon,
-        "radius": radius,
-        "limit": 100,
-        "toDate": to_date
-    }
+    def query():
+        if not occurrence_store.has_species(species):
+            return None
+        return (
+            occurrence_store.count(species, lat, lon, radius),
+            occurrence_store.count(species, lat, lon, radius, to_date=to_date)
+        )
     
     try:
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        return len(response.json()["results"])
-    except:
-        return 4  # Default fallback
+        return await asyncio.to_thread(query)
+    except sqlite3.Error as e:
+        print(f"Occurrence store error: {e}")
+        return None
+
+# Precomputed proximity raster (SETTLEMENT_RASTER, see settlement_raster.py)
+settlement_raster = SettlementRaster.open_if_configured()
+
+def calculate_human_proximity_many(lats, lons) -> List[float]:
+    """Vectorized calculate_human_proximity (same fallback and rounding)"""
+    if settlement_raster is None:
+        return [calculate_human_proximity(lat, lon) for lat, lon in zip(lats, lons)]
+    values = settlement_raster.lookup_many(lats, lons)
+    return [0.7 if np.isnan(v) else round(v, 3) for v in values.tolist()]
+
+# Weekly per-species per-cell counts with rolling windows (SIGHTING_SERIES_DB, see sighting_series.py)
+sighting_series = SightingSeries.open_if_configured()
+
+async def observation_counts(species: str, lat: float, lon: float, radius: int, strict: bool = False):
+    """
+    (recent, historical, trend_ratio): weekly series first (normalised rates,
+    no I/O), then the local store, otherwise GBIF count queries. trend_ratio
+    is None unless it comes from the series. A failed GBIF count falls back
+    to defaults, or raises GBIFError when strict.
+    """
+    if sighting_series is not None and sighting_series.refresh_due():
+        # Pick up ingest / pull runs from the CLI without a restart
+        try:
+            await asyncio.to_thread(sighting_series.refresh)
+        except sqlite3.Error as e:
+            print(f"[ERROR] Sighting series reload failed: {e}")
+    # Only species the series has counted: an unknown one would read as a 0.0x decline
+    if (sighting_series is not None and sighting_series.covers(lat, lon)
+            and sighting_series.has_species(species)):
+        trend = sighting_series.trend(species, lat, lon, radius)
+        return trend["recent"], trend["baseline"], trend["trend_ratio"]
+    
+    local_counts = await local_occurrence_counts(species, lat, lon, radius)
+    if local_counts is not None:
+        return (*local_counts, None)
+    
+    # Count recent occurrences and historical average concurrently
+    # (count-only queries, no records downloaded)
+    recent_count, historical_avg = await asyncio.gather(
+        count_gbif_occurrences(species, lat, lon, radius),
+        get_historical_average(species, lat, lon, radius)
+    )
+    if strict and (recent_count is None or historical_avg is None):
+        raise GBIFError("GBIF count unavailable")
+    return recent_count or 0, 4 if historical_avg is None else historical_avg, None  # Default fallback
 
 def calculate_human_proximity(lat: float, lon: float) -> float:
     """
-    Simple heuristic for human proximity
-    In production, this would use settlement data
+    Human proximity from the settlement raster
     Returns value 0-1 (1 = very close to human areas)
     """
-    # This is a simplified heuristic
-    # In production, integrate with settlement databases
+    if settlement_raster is not None:
+        proximity = settlement_raster.lookup(lat, lon)
+        if proximity is not None:
+            return round(proximity, 3)
+    # No raster coverage for this point
     return 0.7  # Placeholder - adjust based on location
 
-def gbif_risk_score(recent_count: int, historical_avg: int, is_endangered: bool, human_proximity: float) -> dict:
-    """Calculate risk score based on GBIF features"""
+def gbif_risk_score(recent_count: int, historical_avg: int, is_endangered: bool, human_proximity: float,
+                    trend_ratio: Optional[float] = None) -> dict:
+    """
+    Calculate risk score based on GBIF features
+    trend_ratio: precomputed recent / baseline rate (sighting series); default recent / historical counts
+    """
     score = 0.0
     reasons = []
     
     # Calculate trend ratio
-    trend_ratio = recent_count / max(historical_avg, 1)
+    if trend_ratio is None:
+        trend_ratio = recent_count / max(historical_avg, 1)
     
     # Endangered species check
     if is_endangered:
@@ -190,30 +538,62 @@ def gbif_risk_score(recent_count: int, historical_avg: int, is_endangered: bool,
         "trend_ratio": round(trend_ratio, 2)
     }
 
-@app.post("/gbif/classify", response_model=GBIFOutput)
-def classify_observation(data: GBIFInput):
-    """Classify observation risk using GBIF data"""
+RISK_LEVELS = np.array(["Positive", "At Risk", "High", "Critical"])
+
+def gbif_risk_score_vectorized(recent_counts, historical_avgs, is_endangered, human_proximity,
+                               trend_ratios=None) -> dict:
+    """
+    Array version of gbif_risk_score (same thresholds, same float operations,
+    so scores, levels and trend ratios match the scalar scorer exactly).
+    Reasons are not produced; use the scalar scorer for a single point.
+    trend_ratios: per-cell precomputed ratios, None entries fall back to counts.
+    """
+    recent = np.asarray(recent_counts, dtype=np.float64)
+    historical = np.maximum(np.asarray(historical_avgs, dtype=np.float64), 1)
+    endangered = np.broadcast_to(np.asarray(is_endangered, dtype=bool), recent.shape)
+    proximity = np.broadcast_to(np.asarray(human_proximity, dtype=np.float64), recent.shape)
     
-    # Fetch recent occurrences
-    recent_records = fetch_gbif_occurrences(
-        data.species, data.lat, data.lon, data.radius, data.limit
+    trend_ratio = recent / historical
+    if trend_ratios is not None:
+        given = np.array([np.nan if t is None else t for t in trend_ratios], dtype=np.float64)
+        trend_ratio = np.where(np.isnan(given), trend_ratio, given)
+    score = np.where(endangered, 0.0 + 1.5, 0.0)
+    score = score + np.select(
+        [trend_ratio >= 3.0, trend_ratio >= 2.0, trend_ratio < 0.5], [1.5, 1.2, 1.0], 0.0
     )
-    recent_count = len(recent_records)
+    score = score + np.select([proximity >= 0.7, proximity >= 0.4], [0.8, 0.4], 0.0)
+    level_index = (score >= 1.0).astype(int) + (score >= 2.0) + (score >= 3.0)
     
-    # Get historical average
-    historical_avg = get_historical_average(
-        data.species, data.lat, data.lon, data.radius
+    # Python round() per element so rounding matches the scalar scorer
+    return {
+        "score": [round(x, 2) for x in score.tolist()],
+        "level": RISK_LEVELS[level_index].tolist(),
+        "trend_ratio": [round(x, 2) for x in trend_ratio.tolist()]
+    }
+
+@app.post("/gbif/classify", response_model=GBIFOutput)
+async def classify_observation(data: GBIFInput):
+    """Classify observation risk using GBIF data (precomputed for watchlist points)"""
+    entry = watchlist.get(gbif_watch_key(data.species, data.lat, data.lon, data.radius)) if watchlist else None
+    if entry is not None:
+        return GBIFOutput(**{**entry.result, "dataAgeSeconds": round(time.time() - entry.computed_at, 1)})
+    return await compute_observation_risk(data)
+
+async def compute_observation_risk(data: GBIFInput, strict: bool = False) -> GBIFOutput:
+    """Live risk for one species x location (counts, proximity, score); strict as observation_counts"""
+    recent_count, historical_avg, trend_ratio = await observation_counts(
+        data.species, data.lat, data.lon, data.radius, strict
     )
     
     # Check if endangered
-    is_endangered = data.species in ENDANGERED_SPECIES
+    is_endangered = is_endangered_species(data.species)
     
-    # Calculate human proximity (simplified)
+    # Calculate human proximity (settlement raster lookup)
     human_proximity = calculate_human_proximity(data.lat, data.lon)
     
     # Calculate risk
     risk_result = gbif_risk_score(
-        recent_count, historical_avg, is_endangered, human_proximity
+        recent_count, historical_avg, is_endangered, human_proximity, trend_ratio
     )
     
     return GBIFOutput(
@@ -226,23 +606,217 @@ def classify_observation(data: GBIFInput):
         humanProximity=human_proximity
     )
 
+GBIF_BATCH_CONCURRENCY = int(os.getenv("GBIF_BATCH_CONCURRENCY", "8"))
+GBIF_BATCH_MAX_ITEMS = int(os.getenv("GBIF_BATCH_MAX_ITEMS", "500"))
+
+@app.post("/gbif/classify/batch")
+async def classify_observation_batch(items: List[GBIFInput]):
+    """
+    Classify many species x location inputs in one call.
+    Streams NDJSON lines ({"index", "result"} or {"index", "error"}) as each
+    finishes; identical inputs are computed once and identical GBIF queries
+    share one request through the count cache.
+    """
+    if len(items) > GBIF_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {GBIF_BATCH_MAX_ITEMS} items")
+    
+    # Group duplicate inputs so each unique query runs once
+    unique = {}
+    for index, item in enumerate(items):
+        key = (item.species, item.lat, item.lon, item.radius)
+        unique.setdefault(key, (item, []))[1].append(index)
+    
+    limit = asyncio.Semaphore(GBIF_BATCH_CONCURRENCY)
+    
+    async def run(item: GBIFInput, indices: List[int]):
+        async with limit:
+            try:
+                result = await classify_observation(item)
+                return indices, {"result": result.model_dump()}
+            except Exception as e:
+                print(f"Batch classification error: {e}")
+                return indices, {"error": str(e)}
+    
+    async def stream():
+        tasks = [asyncio.ensure_future(run(item, indices)) for item, indices in unique.values()]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                indices, payload = await finished
+                yield "".join(
+                    json.dumps({"index": index, **payload}) + "\n" for index in indices
+                )
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+RISKMAP_MAX_CELLS = int(os.getenv("RISKMAP_MAX_CELLS", "500"))
+
+class AOI(BaseModel):
+    minLat: float = Field(ge=-90, le=90)
+    maxLat: float = Field(ge=-90, le=90)
+    minLon: float = Field(ge=-180, le=180)
+    maxLon: float = Field(ge=-180, le=180)
+
+class RiskMapInput(BaseModel):
+    species: str
+    aoi: Optional[AOI] = None   # default: Ganga corridor, clipped to risk_grid.CORRIDOR_BBOX
+    # 0.2 deg (~22 km): the default corridor map (Gangetic plain, ~65 cells) stays well under RISKMAP_MAX_CELLS
+    cellDeg: float = Field(0.2, ge=0.01, le=5.0)
+    bufferKm: float = Field(10.0, gt=0, le=100)  # corridor buffer when no AOI is given
+    radius: Optional[int] = Field(None, ge=1, le=500)  # per-cell search radius (km), default covers the cell
+
+@app.post("/gbif/riskmap")
+async def risk_map(data: RiskMapInput):
+    """
+    Risk heatmap for one species over grid cells along the Ganga corridor
+    (ai/data/ganga_river.geojson) or a given AOI, scored in one vectorized pass
+    """
+    try:
+        if data.aoi:
+            if data.aoi.minLat >= data.aoi.maxLat or data.aoi.minLon >= data.aoi.maxLon:
+                raise HTTPException(status_code=422, detail="aoi min bounds must be below max bounds")
+            # Sized from the bounds before any cell is allocated
+            lats, lons = aoi_cells(data.aoi.model_dump(), data.cellDeg, RISKMAP_MAX_CELLS)
+        else:
+            lats, lons = corridor_cells(data.cellDeg, data.bufferKm)
+    except TooManyCells as e:
+        # The corridor's candidate bound may be the limit that tripped, not RISKMAP_MAX_CELLS
+        raise HTTPException(
+            status_code=413,
+            detail=f"{e.cells} cells exceeds {e.limit}; use a larger cellDeg or smaller area"
+        )
+    if len(lats) > RISKMAP_MAX_CELLS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{len(lats)} cells exceeds {RISKMAP_MAX_CELLS}; use a larger cellDeg or smaller area"
+        )
+    lats, lons = lats.tolist(), lons.tolist()
+    radii = [data.radius or cell_radius_km(data.cellDeg, lat) for lat in lats]
+    
+    # Counts per cell go through the local store / GBIF count cache,
+    # so repeated maps and overlapping classify calls reuse them
+    limit = asyncio.Semaphore(GBIF_BATCH_CONCURRENCY)
+    
+    async def cell_counts(lat: float, lon: float, radius: int):
+        async with limit:
+            return await observation_counts(data.species, lat, lon, radius)
+    
+    counts = await asyncio.gather(*[
+        cell_counts(lat, lon, radius) for lat, lon, radius in zip(lats, lons, radii)
+    ])
+    recent = [c[0] for c in counts]
+    historical = [c[1] for c in counts]
+    trend_ratios = [c[2] for c in counts]
+    is_endangered = is_endangered_species(data.species)
+    proximity = calculate_human_proximity_many(lats, lons)
+    risk = gbif_risk_score_vectorized(recent, historical, is_endangered, proximity,
+                                      None if all(t is None for t in trend_ratios) else trend_ratios)
+    
+    return {
+        "species": data.species,
+        "isEndangered": is_endangered,
+        "cellDeg": data.cellDeg,
+        "cells": [
+            {
+                "lat": lats[i],
+                "lon": lons[i],
+                "radius": radii[i],
+                "riskScore": risk["score"][i],
+                "riskLevel": risk["level"][i],
+                "observations": recent[i],
+                "trendRatio": risk["trend_ratio"][i],
+                "humanProximity": proximity[i]
+            }
+            for i in range(len(lats))
+        ],
+        "lastUpdate": datetime.now().isoformat()
+    }
+
+def taxonomy_match(match) -> dict:
+    """species/match-shaped record for a local taxonomy match"""
+    taxon = match.taxon
+    return {
+        "usageKey": taxon.key,
+        "scientificName": taxon.scientific_name,
+        "canonicalName": taxon.canonical_name,
+        "rank": taxon.rank,
+        "kingdom": taxon.kingdom,
+        "family": taxon.family,
+        "matchedName": match.name,
+        "nameType": match.kind,
+        "matchType": match.match_type,
+        "confidence": match.confidence,
+        "iucnCategory": taxon.iucn,
+    }
+
 @app.get("/gbif/search")
-def search_species(q: str, limit: int = 10):
-    """Search GBIF species database"""
-    url = "https://api.gbif.org/v1/species/match"
+async def search_species(q: str, limit: int = 10):
+    """Search GBIF species database (local taxonomy index first: exact, prefix, then fuzzy)"""
+    if taxonomy_index is not None:
+        count = max(1, min(limit, 100))
+        matches = taxonomy_index.complete(q, count)
+        if not matches:
+            # Trigram matching takes milliseconds on a full backbone; keep it off the loop
+            matches = await asyncio.to_thread(taxonomy_index.fuzzy, q, count)
+        if matches:
+            best = taxonomy_match(matches[0])
+            return {**best, "alternatives": [taxonomy_match(m) for m in matches[1:]], "source": "local"}
+
     params = {"name": q, "limit": limit}
     
     try:
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        return response.json()
-    except:
+        return await gbif_species_cache.get(
+            (q, limit), lambda: gbif_client.get_json("species/match", params)
+        )
+    except GBIFError:
         return {"error": "Search failed"}
 
+@app.get("/gbif/cache/stats")
+def gbif_cache_stats():
+    """Hit/stale/coalescing counters for the GBIF lookup caches"""
+    return {
+        "occurrences": gbif_count_cache.stats(),
+        "species": gbif_species_cache.stats(),
+        "series": sighting_series.stats() if sighting_series else None,
+        "taxonomy": taxonomy_index.stats() if taxonomy_index else None
+    }
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "service": "GBIF ML API"}
 
+@app.get("/health/live")
+def liveness():
+    """Process is up and serving; never touches the model (use for platform health checks)"""
+    return {"status": "alive", "service": "GBIF ML API"}
+
+@app.get("/health/ready")
+def readiness():
+    """Image model loaded (or lazy loading enabled); 503 while the warm-up is still running"""
+    state = model_status["state"]
+    ready = state == "ready" or (not MODEL_WARMUP and state != "failed")
+    content = {"status": "ready" if ready else state, "model": dict(model_status, id=MODEL_ID)}
+    if ready:
+        return content
+    return JSONResponse(status_code=503, content=content,
+                        headers={"Retry-After": str(MODEL_LOADING_RETRY_AFTER_S)})
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text exposition of every registered metric"""
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/health/memory")
+def memory_usage():
+    """Resident memory of this worker (RSS counts shared model pages in every worker; PSS splits them)"""
+    try:
+        memory = process_memory(os.getpid())
+    except OSError as e:
+        return {"error": f"Memory stats not available: {e}"}
+    return dict(memory, model_loaded=classifier is not None)
+
 @app.get("/docs", include_in_schema=False)
 async def custom_swagger_ui_html():
     """Custom Swagger UI with BioSentinel branding"""
@@ -258,24 +832,70 @@ def api_root():
 
 # Satellite Analysis Models
 class SatelliteInput(BaseModel):
-    aoi: dict  # {minLat, maxLat, minLon, maxLon}
+    aoi: dict  # {minLat, maxLat, minLon, maxLon} or {lat, lon, radiusKm}
     layers: List[str]  # ["fire", "vegetation"]
+    days: Optional[int] = None  # hotspot window, ending at the latest detection
 
 class SatelliteOutput(BaseModel):
     fireHotspots: Optional[int] = None
     vegetationIndex: Optional[float] = None
     riskLevel: str
     lastUpdate: str
+    source: Optional[str] = None  # "raster" (local tiles / hotspot index) or "simulated"
+    dataAgeSeconds: Optional[float] = None  # set when served from the watchlist snapshot
+
+# Local NDVI / fire tiles (RASTER_TILE_DIR, see raster_tiles.py)
+raster_tiles = TileStore.open_if_configured()
+
+# FIRMS hotspot points (HOTSPOT_DIR, see hotspot_index.py)
+hotspot_index = HotspotIndex.open_if_configured()
+
+def get_hotspot_count(aoi: dict, days: Optional[int] = None) -> Optional[int]:
+    """Hotspots in a bbox or circle AOI from the point index, None when not loaded"""
+    if hotspot_index is None:
+        return None
+    hotspot_index.refresh()
+    if not hotspot_index.points:
+        return None
+    from_day, to_day = hotspot_index.window(days)
+    if "radiusKm" in aoi:
+        return hotspot_index.count_radius(aoi["lat"], aoi["lon"], aoi["radiusKm"], from_day, to_day)
+    return hotspot_index.count_bbox(aoi, from_day, to_day)
+
+def get_raster_data(aoi: dict, layers: List[str], days: Optional[int] = None) -> dict:
+    """Point index / windowed tile reads; layers without coverage are left out"""
+    result = {}
+    if "fire" in layers:
+        hotspots = get_hotspot_count(aoi, days)
+        if hotspots is not None:
+            result["fireHotspots"] = hotspots
+    if "radiusKm" in aoi:
+        aoi = radius_bbox(aoi["lat"], aoi["lon"], aoi["radiusKm"])
+    if raster_tiles is None:
+        return result
+    if "fire" in layers and "fireHotspots" not in result:
+        hotspots = raster_tiles.hotspot_count(aoi)
+        if hotspots is not None:
+            result["fireHotspots"] = hotspots
+    if "vegetation" in layers:
+        ndvi = raster_tiles.mean_ndvi(aoi)
+        if ndvi is not None:
+            result["vegetationIndex"] = max(0, min(1, round(ndvi, 2)))
+    return result
 
-# Simulated satellite data based on AOI
-def get_satellite_data(aoi: dict, layers: List[str]) -> dict:
-    """Get simulated satellite data for the AOI"""
+# Satellite data from local tiles, simulated where no tiles cover the AOI
+def get_satellite_data(aoi: dict, layers: List[str], days: Optional[int] = None) -> dict:
+    """Get satellite data for the AOI"""
     import random
     
-    result = {}
+    result = get_raster_data(aoi, layers, days)
+    from_raster = bool(result)
+    if "radiusKm" in aoi:
+        aoi = radius_bbox(aoi["lat"], aoi["lon"], aoi["radiusKm"])
     
     # Simulate fire hotspots (NASA FIRMS data simulation)
-    if "fire" in layers:
+    if "fire" in layers and "fireHotspots" not in result:
+        from_raster = False
         # Higher latitude regions have more fire activity
         lat_range = aoi["maxLat"] - aoi["minLat"]
         fire_probability = (lat_range / 50) * 0.3  # Normalized
@@ -283,7 +903,8 @@ def get_satellite_data(aoi: dict, layers: List[str]) -> dict:
         result["fireHotspots"] = max(0, fire_count)
     
     # Simulate vegetation index (NDVI)
-    if "vegetation" in layers:
+    if "vegetation" in layers and "vegetationIndex" not in result:
+        from_raster = False
         # Tropical regions have higher NDVI
         avg_lat = (aoi["minLat"] + aoi["maxLat"]) / 2
         is_tropical = abs(avg_lat) < 23.5
@@ -315,21 +936,131 @@ def get_satellite_data(aoi: dict, layers: List[str]) -> dict:
         risk_level = "Positive"
     
     result["riskLevel"] = risk_level
-    result["lastUpdate"] = datetime.now().isoformat()
+    result["source"] = "raster" if from_raster else "simulated"
+    updates = []
+    if from_raster and raster_tiles is not None:
+        updates.append(raster_tiles.last_update(["fire", "ndvi"]))
+    if from_raster and hotspot_index is not None:
+        updates.append(hotspot_index.updated)
+    result["lastUpdate"] = max((u for u in updates if u), default=None) or datetime.now().isoformat()
     
     return result
 
 @app.post("/satellite/analyze", response_model=SatelliteOutput)
 def analyze_satellite(data: SatelliteInput):
-    """Analyze satellite data for the given AOI"""
-    satellite_data = get_satellite_data(data.aoi, data.layers)
+    """Analyze satellite data for the given AOI (precomputed for watchlist points)"""
+    key = satellite_watch_key(data.aoi, data.layers, data.days)
+    entry = watchlist.get(key) if watchlist and key else None
+    if entry is not None:
+        satellite_data, age = entry.result, round(time.time() - entry.computed_at, 1)
+    else:
+        satellite_data, age = get_satellite_data(data.aoi, data.layers, data.days), None
     
     return SatelliteOutput(
         fireHotspots=satellite_data.get("fireHotspots"),
         vegetationIndex=satellite_data.get("vegetationIndex"),
         riskLevel=satellite_data["riskLevel"],
-        lastUpdate=satellite_data["lastUpdate"]
+        lastUpdate=satellite_data["lastUpdate"],
+        source=satellite_data["source"],
+        dataAgeSeconds=age
+    )
+
+@app.get("/satellite/hotspots/nearest")
+def nearest_hotspots(lat: float, lon: float, k: int = 10, maxKm: float = 200.0,
+                     days: Optional[int] = None):
+    """FIRMS hotspots closest to a sighting, nearest first"""
+    if hotspot_index is None:
+        return {"error": "Hotspot index not configured (set HOTSPOT_DIR)"}
+    hotspot_index.refresh()
+    from_day, to_day = hotspot_index.window(days)
+    hotspots = hotspot_index.nearest(lat, lon, max(1, min(k, 500)), maxKm, from_day, to_day)
+    return {
+        "lat": lat,
+        "lon": lon,
+        "count": len(hotspots),
+        "hotspots": hotspots,
+        "lastUpdate": hotspot_index.updated,
+    }
+
+@app.get("/satellite/stats")
+def satellite_stats():
+    """Local raster tile and hotspot index statistics"""
+    return {
+        "raster_tiles": raster_tiles.stats() if raster_tiles is not None else None,
+        "hotspot_index": hotspot_index.stats() if hotspot_index is not None else None,
+    }
+
+# --- Watchlist precompute (see watchlist.py) ---
+WATCHLIST_RADIUS_KM = int(os.getenv("WATCHLIST_RADIUS_KM", "25"))
+WATCHLIST_LAYERS = ("fire", "vegetation")
+
+def gbif_watch_key(species: str, lat: float, lon: float, radius: int) -> tuple:
+    # Same grid cell as the count cache, so nearby requests share the precomputed point
+    return ("gbif", species, snap_to_cell(lat), snap_to_cell(lon), radius)
+
+def satellite_watch_key(aoi: dict, layers: List[str], days: Optional[int] = None) -> Optional[tuple]:
+    """Key for circle AOIs over the default window; other requests are always computed live"""
+    if days is not None or "radiusKm" not in aoi:
+        return None
+    return ("satellite", snap_to_cell(aoi["lat"]), snap_to_cell(aoi["lon"]), float(aoi["radiusKm"]),
+            tuple(sorted(set(layers))))
+
+def watchlist_items() -> list:
+    """ENDANGERED_SPECIES x watch points, plus satellite layers per point when local tiles exist"""
+    items = []
+    for point in load_points():
+        for species in sorted(ENDANGERED_SPECIES):
+            items.append(gbif_watch_key(species, point["lat"], point["lon"], WATCHLIST_RADIUS_KM))
+        if raster_tiles is not None or hotspot_index is not None:
+            items.append(satellite_watch_key(
+                {"lat": point["lat"], "lon": point["lon"], "radiusKm": WATCHLIST_RADIUS_KM},
+                list(WATCHLIST_LAYERS)))
+    return items
+
+async def compute_watch_item(key: tuple) -> dict:
+    if key[0] == "gbif":
+        _, species, lat, lon, radius = key
+        # Strict: a GBIF outage raises, so the scheduler keeps the last good result
+        # instead of freezing the 0-recent / default-baseline "decline" for a cycle
+        result = await compute_observation_risk(GBIFInput(species=species, lat=lat, lon=lon, radius=radius),
+                                                strict=True)
+        return result.model_dump()
+    _, lat, lon, radius_km, layers = key
+    result = await asyncio.to_thread(
+        get_satellite_data, {"lat": lat, "lon": lon, "radiusKm": radius_km}, list(layers)
     )
+    # Simulated values are random per call; never freeze one for hours
+    return result if result.get("source") == "raster" else None
+
+# Opt-in: one worker computes (file lock), the others read its snapshot file
+watchlist = (WatchlistScheduler(watchlist_items(), compute_watch_item)
+             if os.getenv("WATCHLIST_ENABLED", "0") == "1" else None)
+
+REGISTRY.gauge("watchlist_items", "Watchlist items with a precomputed result", ("state",),
+               fn=lambda: {"ready": len(watchlist.snapshot), "total": len(watchlist.items)}
+               if watchlist else None)
+REGISTRY.gauge("watchlist_oldest_age_seconds", "Age of the oldest precomputed watchlist result",
+               fn=lambda: watchlist.stats()["oldest_age_s"] if watchlist else None)
+
+@app.get("/watchlist")
+def watchlist_snapshot(species: Optional[str] = None):
+    """Precomputed watchlist results with their age"""
+    if watchlist is None:
+        return {"enabled": False}
+    now = time.time()
+    entries = []
+    for key, entry in watchlist.snapshot.items():
+        if key[0] == "gbif":
+            if species and key[1] != species:
+                continue
+            location = {"species": key[1], "lat": key[2], "lon": key[3], "radius": key[4]}
+        else:
+            if species:
+                continue
+            location = {"lat": key[1], "lon": key[2], "radiusKm": key[3], "layers": list(key[4])}
+        entries.append({"kind": key[0], **location, "ageSeconds": round(now - entry.computed_at, 1),
+                        "result": entry.result})
+    return {"enabled": True, **watchlist.stats(), "entries": entries}
 
 @app.get("/")
 def root():
@@ -337,214 +1068,182 @@ def root():
         "message": "BioSentinel GBIF ML API",
         "endpoints": {
             "POST /gbif/classify": "Classify observation risk",
+            "POST /gbif/classify/batch": "Classify many observations (NDJSON stream)",
+            "POST /gbif/riskmap": "Risk heatmap along the Ganga corridor or an AOI",
             "GET /gbif/search": "Search GBIF species",
+            "GET /gbif/cache/stats": "GBIF cache statistics",
+            "GET /watchlist": "Precomputed watchlist risk results and their age",
+            "POST /satellite/analyze": "Fire hotspots and NDVI for an AOI",
+            "GET /satellite/hotspots/nearest": "FIRMS hotspots nearest to a sighting",
             "GET /health": "Health check",
-            "POST /classify/image": "Classify image as AI-generated or Human"
+            "GET /health/live": "Liveness (process up)",
+            "GET /health/ready": "Readiness (image model loaded)",
+            "POST /classify/image": "Classify image as AI-generated or Human",
+            "POST /classify/image/url/batch": "Classify many image URLs (NDJSON stream)",
+            "GET /classify/image/stats": "Inference batching and cache statistics"
         }
     }
 
 @app.post("/classify/image")
-async def classify_image(file: UploadFile = File(...)):
+async def classify_image(file: UploadFile = File(...), timings: bool = False):
     """
     Classify an image as AI-generated or Human using Hugging Face model
     Model: Ateeqq/ai-vs-human-image-detector
     """
-    try:
-        # Load classifier if not already loaded
-        clf = get_classifier()
-        if clf is None:
-            return {"error": "Image classifier not available. Please install dependencies."}
-        
-        # Read and process image
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Process image and get predictions
-        inputs = clf["processor"](images=image, return_tensors="pt")
-        with torch.no_grad():
-            outputs = clf["model"](**inputs)
-            logits = outputs.logits
-            predicted_class_idx = logits.argmax(-1).item()
-            probabilities = torch.softmax(logits, dim=1)[0]
-        
-        # Get class labels (AI or Human)
-        labels = clf["model"].config.id2label
-        predictions = []
-        for idx in range(len(probabilities)):
-            predictions.append({
-                "label": labels[idx],
-                "confidence": float(probabilities[idx])
-            })
-        
-        # Sort by confidence
-        predictions.sort(key=lambda x: x["confidence"], reverse=True)
-        
-        # Determine result
-        top_prediction = predictions[0]
-        label_lower = top_prediction["label"].lower()
-        is_ai = "ai" in label_lower or "artificial" in label_lower
-        
+    async def handler(clf):
+        source, content_digest = await hash_upload(file)
+        result = await image_pipeline.run(source, content_digest, ("classify",))
         return {
             "filename": file.filename,
-            "predictions": predictions,
-            "result": "AI-Generated" if is_ai else "Human-Created",
-            "confidence": top_prediction["confidence"],
-            "is_ai_generated": is_ai
+            **format_predictions(clf, result["probabilities"]),
+            "duplicate_submission": duplicate_submission(result),
+            **(stage_timings(result) if timings else {})
         }
-    except Exception as e:
-        print(f"Image classification error: {e}")
-        return {"error": str(e)}
+    
+    return await image_route(handler, "Image classification error")
+
+@app.get("/classify/image/stats")
+def classify_image_stats():
+    """Batch-size and queue-wait histograms for tuning the batching window"""
+    return {
+        **inference_batcher.stats(),
+        "executor": inference_executor.stats(),
+        "fetcher": image_fetcher.stats(),
+        "cache": result_cache.stats(),
+        "duplicates": duplicate_index.stats() if duplicate_index else None
+    }
 
 @app.post("/classify/image/url")
-async def classify_image_url(url: str):
+async def classify_image_url(url: str, timings: bool = False):
     """
     Classify an image from URL as AI-generated or Human using Hugging Face model
     """
-    try:
-        # Load classifier if not already loaded
-        clf = get_classifier()
-        if clf is None:
-            return {"error": "Image classifier not available. Please install dependencies."}
-        
-        # Download and process image
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        image = Image.open(io.BytesIO(response.content))
-        
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Process image and get predictions
-        inputs = clf["processor"](images=image, return_tensors="pt")
-        with torch.no_grad():
-            outputs = clf["model"](**inputs)
-            logits = outputs.logits
-            probabilities = torch.softmax(logits, dim=1)[0]
-        
-        # Get class labels
-        labels = clf["model"].config.id2label
-        predictions = []
-        for idx in range(len(probabilities)):
-            predictions.append({
-                "label": labels[idx],
-                "confidence": float(probabilities[idx])
-            })
-        
-        # Sort by confidence
-        predictions.sort(key=lambda x: x["confidence"], reverse=True)
-        
-        # Determine result
-        top_prediction = predictions[0]
-        is_ai = "ai" in top_prediction["label"].lower() or "artificial" in top_prediction["label"].lower()
-        
+    async def handler(clf):
+        # Stream the download (size-capped, hashed on the way) and classify
+        contents, content_digest = await image_fetcher.fetch(url)
+        result = await image_pipeline.run(contents, content_digest, ("classify",))
+        verdict = format_predictions(clf, result["probabilities"])
         return {
             "url": url,
-            "predictions": predictions,
-            "result": "AI-Generated" if is_ai else "Human-Created",
-            "confidence": top_prediction["confidence"]
+            "predictions": verdict["predictions"],
+            "result": verdict["result"],
+            "confidence": verdict["confidence"],
+            "duplicate_submission": duplicate_submission(result),
+            **(stage_timings(result) if timings else {})
         }
-    except Exception as e:
-        print(f"Image classification error: {e}")
-        return {"error": str(e)}
+    
+    return await image_route(handler, "Image classification error")
+
+IMAGE_URL_BATCH_CONCURRENCY = int(os.getenv("IMAGE_URL_BATCH_CONCURRENCY", "8"))
+IMAGE_URL_BATCH_MAX_ITEMS = int(os.getenv("IMAGE_URL_BATCH_MAX_ITEMS", "64"))
+
+@app.post("/classify/image/url/batch")
+async def classify_image_url_batch(urls: List[str]):
+    """
+    Classify many image URLs in one call.
+    Downloads run concurrently and share the batched inference path; NDJSON
+    lines ({"index", "url", "result"} or {"index", "url", "error"}) stream
+    back as each URL finishes. Repeated URLs are fetched once.
+    """
+    if len(urls) > IMAGE_URL_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {IMAGE_URL_BATCH_MAX_ITEMS} URLs")
+    try:
+        clf = await load_classifier()
+    except InferenceOverloaded as e:
+        return overloaded_response(e)
+    if clf is None:
+        return {"error": "Image classifier not available. Please install dependencies."}
+    
+    unique = {}
+    for index, url in enumerate(urls):
+        unique.setdefault(url, []).append(index)
+    
+    limit = asyncio.Semaphore(IMAGE_URL_BATCH_CONCURRENCY)
+    
+    async def run(url: str, indices: List[int]):
+        async with limit:
+            try:
+                # Each URL counts against the in-flight limit like a single request
+                with inference_executor.slot():
+                    contents, content_digest = await image_fetcher.fetch(url)
+                    result = await image_pipeline.run(contents, content_digest, ("classify",))
+                return indices, url, {"result": format_predictions(clf, result["probabilities"]),
+                                      "duplicate_submission": duplicate_submission(result)}
+            except Exception as e:
+                print(f"Batch image classification error: {e}")
+                return indices, url, {"error": str(e)}
+    
+    async def stream():
+        tasks = [asyncio.ensure_future(run(url, indices)) for url, indices in unique.items()]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                indices, url, payload = await finished
+                yield "".join(
+                    json.dumps({"index": index, "url": url, **payload}) + "\n" for index in indices
+                )
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 @app.post("/classify/image/analyze")
-async def analyze_image_full(file: UploadFile = File(...)):
+async def analyze_image_full(file: UploadFile = File(...), exif: bool = False, timings: bool = False):
     """
-    Full image analysis: AI detection + Pixel quality analysis
+    Full image analysis: AI detection + Pixel quality analysis (+ EXIF checks with ?exif=true)
     Returns whether image is AI-generated and pixel quality assessment
     """
-    try:
-        # Load classifier if not already loaded
-        clf = get_classifier()
-        if clf is None:
-            return {"error": "Image classifier not available. Please install dependencies."}
-        
-        # Read and process image
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+    async def handler(clf):
+        source, content_digest = await hash_upload(file)
+        # One decode; the forward pass and pixel forensics run concurrently
+        stages = ("classify", "pixels", "exif") if exif else ("classify", "pixels")
+        result = await image_pipeline.run(source, content_digest, stages)
         
         # 1. AI Detection
-        inputs = clf["processor"](images=image, return_tensors="pt")
-        with torch.no_grad():
-            outputs = clf["model"](**inputs)
-            logits = outputs.logits
-            probabilities = torch.softmax(logits, dim=1)[0]
-        
-        labels = clf["model"].config.id2label
-        predictions = []
-        for idx in range(len(probabilities)):
-            predictions.append({
-                "label": labels[idx],
-                "confidence": float(probabilities[idx])
-            })
-        
-        predictions.sort(key=lambda x: x["confidence"], reverse=True)
-        
-        top_prediction = predictions[0]
-        label_lower = top_prediction["label"].lower()
-        is_ai = "ai" in label_lower or "artificial" in label_lower
-        ai_confidence = top_prediction["confidence"]
+        verdict = format_predictions(clf, result["probabilities"])
+        is_ai = verdict["is_ai_generated"]
+        ai_confidence = verdict["confidence"]
         
         # 2. Pixel Analysis for camera image quality
-        img_array = np.array(image)
-        height, width = img_array.shape[:2]
-        
-        # Calculate basic statistics
-        gray = np.mean(img_array, axis=2)
-        
-        # Standard deviation of pixel values (natural images have variation)
-        pixel_std = np.std(gray)
-        
-        # Calculate edge density (natural images have organic edges)
-        edges = np.abs(np.gradient(gray.astype(float)))
-        edge_density = np.sum(edges > 50) / (height * width)
+        pixel = result["pixels"]
+        is_suspicious_pixel = pixel["is_suspicious"]
         
-        # Check for perfect uniformity
-        unique_colors = len(np.unique(gray.reshape(-1)))
-        color_ratio = unique_colors / (height * width)
-        
-        # Pixel quality score (0-1, higher = more likely natural camera photo)
-        pixel_quality_score = min(1.0, (pixel_std / 50) * 0.5 + edge_density * 2 + color_ratio * 0.3)
-        
-        # Determine if pixel quality is suspicious
-        is_suspicious_pixel = pixel_quality_score > 0.95
+        # 3. Generator fingerprints in EXIF / PNG metadata (optional)
+        is_suspicious_exif = exif and result["exif"]["is_suspicious"]
         
         # Overall assessment
-        is_suspicious = is_ai or is_suspicious_pixel
+        is_suspicious = is_ai or is_suspicious_pixel or is_suspicious_exif
         
-        return {
+        response = {
             "filename": file.filename,
             "ai_detection": {
-                "result": "AI-Generated" if is_ai else "Human-Created",
+                "result": verdict["result"],
                 "confidence": ai_confidence,
                 "is_suspicious": is_ai
             },
             "pixel_analysis": {
-                "pixel_quality_score": round(float(pixel_quality_score), 4),
+                "pixel_quality_score": round(pixel["pixel_quality_score"], 4),
                 "is_suspicious": is_suspicious_pixel,
-                "pixel_std": round(float(pixel_std), 2),
-                "edge_density": round(float(edge_density), 4),
-                "unique_colors": unique_colors
+                "pixel_std": round(pixel["pixel_std"], 2),
+                "edge_density": round(pixel["edge_density"], 4),
+                "unique_colors": pixel["unique_colors"]
             },
+            "duplicate_submission": duplicate_submission(result),
             "overall_assessment": {
                 "is_accepted": not is_suspicious,
                 "reason": "Image rejected: AI-generated content detected" if (is_ai and ai_confidence > 0.7) else 
                          "Image rejected: Suspicious pixel patterns detected" if is_suspicious_pixel else
+                         "Image rejected: AI generator metadata found" if is_suspicious_exif else
                          "Image accepted: Appears to be a natural photo"
             }
         }
-    except Exception as e:
-        print(f"Full image analysis error: {e}")
-        return {"error": str(e)}
+        if exif:
+            response["exif_analysis"] = result["exif"]
+        if timings:
+            response.update(stage_timings(result))
+        return response
+    
+    return await image_route(handler, "Full image analysis error")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,33 @@
+"""
+Multi-worker serving for gbif_ml_api:app.
+
+    gunicorn -c gunicorn.conf.py gbif_ml_api:app
+
+With PRELOAD_MODEL=1 (default) the app and the image model are loaded once
+in the master before the workers fork, so every worker shares the same
+weight pages copy-on-write. With PRELOAD_MODEL=0 each worker imports the
+app itself and loads its own copy on first use / warm-up.
+
+Measure the difference with `python worker_memory.py <master-pid>` or
+GET /health/memory on each worker.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = os.getenv("PRELOAD_MODEL", "1") == "1"
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before any worker forks
+    if not preload_app:
+        return
+    import gbif_ml_api
+
+    if gbif_ml_api.share_classifier_before_fork() is not None:
+        server.log.info("Image model preloaded in master; workers share it copy-on-write")
+    # Keep the collector from touching (and so copying) every preloaded object in each worker
+    gc.freeze()
@@ -0,0 +1,290 @@
+"""
+In-memory spatial index over FIRMS fire hotspots.
+
+Points are partitioned by acquisition month. Inside a partition they are
+sorted by cell id on a global uniform grid (row-major, HOTSPOT_CELL_DEG
+cells), so every grid row of a bbox is one contiguous slice found with two
+binary searches. bbox / radius counts touch only the candidate points, and
+nearest-hotspot lookups widen the search ring until k points are found.
+
+New CSVs dropped into HOTSPOT_DIR (FIRMS archive or NRT exports) are picked
+up on the next refresh; only the months they touch are re-sorted, and
+detections already in the month's partition are skipped, so overlapping
+NRT files are safe.
+"""
+import csv
+import glob
+import math
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from raster_tiles import FIRE_CONFIDENCE_MIN, firms_confidence
+
+DEFAULT_HOTSPOT_DIR = os.getenv("HOTSPOT_DIR", "")
+DEFAULT_CELL_DEG = float(os.getenv("HOTSPOT_CELL_DEG", "0.1"))
+DEFAULT_WINDOW_DAYS = int(os.getenv("HOTSPOT_WINDOW_DAYS", "7"))
+DEFAULT_REFRESH_S = float(os.getenv("HOTSPOT_REFRESH_S", "60"))
+
+KM_PER_DEG = 111.32
+EARTH_RADIUS_KM = 6371.0088
+
+_FIELDS = ("cell", "lat", "lon", "day", "hhmm", "confidence", "frp")
+_DTYPES = (np.int64, np.float64, np.float64, np.int32, np.int16, np.uint8, np.float32)
+
+
+def radius_bbox(lat: float, lon: float, radius_km: float) -> dict:
+    """{minLat, maxLat, minLon, maxLon} enclosing a circle"""
+    dlat = radius_km / KM_PER_DEG
+    dlon = radius_km / (KM_PER_DEG * max(math.cos(math.radians(lat)), 1e-6))
+    return {"minLat": max(-90.0, lat - dlat), "maxLat": min(90.0, lat + dlat),
+            "minLon": max(-180.0, lon - dlon), "maxLon": min(180.0, lon + dlon)}
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    phi1, phi2 = math.radians(lat), np.radians(lats)
+    dphi = phi2 - phi1
+    dlmb = np.radians(lons - lon)
+    a = np.sin(dphi / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _detection_keys(lats: np.ndarray, lons: np.ndarray, days: np.ndarray, hhmm: np.ndarray) -> np.ndarray:
+    """(lat, lon at 1e-4 deg, day, hhmm) per detection as a structured array, for np.unique"""
+    keys = np.empty(len(lats), dtype=[(name, np.int64) for name in ("lat", "lon", "day", "hhmm")])
+    keys["lat"] = np.rint(np.asarray(lats) * 1e4)
+    keys["lon"] = np.rint(np.asarray(lons) * 1e4)
+    keys["day"] = days
+    keys["hhmm"] = hhmm
+    return keys
+
+
+def _month(day: int) -> int:
+    d = date.fromordinal(day)
+    return d.year * 12 + d.month - 1
+
+
+class HotspotIndex:
+    """Month-partitioned uniform-grid index with incremental CSV appends"""
+
+    def __init__(self, cell_deg: float = DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.cols = int(math.ceil(360 / cell_deg))
+        self.rows = int(math.ceil(180 / cell_deg))
+        # month -> tuple of arrays (see _FIELDS), replaced wholesale on append
+        self._partitions: Dict[int, Tuple[np.ndarray, ...]] = {}
+        self._files: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        # Concurrent requests can trigger a refresh; only one scans and appends
+        self._refresh_lock = threading.Lock()
+        self.directory: Optional[str] = None
+        self._next_refresh = 0.0
+        self.points = 0
+        self.latest_day: Optional[int] = None
+        self.updated: Optional[str] = None
+
+    @classmethod
+    def open_if_configured(cls) -> Optional["HotspotIndex"]:
+        if not DEFAULT_HOTSPOT_DIR or not os.path.isdir(DEFAULT_HOTSPOT_DIR):
+            return None
+        index = cls()
+        index.directory = DEFAULT_HOTSPOT_DIR
+        started = time.perf_counter()
+        index.refresh()
+        print(f"[OK] Hotspot index: {DEFAULT_HOTSPOT_DIR} ({index.points} points, "
+              f"{len(index._partitions)} months, {(time.perf_counter() - started) * 1000:.0f} ms)")
+        return index
+
+    # --- building ---------------------------------------------------------
+
+    def _cell_ids(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        rows = np.clip(np.floor((lats + 90) / self.cell_deg).astype(np.int64), 0, self.rows - 1)
+        cols = np.clip(np.floor((lons + 180) / self.cell_deg).astype(np.int64), 0, self.cols - 1)
+        return rows * self.cols + cols
+
+    def append(self, lats, lons, days, hhmm, confidence, frp) -> int:
+        """Add detections; duplicates of indexed ones are dropped. Returns points added."""
+        with self._lock:
+            lats = np.asarray(lats, dtype=np.float64)
+            lons = np.asarray(lons, dtype=np.float64)
+            new = (self._cell_ids(lats, lons), lats, lons, np.asarray(days), np.asarray(hhmm),
+                   np.asarray(confidence), np.asarray(frp))
+            months = np.array([_month(d) for d in new[3].tolist()])
+            added, latest = 0, None
+            for month in np.unique(months).tolist():
+                part = [column[months == month] for column in new]
+                old = self._partitions.get(month)
+                existing = 0 if old is None else len(old[0])
+                if old is not None:
+                    part = [np.concatenate([a, b]) for a, b in zip(old, part)]
+                # Dedupe inside the partition (old rows first, so they win), no global key set
+                _, first = np.unique(_detection_keys(part[1], part[2], part[3], part[4]), return_index=True)
+                fresh = first[first >= existing]
+                if len(fresh) == 0:
+                    continue
+                part = [column[first] for column in part]
+                order = np.argsort(part[0], kind="stable")
+                # Swap the whole tuple so readers never see a half-merged partition
+                self._partitions[month] = tuple(np.ascontiguousarray(column[order], dtype=dtype)
+                                                for column, dtype in zip(part, _DTYPES))
+                added += len(fresh)
+                month_latest = int(np.asarray(new[3])[months == month].max())
+                latest = month_latest if latest is None else max(latest, month_latest)
+            if not added:
+                return 0
+            self.points += added
+            self.latest_day = latest if self.latest_day is None else max(self.latest_day, latest)
+            self.updated = datetime.now().isoformat()
+            return added
+
+    def append_csv(self, csv_path: str) -> int:
+        """Index a FIRMS CSV (latitude, longitude, acq_date, acq_time, confidence, frp)"""
+        lats, lons, days, hhmm, confidence, frp = [], [], [], [], [], []
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for record in csv.DictReader(f):
+                try:
+                    lat, lon = float(record["latitude"]), float(record["longitude"])
+                    day = date.fromisoformat(record["acq_date"].strip()[:10]).toordinal()
+                except (KeyError, ValueError):
+                    continue
+                raw_time = (record.get("acq_time") or "0").strip()
+                lats.append(lat)
+                lons.append(lon)
+                days.append(day)
+                hhmm.append(int(raw_time) if raw_time.isdigit() else 0)
+                confidence.append(firms_confidence(record.get("confidence")))
+                try:
+                    frp.append(float(record.get("frp") or "nan"))
+                except ValueError:
+                    frp.append(float("nan"))
+        if not lats:
+            return 0
+        return self.append(np.array(lats), np.array(lons), days, hhmm, confidence, frp)
+
+    def refresh(self, force: bool = False) -> int:
+        """Index new or changed CSVs under the watched directory; throttled unless forced"""
+        if self.directory is None:
+            return 0
+        if not force and time.monotonic() < self._next_refresh:
+            return 0
+        with self._refresh_lock:
+            # Re-check under the lock: a request that waited here finds the work done
+            now = time.monotonic()
+            if not force and now < self._next_refresh:
+                return 0
+            self._next_refresh = now + DEFAULT_REFRESH_S
+            added = 0
+            for path in sorted(glob.glob(os.path.join(self.directory, "*.csv"))):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                signature = (stat.st_size, stat.st_mtime)
+                if self._files.get(path) == signature:
+                    continue
+                try:
+                    added += self.append_csv(path)
+                except (OSError, csv.Error, UnicodeDecodeError) as e:
+                    print(f"[WARNING] Skipping hotspot file {path}: {e}")
+                    continue
+                self._files[path] = signature
+            return added
+
+    # --- queries ----------------------------------------------------------
+
+    def window(self, days: Optional[int] = None) -> Tuple[Optional[int], Optional[int]]:
+        """(from_day, to_day) ordinals for the last `days` days of data"""
+        if self.latest_day is None:
+            return None, None
+        days = DEFAULT_WINDOW_DAYS if days is None else days
+        if days <= 0:
+            return None, self.latest_day
+        return self.latest_day - days + 1, self.latest_day
+
+    def _candidates(self, aoi: dict, from_day: Optional[int], to_day: Optional[int],
+                    min_confidence: int) -> Tuple[np.ndarray, ...]:
+        """Columns of points inside the bbox, date window and confidence floor"""
+        r0 = max(0, int(math.floor((aoi["minLat"] + 90) / self.cell_deg)))
+        r1 = min(self.rows - 1, int(math.floor((aoi["maxLat"] + 90) / self.cell_deg)))
+        c0 = max(0, int(math.floor((aoi["minLon"] + 180) / self.cell_deg)))
+        c1 = min(self.cols - 1, int(math.floor((aoi["maxLon"] + 180) / self.cell_deg)))
+        if r1 < r0 or c1 < c0:
+            return tuple(np.empty(0, dtype=dtype) for dtype in _DTYPES)
+        row_ids = np.arange(r0, r1 + 1, dtype=np.int64) * self.cols
+        lo_month = _month(from_day) if from_day is not None else None
+        hi_month = _month(to_day) if to_day is not None else None
+
+        chunks = []
+        for month, part in list(self._partitions.items()):
+            if (lo_month is not None and month < lo_month) or (hi_month is not None and month > hi_month):
+                continue
+            cells = part[0]
+            starts = np.searchsorted(cells, row_ids + c0, side="left")
+            ends = np.searchsorted(cells, row_ids + c1, side="right")
+            spans = [(s, e) for s, e in zip(starts.tolist(), ends.tolist()) if e > s]
+            if not spans:
+                continue
+            idx = np.concatenate([np.arange(s, e) for s, e in spans])
+            columns = [column[idx] for column in part]
+            lat, lon, day, conf = columns[1], columns[2], columns[3], columns[5]
+            mask = ((lat >= aoi["minLat"]) & (lat <= aoi["maxLat"])
+                    & (lon >= aoi["minLon"]) & (lon <= aoi["maxLon"]) & (conf >= min_confidence))
+            if from_day is not None:
+                mask &= day >= from_day
+            if to_day is not None:
+                mask &= day <= to_day
+            chunks.append([column[mask] for column in columns])
+        if not chunks:
+            return tuple(np.empty(0, dtype=dtype) for dtype in _DTYPES)
+        return tuple(np.concatenate(column) for column in zip(*chunks))
+
+    def count_bbox(self, aoi: dict, from_day: Optional[int] = None, to_day: Optional[int] = None,
+                   min_confidence: int = FIRE_CONFIDENCE_MIN) -> int:
+        return len(self._candidates(aoi, from_day, to_day, min_confidence)[0])
+
+    def count_radius(self, lat: float, lon: float, radius_km: float,
+                     from_day: Optional[int] = None, to_day: Optional[int] = None,
+                     min_confidence: int = FIRE_CONFIDENCE_MIN) -> int:
+        columns = self._candidates(radius_bbox(lat, lon, radius_km), from_day, to_day, min_confidence)
+        return int(np.count_nonzero(haversine_km(lat, lon, columns[1], columns[2]) <= radius_km))
+
+    def nearest(self, lat: float, lon: float, k: int = 10, max_km: float = 200.0,
+                from_day: Optional[int] = None, to_day: Optional[int] = None,
+                min_confidence: int = FIRE_CONFIDENCE_MIN) -> List[dict]:
+        """Up to k hotspots closest to a point, within max_km, nearest first"""
+        radius = min(max_km, max(self.cell_deg * KM_PER_DEG, 10.0))
+        while True:
+            columns = self._candidates(radius_bbox(lat, lon, radius), from_day, to_day, min_confidence)
+            distances = haversine_km(lat, lon, columns[1], columns[2])
+            inside = distances <= radius
+            # Everything within `radius` is in hand, so the k closest of them are exact
+            if np.count_nonzero(inside) >= k or radius >= max_km:
+                break
+            radius = min(max_km, radius * 4)
+        distances = distances[inside]
+        columns = [column[inside] for column in columns]
+        order = np.argsort(distances, kind="stable")[:k]
+        return [{
+            "lat": round(float(columns[1][i]), 5),
+            "lon": round(float(columns[2][i]), 5),
+            "distanceKm": round(float(distances[i]), 3),
+            "confidence": int(columns[5][i]),
+            "frp": None if math.isnan(columns[6][i]) else round(float(columns[6][i]), 2),
+            "acqDate": date.fromordinal(int(columns[3][i])).isoformat(),
+            "acqTime": f"{int(columns[4][i]):04d}",
+        } for i in order.tolist()]
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "cell_deg": self.cell_deg,
+            "points": self.points,
+            "months": len(self._partitions),
+            "files": len(self._files),
+            "latest": date.fromordinal(self.latest_day).isoformat() if self.latest_day else None,
+            "updated": self.updated,
+        }
@@ -0,0 +1,121 @@
+"""
+Single decode stage for uploaded images.
+
+Uploads stay in Starlette's spooled temp file (memory up to 1 MB, disk
+beyond) and are hashed in chunks with a byte cap instead of being read
+into one bytes object. Decoding checks the pixel budget from the header
+before touching pixel data, uses JPEG draft mode (DCT scaling) or an
+integer reduce to stop near the size the caller needs, and applies EXIF
+orientation once.
+"""
+import hashlib
+import io
+import math
+import os
+from typing import BinaryIO, Optional, Tuple, Union
+
+from PIL import Image, ImageOps
+
+MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(64_000_000)))
+CHUNK_SIZE = 64 * 1024
+
+# We enforce our own budget (and report it cleanly) instead of PIL's warning
+Image.MAX_IMAGE_PIXELS = None
+
+
+class ImageTooLarge(Exception):
+    """Upload exceeds the byte or pixel budget"""
+
+
+async def hash_upload(file, max_bytes: int = MAX_UPLOAD_BYTES) -> Tuple[BinaryIO, str]:
+    """
+    Stream an UploadFile through sha256 with a size cap.
+    Returns the underlying spooled file (rewound) and the hex digest.
+    """
+    digest = hashlib.sha256()
+    total = 0
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise ImageTooLarge(f"Upload exceeds {max_bytes} bytes")
+        digest.update(chunk)
+    await file.seek(0)
+    return file.file, digest.hexdigest()
+
+
+def hash_bytes(contents: bytes) -> str:
+    return hashlib.sha256(contents).hexdigest()
+
+
+def reduce_factor(size: Tuple[int, int], scale: float, source_format: Optional[str]) -> int:
+    """
+    Integer downscale decode_image applies for scale: the 1/2, 1/4, 1/8 step
+    JPEG draft mode picks (largest still >= target), int(1 / scale) otherwise
+    """
+    if scale >= 1.0:
+        return 1
+    if source_format != "JPEG":
+        return max(1, int(1 / scale))
+    width, height = size
+    target = (math.ceil(width * scale), math.ceil(height * scale))
+    fit = min(width // target[0], height // target[1])
+    factor = 1
+    while factor < 8 and factor * 2 <= fit:
+        factor *= 2
+    return factor
+
+
+def _scale(size: Tuple[int, int], min_side: int, min_pixels: int) -> float:
+    width, height = size
+    if not (min_side or min_pixels):
+        return 1.0
+    return max(min_side / min(width, height), math.sqrt(min_pixels / (width * height)))
+
+
+def decode_image(source: Union[bytes, BinaryIO], min_side: int = 0, min_pixels: int = 0,
+                 max_pixels: int = MAX_IMAGE_PIXELS) -> Image.Image:
+    """
+    Decode to an upright RGB image.
+    With min_side/min_pixels set, the result is downscaled (never below
+    either bound) at decode time; with both 0 it stays full resolution.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    image = Image.open(source)
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ImageTooLarge(f"Image is {width}x{height}, limit is {max_pixels} pixels")
+
+    source_format = image.format
+    scale = _scale(image.size, min_side, min_pixels)
+    if scale < 1.0:
+        if source_format == "JPEG":
+            # Decoder picks the largest 1/2, 1/4, 1/8 scale still >= target
+            image.draft("RGB", (math.ceil(width * scale), math.ceil(height * scale)))
+        else:
+            factor = reduce_factor(image.size, scale, source_format)
+            if factor >= 2:
+                image = image.reduce(factor)
+
+    # Load now: the spooled upload is closed once the request finishes
+    image.load()
+    ImageOps.exif_transpose(image, in_place=True)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    # Kept through reduce/convert (info is copied), for reduce_to_side
+    image.info["source_format"] = source_format
+    return image
+
+
+def reduce_to_side(image: Image.Image, min_side: int) -> Image.Image:
+    """
+    Reduce a full-resolution decode_image result by the factor
+    decode_image(source, min_side) would have used, so both land on the same
+    size (an image already downscaled at decode is reduced from its current size)
+    """
+    factor = reduce_factor(image.size, _scale(image.size, min_side, 0), image.info.get("source_format"))
+    return image.reduce(factor) if factor > 1 else image
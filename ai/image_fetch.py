@@ -0,0 +1,139 @@
+"""
+Async image downloads for /classify/image/url.
+
+One pooled httpx client per worker with a per-host concurrency limit,
+separate connect / read timeouts plus an overall deadline, a content-type
+check before the body is read, and a streaming byte cap. The body is hashed
+while it streams, so the digest for the result cache comes for free.
+"""
+import asyncio
+import hashlib
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from image_decode import MAX_UPLOAD_BYTES, ImageTooLarge
+
+DEFAULT_CONNECT_TIMEOUT_S = float(os.getenv("IMAGE_FETCH_CONNECT_TIMEOUT_S", "5"))
+DEFAULT_READ_TIMEOUT_S = float(os.getenv("IMAGE_FETCH_READ_TIMEOUT_S", "10"))
+DEFAULT_TOTAL_TIMEOUT_S = float(os.getenv("IMAGE_FETCH_TOTAL_TIMEOUT_S", "30"))
+DEFAULT_MAX_CONNECTIONS = int(os.getenv("IMAGE_FETCH_MAX_CONNECTIONS", "32"))
+DEFAULT_PER_HOST_LIMIT = int(os.getenv("IMAGE_FETCH_PER_HOST_LIMIT", "4"))
+
+# Some CDNs serve images as octet-stream; decode_image rejects anything that is not an image
+ALLOWED_CONTENT_TYPES = ("image/", "application/octet-stream")
+
+
+class ImageFetchError(Exception):
+    """URL could not be downloaded as an image"""
+
+
+class ImageFetcher:
+    """Pooled, size-capped streaming downloader"""
+
+    def __init__(self, max_bytes: int = MAX_UPLOAD_BYTES,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT_S,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT_S,
+                 total_timeout: float = DEFAULT_TOTAL_TIMEOUT_S,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 per_host_limit: int = DEFAULT_PER_HOST_LIMIT):
+        self.max_bytes = max_bytes
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+        self.max_connections = max_connections
+        self.per_host_limit = max(1, per_host_limit)
+        self._client: Optional[httpx.AsyncClient] = None
+        # host -> [semaphore, requests holding or waiting]; dropped when idle, so the
+        # client-chosen hosts cannot grow it without bound
+        self._host_limits: Dict[str, List] = {}
+        self.fetched = 0
+        self.failed = 0
+        self.bytes = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                follow_redirects=True,
+                headers={"User-Agent": "BioSentinel-ML-API"},
+            )
+        return self._client
+
+    @asynccontextmanager
+    async def _host_slot(self, host: str):
+        entry = self._host_limits.get(host)
+        if entry is None:
+            entry = self._host_limits[host] = [asyncio.Semaphore(self.per_host_limit), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._host_limits[host]
+
+    async def fetch(self, url: str) -> Tuple[bytes, str]:
+        """Download an image; returns (bytes, sha256 hex digest)"""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.netloc:
+            raise ImageFetchError(f"Unsupported URL: {url}")
+        try:
+            async with self._host_slot(parts.netloc):
+                result = await asyncio.wait_for(self._download(url), self.total_timeout)
+        except asyncio.TimeoutError:
+            self.failed += 1
+            raise ImageFetchError(f"Download timed out after {self.total_timeout:g}s")
+        except httpx.HTTPError as e:
+            self.failed += 1
+            raise ImageFetchError(f"Download failed: {e.__class__.__name__}: {e}")
+        except (ImageFetchError, ImageTooLarge):
+            self.failed += 1
+            raise
+        self.fetched += 1
+        self.bytes += len(result[0])
+        return result
+
+    async def _download(self, url: str) -> Tuple[bytes, str]:
+        async with self.client.stream("GET", url) as response:
+            if response.status_code >= 400:
+                raise ImageFetchError(f"Download failed: HTTP {response.status_code}")
+            content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type and not content_type.startswith(ALLOWED_CONTENT_TYPES):
+                raise ImageFetchError(f"Not an image (content-type {content_type})")
+            declared = response.headers.get("content-length", "")
+            if declared.isdigit() and int(declared) > self.max_bytes:
+                raise ImageTooLarge(f"Image exceeds {self.max_bytes} bytes")
+
+            digest = hashlib.sha256()
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body += chunk
+                if len(body) > self.max_bytes:
+                    raise ImageTooLarge(f"Image exceeds {self.max_bytes} bytes")
+                digest.update(chunk)
+        return bytes(body), digest.hexdigest()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "fetched": self.fetched,
+            "failed": self.failed,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "per_host_limit": self.per_host_limit,
+            "active_hosts": len(self._host_limits),
+        }
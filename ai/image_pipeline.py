@@ -0,0 +1,197 @@
+"""
+Single-pass image analysis shared by the /classify/image routes.
+
+Stages:
+    classify  class probabilities from the batched model forward pass
+    pixels    pixel forensics (pixel_analysis.analyze_pixels)
+    exif      camera / generator metadata checks
+
+A route picks the stages it needs. The upload is decoded at most once,
+lazily, at the resolution the selected stages need; the stages then run
+concurrently: the forward pass on the inference pool, decode, pixel forensics
+and EXIF checks on a separate CPU pool, so they overlap instead of queueing
+behind each other. classify and pixels results are cached by content digest,
+and a stage served from cache never triggers a decode.
+
+With a NearDuplicateIndex, decode also computes a perceptual hash; an upload
+within the index's Hamming radius of an earlier one reuses that upload's
+cached verdict instead of running the model, and the result names the
+earlier upload under "duplicate".
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+
+from PIL import Image
+
+from image_decode import decode_image, reduce_to_side
+from metrics import REGISTRY
+from perceptual_hash import dhash
+from pixel_analysis import DEFAULT_MAX_PIXELS, analyze_pixels
+
+STAGES = ("classify", "pixels", "exif")
+STAGE_MS = REGISTRY.histogram(
+    "image_stage_ms", "Image pipeline stage latency (ms); classify includes batch queueing", ("stage",))
+DEFAULT_CPU_WORKERS = int(os.getenv("IMAGE_CPU_WORKERS", "2"))
+
+# Lower-cased substrings of Software / PNG text chunks written by image generators
+GENERATOR_HINTS = (
+    "stable diffusion", "midjourney", "dall-e", "dall·e", "firefly", "novelai",
+    "comfyui", "automatic1111", "invokeai", "imagen", "diffusers",
+)
+# PNG text keys used by Stable Diffusion front-ends for the prompt / workflow
+GENERATOR_TEXT_KEYS = ("parameters", "prompt", "workflow", "sd-metadata", "dream")
+
+
+def exif_checks(image: Image.Image) -> dict:
+    """Camera metadata present, and any generator fingerprints in EXIF / PNG text"""
+    exif = image.getexif()
+    software = str(exif.get(0x0131) or "")
+    date_original = exif.get_ifd(0x8769).get(0x9003)
+    text = {key: value for key, value in image.info.items() if isinstance(value, str)}
+    haystack = " ".join([software] + list(text.values())).lower()
+    hints = [hint for hint in GENERATOR_HINTS if hint in haystack]
+    hints += [f"png:{key}" for key in GENERATOR_TEXT_KEYS if key in text]
+    return {
+        "has_exif": len(exif) > 0,
+        "camera_make": str(exif.get(0x010F) or "").strip() or None,
+        "camera_model": str(exif.get(0x0110) or "").strip() or None,
+        "software": software.strip() or None,
+        "date_original": str(date_original) if date_original else None,
+        "generator_hints": hints,
+        "is_suspicious": bool(hints),
+    }
+
+
+class ImagePipeline:
+    """Decode once, then run the selected stages concurrently"""
+
+    def __init__(self, batcher, cache, model_input_side: int,
+                 pixel_max_pixels: int = DEFAULT_MAX_PIXELS,
+                 cpu_workers: int = DEFAULT_CPU_WORKERS, duplicates=None):
+        self.batcher = batcher  # InferenceBatcher: forward passes on the inference pool
+        self.cache = cache      # ResultCache keyed by content digest
+        self.duplicates = duplicates  # optional NearDuplicateIndex: perceptual hash -> digest
+        self.model_input_side = model_input_side
+        self.pixel_max_pixels = pixel_max_pixels
+        self.cpu_workers = max(1, cpu_workers)
+        self._cpu_pool = None
+
+    @property
+    def cpu_pool(self) -> ThreadPoolExecutor:
+        if self._cpu_pool is None:
+            self._cpu_pool = ThreadPoolExecutor(max_workers=self.cpu_workers,
+                                                thread_name_prefix="image-cpu")
+        return self._cpu_pool
+
+    async def _on_cpu_pool(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.cpu_pool, fn, *args)
+
+    async def run(self, source, content_digest: str, stages: Iterable[str] = ("classify",)) -> dict:
+        """
+        Results keyed by stage name ("probabilities", "pixels", "exif"), plus
+        "timings_ms" per stage, "cached" (stages answered from the cache) and
+        "duplicate" ({"of": earlier digest, "distance": Hamming bits} or None).
+        """
+        stages = [stage for stage in STAGES if stage in set(stages)]
+        started = time.perf_counter()
+        timings, cached = {}, []
+        decoded = {}
+        duplicate = {}
+        with_hash = "classify" in stages and self.duplicates is not None
+
+        def decode():
+            # Full resolution for forensics/EXIF (capped if configured); model size otherwise
+            full = "pixels" in stages or "exif" in stages
+            if full:
+                if self.pixel_max_pixels:
+                    image = decode_image(source, self.model_input_side, self.pixel_max_pixels)
+                else:
+                    image = decode_image(source)
+            else:
+                image = decode_image(source, self.model_input_side)
+            if not with_hash:
+                return image, None
+            # Hash at the model-size scale classify-only requests decode to:
+            # hashing the full decode lands several bits away for the same photo
+            return image, dhash(reduce_to_side(image, self.model_input_side) if full else image)
+
+        async def get_decoded():
+            if "task" not in decoded:
+                async def timed_decode():
+                    t0 = time.perf_counter()
+                    result = await self._on_cpu_pool(decode)
+                    timings["decode"] = round((time.perf_counter() - t0) * 1000, 2)
+                    return result
+                decoded["task"] = asyncio.ensure_future(timed_decode())
+            return await decoded["task"]
+
+        async def get_image() -> Image.Image:
+            return (await get_decoded())[0]
+
+        async def classify():
+            key = self.cache.make_key(content_digest)
+            probabilities = self.cache.get(key)
+            if probabilities is not None:
+                cached.append("classify")
+                if self.duplicates is not None:
+                    duplicate.update({"of": content_digest, "distance": 0})
+                return probabilities
+            img, phash = await get_decoded()
+            if phash is not None:
+                match = self.duplicates.find(phash)
+                if match is not None:
+                    earlier, distance = match
+                    probabilities = self.cache.get(self.cache.make_key(earlier))
+                    if probabilities is not None:
+                        # Same photo resized / recompressed: reuse the earlier verdict
+                        duplicate.update({"of": earlier, "distance": distance})
+                        cached.append("classify")
+                        self.cache.put(key, probabilities)
+                        self.duplicates.record_reuse()
+                        return probabilities
+            t0 = time.perf_counter()
+            probabilities = await self.batcher.classify(img)
+            timings["classify"] = round((time.perf_counter() - t0) * 1000, 2)
+            self.cache.put(key, probabilities)
+            if phash is not None:
+                self.duplicates.add(phash, content_digest)
+            return probabilities
+
+        async def pixels():
+            key = self.cache.make_key(content_digest, f"pixels:{self.pixel_max_pixels}")
+            result = self.cache.get(key)
+            if result is not None:
+                cached.append("pixels")
+                return result
+            img = await get_image()
+            t0 = time.perf_counter()
+            result = await self._on_cpu_pool(analyze_pixels, img)
+            timings["pixels"] = round((time.perf_counter() - t0) * 1000, 2)
+            self.cache.put(key, result)
+            return result
+
+        async def exif():
+            img = await get_image()
+            t0 = time.perf_counter()
+            result = exif_checks(img)
+            timings["exif"] = round((time.perf_counter() - t0) * 1000, 2)
+            return result
+
+        runners = {"classify": classify, "pixels": pixels, "exif": exif}
+        outputs = await asyncio.gather(*(runners[stage]() for stage in stages))
+        results = dict(zip(("probabilities" if s == "classify" else s for s in stages), outputs))
+        timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+        for stage, elapsed in timings.items():
+            STAGE_MS.observe(elapsed, stage)
+        results["timings_ms"] = timings
+        results["cached"] = cached
+        results["duplicate"] = duplicate or None
+        return results
+
+    def shutdown(self):
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=False)
+            self._cpu_pool = None
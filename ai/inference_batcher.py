@@ -0,0 +1,117 @@
+"""
+Dynamic micro-batching for the AI-vs-human image classifier.
+
+Requests are queued and collected for a short window (max batch size or
+max wait, whichever comes first), then run through the HF processor and
+model as one batch. Each caller gets back its own softmax row.
+"""
+import asyncio
+import os
+import time
+from typing import Callable, List
+
+from metrics import Histogram, LATENCY_BUCKETS_MS
+from model_precision import predict
+
+DEFAULT_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+DEFAULT_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+
+
+class InferenceBatcher:
+    """Shared inference queue in front of get_classifier()"""
+
+    def __init__(self, get_classifier: Callable[[], dict],
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 executor=None):
+        self.get_classifier = get_classifier
+        self.executor = executor  # InferenceExecutor; None runs batches inline
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self.batch_size_hist = Histogram(
+            "inference_batch_size", (1, 2, 4, 8, 16, 32, 64),
+            "Images per batched forward pass")
+        self.queue_wait_hist = Histogram(
+            "inference_queue_wait_ms", LATENCY_BUCKETS_MS,
+            "Time a request waited in the batch queue (ms)")
+        self.forward_hist = Histogram(
+            "inference_batch_forward_ms", LATENCY_BUCKETS_MS,
+            "Processor + model forward time per batch (ms)")
+
+    def _ensure_worker(self):
+        # The queue and worker must live on the running event loop
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def classify(self, image) -> List[float]:
+        """Queue an RGB PIL image and wait for its class probabilities"""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> list:
+        """Wait for the first request, then fill the batch until full or the window closes"""
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Anything already queued rides along for free
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.queue_wait_hist.observe((started - enqueued) * 1000.0)
+            self.batch_size_hist.observe(len(batch))
+
+            images = [image for image, _, _ in batch]
+            try:
+                if self.executor is not None:
+                    results = await self.executor.run(self.run_batch, images)
+                else:
+                    results = self.run_batch(images)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self.forward_hist.observe((time.perf_counter() - started) * 1000.0)
+
+            for (_, future, _), probs in zip(batch, results):
+                if not future.done():
+                    future.set_result(probs)
+
+    def run_batch(self, images: list) -> List[List[float]]:
+        """One processor call and one forward pass for the whole batch"""
+        clf = self.get_classifier()
+        if clf is None:
+            raise RuntimeError("Image classifier not available")
+        return predict(clf, images)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batch_size": self.batch_size_hist.snapshot(),
+            "queue_wait_ms": self.queue_wait_hist.snapshot(),
+            "forward_ms": self.forward_hist.snapshot(),
+        }
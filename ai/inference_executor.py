@@ -0,0 +1,93 @@
+"""
+Dedicated executor for image decode, preprocessing and model inference.
+
+Keeps torch work off the asyncio event loop so /health and the GBIF routes
+stay responsive, and bounds the number of image requests in flight so a
+burst gets a fast 503 + Retry-After instead of piling up until timeout.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+DEFAULT_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+DEFAULT_TORCH_THREADS = int(os.getenv("INFERENCE_TORCH_THREADS", "0"))  # 0 = torch default
+DEFAULT_MAX_IN_FLIGHT = int(os.getenv("INFERENCE_MAX_IN_FLIGHT", "32"))
+DEFAULT_RETRY_AFTER_S = int(os.getenv("INFERENCE_RETRY_AFTER_S", "2"))
+
+
+class InferenceOverloaded(Exception):
+    """Raised when the in-flight limit for image requests is reached (or the model is still loading)"""
+
+    def __init__(self, retry_after: int, message: str = "Image inference queue is full, retry later"):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """Thread pool with tuned torch threads and an in-flight request limit"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS,
+                 torch_threads: int = DEFAULT_TORCH_THREADS,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 retry_after: int = DEFAULT_RETRY_AFTER_S):
+        self.workers = max(1, workers)
+        self.torch_threads = torch_threads
+        self.max_in_flight = max(1, max_in_flight)
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _init_worker(self):
+        if self.torch_threads > 0:
+            import torch
+            # Process-wide setting; one pool worker per process keeps the
+            # intra-op pool from fighting other workers for cores
+            torch.set_num_threads(self.torch_threads)
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix="inference",
+                        initializer=self._init_worker,
+                    )
+        return self._pool
+
+    @contextmanager
+    def slot(self):
+        """Admit one image request or raise InferenceOverloaded"""
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                self.rejected += 1
+                raise InferenceOverloaded(self.retry_after)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    async def run(self, fn, *args):
+        """Run a blocking call (decode, preprocessing, forward) on the pool"""
+        return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "torch_threads": self.torch_threads,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "rejected": self.rejected,
+        }
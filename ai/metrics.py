@@ -0,0 +1,382 @@
+"""
+Lightweight in-process metrics for the BioSentinel ML API.
+Histograms keep fixed buckets plus a count/sum so they are cheap to update
+on the hot path and can be snapshotted as plain dicts.
+
+Metrics registered in REGISTRY are rendered in the Prometheus text format
+by GET /metrics. Values that already live in stats() methods (cache hit
+ratios, in-flight counts, model load time) are exposed through callback
+gauges read at scrape time, so they add nothing to the request path.
+
+Set PROFILE_SLOW_MS to sample all thread stacks while serving and dump the
+samples of any request slower than that as collapsed stacks
+(flamegraph.pl / speedscope input) under PROFILE_DIR.
+"""
+import bisect
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Default buckets in milliseconds (queue waits, stage latencies)
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))  # 0 = profiler off
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+
+class Histogram:
+    """Fixed-bucket histogram with approximate quantiles"""
+
+    def __init__(self, name: str, buckets: Sequence[float], description: str = ""):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot = +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    @contextmanager
+    def time(self):
+        """Observe the elapsed milliseconds of a block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe((time.perf_counter() - started) * 1000.0)
+
+    def quantile(self, q: float):
+        """Upper bound of the bucket holding the q-th observation ("+Inf" if past the last bucket)"""
+        with self._lock:
+            total = self._count
+            counts = list(self._counts)
+        if total == 0:
+            return None
+        rank = q * total
+        running = 0
+        for i, c in enumerate(counts):
+            running += c
+            if running >= rank:
+                return self.buckets[i] if i < len(self.buckets) else "+Inf"
+        return "+Inf"
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+            total_sum = self._sum
+        cumulative: List[Dict] = []
+        running = 0
+        for upper, c in zip(list(self.buckets) + ["+Inf"], counts):
+            running += c
+            cumulative.append({"le": upper, "count": running})
+        return {
+            "count": total,
+            "sum": round(total_sum, 3),
+            "mean": round(total_sum / total, 3) if total else None,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": cumulative,
+        }
+
+    def samples(self, labels: str = "") -> List[str]:
+        """Prometheus bucket / sum / count lines"""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+            total_sum = self._sum
+        sep = "," if labels else ""
+        lines = []
+        running = 0
+        for upper, c in zip(list(self.buckets) + ["+Inf"], counts):
+            running += c
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="{upper}"}} {running}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{self.name}_sum{suffix} {total_sum}")
+        lines.append(f"{self.name}_count{suffix} {total}")
+        return lines
+
+
+def _label_string(names: Sequence[str], values: Sequence[str]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class HistogramVec:
+    """Histogram family keyed by label values"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, buckets: Sequence[float], labelnames: Sequence[str],
+                 description: str = ""):
+        self.name = name
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self.description = description
+        self._children: Dict[Tuple[str, ...], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> Histogram:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, Histogram(self.name, self.buckets, self.description))
+        return child
+
+    def observe(self, value: float, *label_values):
+        self.labels(*label_values).observe(value)
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.samples(_label_string(self.labelnames, key)))
+        return lines
+
+
+class Counter:
+    """Monotonic counter family; inc() is a lock plus a dict update"""
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str = "", labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        key = tuple(str(v) for v in label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(tuple(str(v) for v in label_values), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [_sample(self.name, self.labelnames, key, value) for key, value in items]
+
+
+class Gauge:
+    """
+    Gauge set directly (set/inc/dec), or read from a callback at scrape time.
+    A callback returns a number, None (omitted), or {label values tuple: number}.
+    """
+
+    def __init__(self, name: str, description: str = "", labelnames: Sequence[str] = (),
+                 fn: Optional[Callable] = None, type: str = "gauge"):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+        self.type = type  # "counter" for callbacks over monotonic stats counters
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self._value -= amount
+
+    def render(self) -> List[str]:
+        if self.fn is None:
+            return [f"{self.name} {self._value}"]
+        try:
+            value = self.fn()
+        except Exception as e:
+            print(f"[WARNING] Metric {self.name} callback failed: {e}")
+            return []
+        if value is None:
+            return []
+        if isinstance(value, dict):
+            return [_sample(self.name, self.labelnames, key if isinstance(key, tuple) else (key,), v)
+                    for key, v in sorted(value.items()) if v is not None]
+        return [f"{self.name} {float(value)}"]
+
+
+def _sample(name: str, labelnames: Sequence[str], key: Tuple, value: float) -> str:
+    if not labelnames:
+        return f"{name} {float(value)}"
+    return f"{name}{{{_label_string(labelnames, key)}}} {float(value)}"
+
+
+class Registry:
+    """Named metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric (or return the one already registered under its name)"""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name: str, description: str = "", labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS_MS) -> HistogramVec:
+        return self.register(HistogramVec(name, buckets, labelnames, description))
+
+    def counter(self, name: str, description: str = "", labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, description, labelnames))
+
+    def gauge(self, name: str, description: str = "", labelnames: Sequence[str] = (),
+              fn: Optional[Callable] = None, type: str = "gauge") -> Gauge:
+        return self.register(Gauge(name, description, labelnames, fn, type))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            kind = "histogram" if isinstance(metric, Histogram) else metric.type
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {kind}")
+            lines.extend(metric.samples() if isinstance(metric, Histogram) else metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# --- slow-request sampling profiler ----------------------------------------
+
+class StackSampler:
+    """Background thread sampling every thread's stack into a short ring buffer"""
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS, keep_s: float = 120.0):
+        self.interval = interval_ms / 1000.0
+        self._samples = deque(maxlen=max(1, int(keep_s / self.interval)))
+        self._thread = None
+        self._own_id = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        self._own_id = threading.get_ident()
+        while True:
+            now = time.perf_counter()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == self._own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self._samples.append((now, ";".join(reversed(stack))))
+            time.sleep(self.interval)
+
+    def collapsed(self, start: float, end: float) -> Dict[str, int]:
+        """Collapsed stacks ("root;...;leaf" -> sample count) between two perf_counter times"""
+        counts: Dict[str, int] = {}
+        for at, stack in list(self._samples):
+            if start <= at <= end:
+                counts[stack] = counts.get(stack, 0) + 1
+        return counts
+
+    def dump(self, label: str, start: float, end: float, directory: str = PROFILE_DIR) -> Optional[str]:
+        counts = self.collapsed(start, end)
+        if not counts:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", label).strip("_") or "request"
+        path = os.path.join(directory, f"{int(time.time() * 1000)}_{safe}_{int((end - start) * 1000)}ms.folded")
+        with open(path, "w") as f:
+            for stack, count in sorted(counts.items()):
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+# --- per-route HTTP metrics -------------------------------------------------
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware: per-route latency histogram, request counter and
+    in-flight gauge. Routes are labelled by their path template, never the
+    raw path, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app, registry: Registry = REGISTRY, prefix: str = "http",
+                 slow_ms: float = PROFILE_SLOW_MS):
+        self.app = app
+        self.latency = registry.histogram(
+            f"{prefix}_request_duration_ms", "Request latency by route (ms)", ("method", "route"))
+        self.requests = registry.counter(
+            f"{prefix}_requests_total", "Requests by route and status", ("method", "route", "status"))
+        self.in_flight = registry.gauge(f"{prefix}_requests_in_flight", "Requests being served")
+        self.slow_ms = slow_ms
+        self._paths = None  # endpoint -> path template
+        self.sampler = None
+        if slow_ms > 0:
+            self.sampler = StackSampler()
+            self.sampler.start()
+            print(f"[OK] Slow-request profiler on: requests over {slow_ms:g} ms -> {PROFILE_DIR}/")
+
+    def _route(self, scope) -> str:
+        route = getattr(scope.get("route"), "path", None)
+        if route:
+            return route
+        # Older routers only leave the endpoint in the scope
+        if self._paths is None and "app" in scope:
+            self._paths = {getattr(r, "endpoint", None): r.path
+                           for r in getattr(scope["app"], "routes", []) if hasattr(r, "path")}
+        return (self._paths or {}).get(scope.get("endpoint")) or "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = {"code": 500}
+        self.in_flight.inc()
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.in_flight.dec()
+            ended = time.perf_counter()
+            elapsed_ms = (ended - started) * 1000.0
+            route = self._route(scope)
+            method = scope.get("method", "")
+            self.latency.observe(elapsed_ms, method, route)
+            self.requests.inc(method, route, status["code"])
+            if self.sampler is not None and elapsed_ms >= self.slow_ms:
+                path = self.sampler.dump(f"{method}_{route}", started, ended)
+                if path:
+                    print(f"[PROFILE] {method} {route} took {elapsed_ms:.0f} ms, stacks in {path}")
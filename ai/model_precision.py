@@ -0,0 +1,180 @@
+"""
+Precision modes for the CPU image classifier.
+
+    fp32  reference weights
+    int8  dynamic quantization of every nn.Linear (weights int8, activations
+          quantized on the fly); the ViT encoder is almost all Linear layers
+    bf16  weights and activations in bfloat16; only used when the CPU has
+          native bf16 (AVX512_BF16 / AMX), otherwise falls back to fp32
+
+All modes run under torch.inference_mode with channels-last inputs. Pick a
+mode with IMAGE_MODEL_PRECISION and check its drift against fp32 first:
+
+    python model_precision.py path/to/images --modes fp32,int8,bf16
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from typing import List, Tuple
+
+from metrics import Histogram, LATENCY_BUCKETS_MS, REGISTRY
+
+PRECISIONS = ("fp32", "int8", "bf16")
+DEFAULT_PRECISION = os.getenv("IMAGE_MODEL_PRECISION", "fp32").lower()
+DEFAULT_CHANNELS_LAST = os.getenv("IMAGE_MODEL_CHANNELS_LAST", "1") == "1"
+
+PREPROCESS_MS = REGISTRY.register(Histogram(
+    "model_preprocess_ms", LATENCY_BUCKETS_MS, "HF processor time per batch (ms)"))
+FORWARD_MS = REGISTRY.register(Histogram(
+    "model_forward_ms", LATENCY_BUCKETS_MS, "Model forward + softmax per batch (ms)"))
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+
+
+def bf16_supported() -> bool:
+    """True when the CPU has native bfloat16 matmul (emulated bf16 is slower than fp32)"""
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def prepare_model(model, precision: str = DEFAULT_PRECISION,
+                  channels_last: bool = DEFAULT_CHANNELS_LAST) -> Tuple[object, str]:
+    """Eval-mode model converted to the requested precision; returns (model, precision applied)"""
+    import torch
+
+    precision = precision.lower()
+    if precision not in PRECISIONS:
+        print(f"[WARNING] Unknown IMAGE_MODEL_PRECISION {precision!r}, using fp32")
+        precision = "fp32"
+    if precision == "bf16" and not bf16_supported():
+        print("[WARNING] CPU has no native bf16, using fp32")
+        precision = "fp32"
+
+    model.eval()
+    model.requires_grad_(False)
+    if channels_last:
+        model = model.to(memory_format=torch.channels_last)
+    if precision == "int8":
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    elif precision == "bf16":
+        model = model.to(torch.bfloat16)
+    return model, precision
+
+
+def predict(clf: dict, images: list) -> List[List[float]]:
+    """Processor + one forward pass for a batch; softmax rows as fp32 lists"""
+    import torch
+
+    started = time.perf_counter()
+    inputs = clf["processor"](images=images, return_tensors="pt")
+    dtype = torch.bfloat16 if clf.get("precision") == "bf16" else None
+    for name, value in inputs.items():
+        if torch.is_tensor(value) and value.is_floating_point():
+            if dtype is not None:
+                value = value.to(dtype)
+            if value.dim() == 4 and clf.get("channels_last", DEFAULT_CHANNELS_LAST):
+                value = value.contiguous(memory_format=torch.channels_last)
+            inputs[name] = value
+    preprocessed = time.perf_counter()
+    PREPROCESS_MS.observe((preprocessed - started) * 1000.0)
+    with torch.inference_mode():
+        logits = clf["model"](**inputs).logits
+        probabilities = torch.softmax(logits.float(), dim=1).tolist()
+    FORWARD_MS.observe((time.perf_counter() - preprocessed) * 1000.0)
+    return probabilities
+
+
+# --- accuracy drift check -------------------------------------------------
+
+def _load(model_id: str, revision: str, precision: str, channels_last: bool) -> dict:
+    from transformers import AutoProcessor, AutoModelForImageClassification
+
+    processor = AutoProcessor.from_pretrained(model_id, revision=revision)
+    model = AutoModelForImageClassification.from_pretrained(model_id, revision=revision)
+    model, applied = prepare_model(model, precision, channels_last)
+    return {"processor": processor, "model": model, "precision": applied, "channels_last": channels_last}
+
+
+def _throughput(clf: dict, images: list, batch_size: int, repeat: int) -> Tuple[List[List[float]], float]:
+    predict(clf, images[:batch_size])  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        probabilities = []
+        for i in range(0, len(images), batch_size):
+            probabilities.extend(predict(clf, images[i:i + batch_size]))
+    elapsed = time.perf_counter() - started
+    return probabilities, len(images) * repeat / elapsed
+
+
+def check_drift(image_dir: str, modes: List[str], model_id: str, revision: str,
+                input_side: int = 224, batch_size: int = 8, repeat: int = 1,
+                threads: int = 0, channels_last: bool = DEFAULT_CHANNELS_LAST) -> dict:
+    """Label agreement, probability drift and images/s of each mode against fp32"""
+    import torch
+    from image_decode import decode_image
+
+    if threads > 0:
+        torch.set_num_threads(threads)
+    paths = sorted(p for p in glob.glob(os.path.join(image_dir, "**", "*"), recursive=True)
+                   if p.lower().endswith(IMAGE_EXTENSIONS))
+    if not paths:
+        raise SystemExit(f"No images under {image_dir}")
+    images = [decode_image(path, input_side) for path in paths]
+
+    results = {}
+    reference = None
+    for mode in ["fp32"] + [m for m in modes if m != "fp32"]:
+        clf = _load(model_id, revision, mode, channels_last)
+        probabilities, images_per_s = _throughput(clf, images, batch_size, repeat)
+        entry = {"applied": clf["precision"], "images_per_s": round(images_per_s, 2)}
+        if reference is None:
+            reference = (probabilities, images_per_s)
+        else:
+            ref_probs, ref_speed = reference
+            agree = sum(max(range(len(a)), key=a.__getitem__) == max(range(len(b)), key=b.__getitem__)
+                        for a, b in zip(probabilities, ref_probs))
+            drift = [abs(x - y) for a, b in zip(probabilities, ref_probs) for x, y in zip(a, b)]
+            entry.update({
+                "speedup": round(images_per_s / ref_speed, 2),
+                "label_agreement": round(agree / len(images), 4),
+                "max_prob_drift": round(max(drift), 5),
+                "mean_prob_drift": round(sum(drift) / len(drift), 5),
+            })
+        results[mode] = entry
+    return {
+        "model": f"{model_id}@{revision}",
+        "images": len(images),
+        "batch_size": batch_size,
+        "torch_threads": torch.get_num_threads(),
+        "channels_last": channels_last,
+        "modes": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare classifier precision modes against fp32")
+    parser.add_argument("image_dir")
+    parser.add_argument("--modes", default="fp32,int8,bf16")
+    parser.add_argument("--model", default=os.getenv("IMAGE_MODEL_ID", "Ateeqq/ai-vs-human-image-detector"))
+    parser.add_argument("--revision", default=os.getenv("IMAGE_MODEL_REVISION", "main"))
+    parser.add_argument("--input-side", type=int, default=int(os.getenv("IMAGE_MODEL_INPUT_SIDE", "224")))
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over the image set for timing")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("INFERENCE_TORCH_THREADS", "0")))
+    parser.add_argument("--no-channels-last", action="store_true")
+    args = parser.parse_args(argv)
+
+    modes = [m.strip().lower() for m in args.modes.split(",") if m.strip()]
+    report = check_drift(args.image_dir, modes, args.model, args.revision, args.input_side,
+                         args.batch_size, args.repeat, args.threads, not args.no_channels_last)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Local GBIF occurrence store (SQLite) indexed by species, grid cell and date.
+
+Load GBIF downloads for our region once, then answer the recent/historical
+counts used by /gbif/classify from disk in milliseconds:
+
+    python occurrence_store.py ingest --db occurrences.db \\
+        --bbox 21.5,77.0,31.5,89.0 0012345-240101.zip more.csv
+    python occurrence_store.py stats --db occurrences.db
+
+Accepts GBIF "simple" CSV downloads (tab separated) and Darwin Core
+Archives (zip with occurrence.txt). Rows are keyed by gbifID, so re-ingesting
+a newer download only inserts/updates what changed; files already ingested
+with the same size and mtime are skipped.
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import sqlite3
+import sys
+import threading
+import zipfile
+from datetime import datetime
+from typing import Iterable, Iterator, Optional, Tuple
+
+CELL_DEG = 0.1  # index grid (~11 km); radius queries scan the covering cells
+KM_PER_DEG = 111.32
+BATCH_ROWS = 10000
+
+# Gangetic plain, Uttarakhand to the Sundarbans (minLat, minLon, maxLat, maxLon)
+GANGETIC_PLAIN_BBOX = (21.5, 77.0, 31.5, 89.0)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS occurrences (
+    gbif_id INTEGER PRIMARY KEY,
+    species TEXT NOT NULL,
+    species_key INTEGER,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    cell_y INTEGER NOT NULL,
+    cell_x INTEGER NOT NULL,
+    event_date TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_occurrences_species_cell_date
+    ON occurrences (species, cell_y, cell_x, event_date);
+CREATE INDEX IF NOT EXISTS idx_occurrences_key_cell_date
+    ON occurrences (species_key, cell_y, cell_x, event_date);
+CREATE TABLE IF NOT EXISTS ingests (
+    source TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime REAL,
+    rows INTEGER,
+    ingested_at TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def cell_index(value: float) -> int:
+    return int(math.floor(value / CELL_DEG))
+
+
+def normalize_species(name: str) -> str:
+    return " ".join(name.split()).lower()
+
+
+def parse_event_date(row: dict) -> Optional[str]:
+    """ISO yyyy-mm-dd from eventDate (first day of a range/partial date) or year/month/day"""
+    raw = (row.get("eventDate") or "").strip()
+    if raw:
+        raw = raw.split("/")[0][:10]
+        parts = raw.split("-")
+        try:
+            year = int(parts[0])
+            month = int(parts[1]) if len(parts) > 1 and parts[1] else 1
+            day = int(parts[2]) if len(parts) > 2 and parts[2] else 1
+            return f"{year:04d}-{month:02d}-{day:02d}"
+        except ValueError:
+            pass
+    try:
+        year = int(row.get("year") or 0)
+    except ValueError:
+        return None
+    if not year:
+        return None
+    month = int(row.get("month") or 1) if (row.get("month") or "").isdigit() else 1
+    day = int(row.get("day") or 1) if (row.get("day") or "").isdigit() else 1
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
+def _iter_rows(path: str) -> Iterator[dict]:
+    """Dict rows from a GBIF simple CSV or the occurrence table of a DwC-A"""
+    if zipfile.is_zipfile(path):
+        archive = zipfile.ZipFile(path)
+        names = archive.namelist()
+        member = next((n for n in names if n.endswith("occurrence.txt")), None)
+        if member is None:
+            member = next(n for n in names if n.endswith((".csv", ".txt")))
+        stream = io.TextIOWrapper(archive.open(member), encoding="utf-8", newline="")
+    else:
+        stream = open(path, encoding="utf-8", newline="")
+    with stream:
+        header = stream.readline()
+        delimiter = "\t" if "\t" in header else ","
+        fields = next(csv.reader([header], delimiter=delimiter))
+        csv.field_size_limit(sys.maxsize)
+        reader = csv.DictReader(stream, fieldnames=fields, delimiter=delimiter,
+                                quoting=csv.QUOTE_NONE if delimiter == "\t" else csv.QUOTE_MINIMAL)
+        yield from reader
+
+
+def _records(rows: Iterable[dict], bbox: Optional[Tuple[float, float, float, float]]):
+    for row in rows:
+        try:
+            gbif_id = int(row.get("gbifID") or row.get("id") or 0)
+            lat = float(row["decimalLatitude"])
+            lon = float(row["decimalLongitude"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if not gbif_id:
+            continue
+        if bbox and not (bbox[0] <= lat <= bbox[2] and bbox[1] <= lon <= bbox[3]):
+            continue
+        name = row.get("species") or row.get("scientificName") or ""
+        if not name.strip():
+            continue
+        key = row.get("speciesKey") or row.get("taxonKey") or ""
+        yield (
+            gbif_id,
+            normalize_species(name),
+            int(key) if key.isdigit() else None,
+            lat,
+            lon,
+            cell_index(lat),
+            cell_index(lon),
+            parse_event_date(row),
+        )
+
+
+class OccurrenceStore:
+    """Read/write access to the occurrence database"""
+
+    def __init__(self, path: str, readonly: bool = False):
+        self.path = path
+        self.readonly = readonly
+        self._local = threading.local()
+        self._region = None
+        # Connections must not cross fork (gunicorn preload); children open their own
+        os.register_at_fork(after_in_child=self._reset_connections)
+        if not readonly:
+            with self.connection as conn:
+                conn.executescript(SCHEMA)
+
+    @classmethod
+    def open_if_configured(cls) -> Optional["OccurrenceStore"]:
+        """Store from OCCURRENCE_DB, or None when unset/missing"""
+        path = os.getenv("OCCURRENCE_DB")
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            store = cls(path, readonly=True)
+            print(f"[OK] Local occurrence store: {path} ({store.region})")
+            return store
+        except sqlite3.Error as e:
+            print(f"[ERROR] Failed to open occurrence store: {e}")
+            return None
+
+    def _reset_connections(self):
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # One connection per thread; queries run on worker threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.readonly:
+                conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            else:
+                conn = sqlite3.connect(self.path)
+                conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def region(self) -> Optional[Tuple[float, float, float, float]]:
+        if self.readonly and self._region is not None:
+            return self._region
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'region'").fetchone()
+        self._region = tuple(json.loads(row[0])) if row else None
+        return self._region
+
+    def covers(self, lat: float, lon: float) -> bool:
+        """True if the store was ingested for a region containing the point"""
+        region = self.region
+        if region is None:
+            return False
+        return region[0] <= lat <= region[2] and region[1] <= lon <= region[3]
+
+    def has_species(self, species: str) -> bool:
+        """True if any occurrence of species was ingested (a zero count is then real absence)"""
+        row = self.connection.execute(
+            "SELECT 1 FROM occurrences WHERE species = ? LIMIT 1", (normalize_species(species),)
+        ).fetchone()
+        return row is not None
+
+    def ingest(self, path: str, bbox: Optional[Tuple[float, float, float, float]] = None,
+               force: bool = False) -> int:
+        """Upsert one download; returns rows written (0 if already ingested)"""
+        source = os.path.abspath(path)
+        stat = os.stat(path)
+        conn = self.connection
+        seen = conn.execute("SELECT size, mtime FROM ingests WHERE source = ?", (source,)).fetchone()
+        if seen and not force and seen[0] == stat.st_size and seen[1] == stat.st_mtime:
+            return 0
+
+        written = 0
+        batch = []
+        with conn:
+            for record in _records(_iter_rows(path), bbox):
+                batch.append(record)
+                if len(batch) >= BATCH_ROWS:
+                    conn.executemany("INSERT OR REPLACE INTO occurrences VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+                    written += len(batch)
+                    batch = []
+            if batch:
+                conn.executemany("INSERT OR REPLACE INTO occurrences VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+                written += len(batch)
+            conn.execute(
+                "INSERT OR REPLACE INTO ingests VALUES (?, ?, ?, ?, ?)",
+                (source, stat.st_size, stat.st_mtime, written, datetime.now().isoformat()),
+            )
+            if bbox:
+                self._extend_region(bbox)
+        return written
+
+    def _extend_region(self, bbox: Tuple[float, float, float, float]):
+        region = self.region
+        if region is not None:
+            bbox = (min(region[0], bbox[0]), min(region[1], bbox[1]),
+                    max(region[2], bbox[2]), max(region[3], bbox[3]))
+        self.connection.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('region', ?)", (json.dumps(list(bbox)),)
+        )
+
+    def count(self, species: str, lat: float, lon: float, radius_km: float,
+              to_date: Optional[str] = None, from_date: Optional[str] = None) -> int:
+        """Occurrences of species within radius_km of (lat, lon), optionally within a date window"""
+        dlat = radius_km / KM_PER_DEG
+        lon_scale = KM_PER_DEG * max(math.cos(math.radians(lat)), 1e-6)
+        dlon = radius_km / lon_scale
+        sql = (
+            "SELECT COUNT(*) FROM occurrences"
+            " WHERE species = ? AND cell_y BETWEEN ? AND ? AND cell_x BETWEEN ? AND ?"
+            # Equirectangular distance, exact enough at these radii, no trig in SQL
+            " AND ((lat - ?) * ?) * ((lat - ?) * ?) + ((lon - ?) * ?) * ((lon - ?) * ?) <= ?"
+        )
+        params = [
+            normalize_species(species),
+            cell_index(lat - dlat), cell_index(lat + dlat),
+            cell_index(lon - dlon), cell_index(lon + dlon),
+            lat, KM_PER_DEG, lat, KM_PER_DEG, lon, lon_scale, lon, lon_scale,
+            radius_km * radius_km,
+        ]
+        if to_date:
+            sql += " AND event_date <= ?"
+            params.append(to_date)
+        if from_date:
+            sql += " AND event_date >= ?"
+            params.append(from_date)
+        return self.connection.execute(sql, params).fetchone()[0]
+
+    def stats(self) -> dict:
+        conn = self.connection
+        return {
+            "path": self.path,
+            "region": self.region,
+            "occurrences": conn.execute("SELECT COUNT(*) FROM occurrences").fetchone()[0],
+            "species": conn.execute("SELECT COUNT(DISTINCT species) FROM occurrences").fetchone()[0],
+            "ingests": [
+                {"source": r[0], "rows": r[1], "ingested_at": r[2]}
+                for r in conn.execute("SELECT source, rows, ingested_at FROM ingests ORDER BY ingested_at")
+            ],
+        }
+
+
+def _parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    parts = [float(p) for p in value.split(",")]
+    if len(parts) != 4:
+        raise argparse.ArgumentTypeError("bbox must be minLat,minLon,maxLat,maxLon")
+    return tuple(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="BioSentinel local GBIF occurrence store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest = sub.add_parser("ingest", help="Load GBIF CSV / DwC-A downloads")
+    ingest.add_argument("files", nargs="+")
+    ingest.add_argument("--db", default=os.getenv("OCCURRENCE_DB", "occurrences.db"))
+    ingest.add_argument("--bbox", type=_parse_bbox, default=GANGETIC_PLAIN_BBOX,
+                        help="minLat,minLon,maxLat,maxLon (default: Gangetic plain)")
+    ingest.add_argument("--force", action="store_true", help="Re-ingest files seen before")
+
+    stats = sub.add_parser("stats", help="Show store contents")
+    stats.add_argument("--db", default=os.getenv("OCCURRENCE_DB", "occurrences.db"))
+
+    args = parser.parse_args(argv)
+    store = OccurrenceStore(args.db)
+    if args.command == "ingest":
+        for path in args.files:
+            rows = store.ingest(path, bbox=args.bbox, force=args.force)
+            print(f"{path}: {rows} rows" if rows else f"{path}: already ingested, skipped")
+    print(json.dumps(store.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
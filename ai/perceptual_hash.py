@@ -0,0 +1,195 @@
+"""
+Near-duplicate detection for uploaded images.
+
+dHash: the image is shrunk to 9x8 grey pixels and each bit records whether
+a pixel is brighter than its right neighbour. The 64-bit hash survives
+resizing, recompression (WhatsApp, frontend thumbnails) and small colour
+shifts, so a re-upload of the same photo lands within a few bits of the
+original.
+
+Lookup is multi-index hashing: the hash is split into 4 16-bit chunks, and
+two hashes within Hamming distance r share at least one chunk within
+r // 4 bits. Each chunk indexes a dict, so a query probes a few dozen
+buckets instead of scanning every stored hash. Entries map hash -> content
+digest of the first upload, so the verdict itself stays in ResultCache.
+An optional SQLite file keeps the index across restarts.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from itertools import combinations
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+DEFAULT_MAX_DISTANCE = int(os.getenv("IMAGE_DEDUP_MAX_DISTANCE", "6"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("IMAGE_DEDUP_SIZE", "200000"))
+DEFAULT_DB_PATH = os.getenv("IMAGE_DEDUP_DB") or None
+
+# Set-bit count of every byte value, for vectorised Hamming distances
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def dhash(image: Image.Image) -> int:
+    """64-bit difference hash of a decoded image"""
+    # reducing_gap: integer reduce first, so a full-resolution decode stays cheap
+    small = image.resize((9, 8), Image.BOX, reducing_gap=2.0).convert("L")
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _flips(radius: int) -> List[int]:
+    """XOR masks of every chunk value within radius bits of 0"""
+    masks = [0]
+    for r in range(1, radius + 1):
+        for positions in combinations(range(CHUNK_BITS), r):
+            mask = 0
+            for p in positions:
+                mask |= 1 << p
+            masks.append(mask)
+    return masks
+
+
+def _to_sqlite(value: int) -> int:
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class NearDuplicateIndex:
+    """Hamming-radius lookup of 64-bit perceptual hashes (multi-index hashing)"""
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_DISTANCE,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 db_path: Optional[str] = DEFAULT_DB_PATH):
+        self.max_distance = max(0, max_distance)
+        self.max_entries = max_entries
+        self._flips = _flips(self.max_distance // CHUNKS)
+        self._entries = OrderedDict()  # hash -> content digest, oldest first
+        self._buckets = [dict() for _ in range(CHUNKS)]  # chunk value -> set of hashes
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.duplicates = 0
+        self._writes = 0
+        self.db_path = db_path
+        self._db = None
+        self._open_db()
+        self._load()
+        # A connection must not cross fork (gunicorn preload); children open their own
+        os.register_at_fork(after_in_child=self._open_db)
+
+    def _open_db(self):
+        self._db = None
+        if not self.db_path:
+            return
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS hashes ("
+                "hash INTEGER PRIMARY KEY, digest TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"[ERROR] Near-duplicate index persistence disabled: {e}")
+            self._db = None
+
+    def _load(self):
+        if self._db is None:
+            return
+        try:
+            rows = self._db.execute(
+                "SELECT hash, digest FROM hashes ORDER BY created DESC LIMIT ?", (self.max_entries,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"[ERROR] Failed to load near-duplicate index: {e}")
+            return
+        with self._lock:
+            for value, digest in reversed(rows):
+                self._insert(value & ((1 << 64) - 1), digest)
+        if rows:
+            print(f"[OK] Near-duplicate index: {len(rows)} hashes from {self.db_path}")
+
+    def _chunks(self, value: int) -> List[int]:
+        return [(value >> (i * CHUNK_BITS)) & CHUNK_MASK for i in range(CHUNKS)]
+
+    def _insert(self, value: int, digest: str):
+        if value in self._entries:
+            self._entries.move_to_end(value)
+            return
+        self._entries[value] = digest
+        for bucket, chunk in zip(self._buckets, self._chunks(value)):
+            bucket.setdefault(chunk, set()).add(value)
+        while len(self._entries) > self.max_entries:
+            old, _ = self._entries.popitem(last=False)
+            for bucket, chunk in zip(self._buckets, self._chunks(old)):
+                members = bucket[chunk]
+                members.discard(old)
+                if not members:
+                    del bucket[chunk]
+
+    def find(self, value: int) -> Optional[Tuple[str, int]]:
+        """(content digest, distance) of the closest stored hash within max_distance"""
+        best = None
+        with self._lock:
+            self.lookups += 1
+            candidates = set()
+            for bucket, chunk in zip(self._buckets, self._chunks(value)):
+                get = bucket.get
+                for flip in self._flips:
+                    members = get(chunk ^ flip)
+                    if members:
+                        candidates |= members
+            if candidates:
+                # One numpy pass over the candidates instead of a Python loop
+                stored = np.fromiter(candidates, dtype=np.uint64, count=len(candidates))
+                xor = stored ^ np.uint64(value)
+                distances = _POPCOUNT8[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+                closest = int(distances.argmin())
+                if distances[closest] <= self.max_distance:
+                    best = (self._entries[int(stored[closest])], int(distances[closest]))
+        return best
+
+    def record_reuse(self):
+        """Count a match whose earlier verdict was actually reused (find alone may miss the cache)"""
+        with self._lock:
+            self.duplicates += 1
+
+    def add(self, value: int, digest: str):
+        with self._lock:
+            self._insert(value, digest)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR IGNORE INTO hashes (hash, digest, created) VALUES (?, ?, ?)",
+                    (_to_sqlite(value), digest, time.time()),
+                )
+                # Trim rows the memory index already evicted (periodically, it is a sort)
+                self._writes += 1
+                if self._writes % 256 == 0 and len(self._entries) >= self.max_entries:
+                    self._db.execute(
+                        "DELETE FROM hashes WHERE hash IN (SELECT hash FROM hashes "
+                        "ORDER BY created DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+                    )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Near-duplicate index write error: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "max_distance": self.max_distance,
+            "disk_enabled": self._db is not None,
+            "lookups": self.lookups,
+            "duplicates": self.duplicates,
+        }
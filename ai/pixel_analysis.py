@@ -0,0 +1,147 @@
+"""
+Pixel forensics for /classify/image/analyze.
+
+The grey level used by the analysis is the mean of the three uint8
+channels, so it only takes 766 distinct values (R+G+B in 0..765). Working
+on that integer sum lets one bincount give the unique-colour count, mean
+and std exactly, and turns the np.gradient > 50 threshold into integer
+comparisons. The image is processed in row bands so peak memory stays at
+a few MB even for 48 MP photos.
+"""
+import os
+from typing import Optional, Union
+
+import numpy as np
+from PIL import Image
+
+DEFAULT_MAX_PIXELS = int(os.getenv("PIXEL_ANALYSIS_MAX_PIXELS", "0"))  # 0 = full resolution
+BAND_ROWS = 256
+
+# np.gradient of gray = s / 3: interior cells use (s[i+1] - s[i-1]) / 6,
+# border cells (s[1] - s[0]) / 3, so "> 50" becomes these integer limits
+INTERIOR_EDGE_LIMIT = 300
+BORDER_EDGE_LIMIT = 150
+GRAY_LEVELS = 766
+
+_LEVELS = np.arange(GRAY_LEVELS, dtype=np.float64) / 3.0
+
+
+def _tie_table(limit: int, divisor: float) -> np.ndarray:
+    # At |diff| == limit the float64 gradient lands on 50 +/- rounding error;
+    # record which pairs (indexed by the smaller sum) the original counted
+    low = np.arange(GRAY_LEVELS - limit)
+    return (_LEVELS[low + limit] - _LEVELS[low]) / divisor > 50
+
+
+_INTERIOR_TIES = _tie_table(INTERIOR_EDGE_LIMIT, 2.0)
+_BORDER_TIES = _tie_table(BORDER_EDGE_LIMIT, 1.0)
+
+
+def _band_sum(image: Union[Image.Image, np.ndarray], top: int, bottom: int) -> np.ndarray:
+    """R+G+B for rows [top, bottom) as int16 (max 765)"""
+    if isinstance(image, Image.Image):
+        band = np.asarray(image.crop((0, top, image.width, bottom)))
+    else:
+        band = image[top:bottom]
+    total = band[..., 0].astype(np.int16)
+    total += band[..., 1]
+    total += band[..., 2]
+    return total
+
+
+def _count_edges(after: np.ndarray, before: np.ndarray, limit: int, ties: np.ndarray) -> int:
+    """Count |after - before| over the limit, resolving exact ties like float64 would"""
+    diff = np.abs(after - before)
+    count = int(np.count_nonzero(diff > limit))
+    on_limit = diff == limit
+    if on_limit.any():
+        count += int(np.count_nonzero(ties[np.minimum(after[on_limit], before[on_limit])]))
+    return count
+
+
+def _horizontal_edges(s: np.ndarray) -> int:
+    width = s.shape[1]
+    if width < 2:
+        return 0
+    count = _count_edges(s[:, 1], s[:, 0], BORDER_EDGE_LIMIT, _BORDER_TIES)
+    count += _count_edges(s[:, -1], s[:, -2], BORDER_EDGE_LIMIT, _BORDER_TIES)
+    if width > 2:
+        count += _count_edges(s[:, 2:], s[:, :-2], INTERIOR_EDGE_LIMIT, _INTERIOR_TIES)
+    return count
+
+
+def cap_resolution(image: Image.Image, max_pixels: int) -> Image.Image:
+    """Downscale with an integer box reduce until the image fits max_pixels"""
+    pixels = image.width * image.height
+    if max_pixels <= 0 or pixels <= max_pixels:
+        return image
+    factor = int(np.ceil(np.sqrt(pixels / max_pixels)))
+    return image.reduce(factor)
+
+
+def analyze_pixels(image: Union[Image.Image, np.ndarray],
+                   max_pixels: Optional[int] = None) -> dict:
+    """
+    Compute pixel quality features for an RGB image (PIL or HxWx3 uint8).
+    Matches the original float64 np.mean/np.std/np.gradient/np.unique
+    features; max_pixels caps the analysis resolution (off by default).
+    """
+    if max_pixels is None:
+        max_pixels = DEFAULT_MAX_PIXELS
+    if isinstance(image, Image.Image):
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image = cap_resolution(image, max_pixels)
+        height, width = image.height, image.width
+    else:
+        height, width = image.shape[:2]
+
+    histogram = np.zeros(GRAY_LEVELS, dtype=np.int64)
+    edge_count = 0
+    previous = None  # last two rows of the previous band for vertical differences
+
+    for top in range(0, height, BAND_ROWS):
+        bottom = min(height, top + BAND_ROWS)
+        s = _band_sum(image, top, bottom)
+        histogram += np.bincount(s.ravel(), minlength=GRAY_LEVELS)
+        edge_count += _horizontal_edges(s)
+
+        # Vertical central differences need one row of context on each side
+        rows = s if previous is None else np.concatenate([previous, s])
+        offset = 0 if previous is None else previous.shape[0]
+        if rows.shape[0] > 2:
+            # Rows 1..len-2 have both neighbours; skip those counted last band
+            first = max(1, offset - 1)
+            last = rows.shape[0] - 1  # exclusive; row len-1 waits for the next band
+            if last > first:
+                edge_count += _count_edges(rows[first + 1:last + 1], rows[first - 1:last - 1],
+                                           INTERIOR_EDGE_LIMIT, _INTERIOR_TIES)
+        previous = rows[-2:]
+
+    if height >= 2:
+        # One-sided differences on the first and last rows
+        first_rows = _band_sum(image, 0, 2)
+        last_rows = _band_sum(image, height - 2, height)
+        edge_count += _count_edges(first_rows[1], first_rows[0], BORDER_EDGE_LIMIT, _BORDER_TIES)
+        edge_count += _count_edges(last_rows[1], last_rows[0], BORDER_EDGE_LIMIT, _BORDER_TIES)
+
+    total = height * width
+    mean = float(histogram @ _LEVELS) / total
+    pixel_std = float(np.sqrt(histogram @ (_LEVELS - mean) ** 2 / total))
+    unique_colors = int(np.count_nonzero(histogram))
+    edge_density = edge_count / total
+    color_ratio = unique_colors / total
+
+    # Pixel quality score (0-1, higher = more likely natural camera photo)
+    pixel_quality_score = min(1.0, (pixel_std / 50) * 0.5 + edge_density * 2 + color_ratio * 0.3)
+
+    return {
+        "width": width,
+        "height": height,
+        "pixel_std": pixel_std,
+        "edge_density": edge_density,
+        "unique_colors": unique_colors,
+        "color_ratio": color_ratio,
+        "pixel_quality_score": pixel_quality_score,
+        "is_suspicious": pixel_quality_score > 0.95,
+    }
@@ -0,0 +1,334 @@
+"""
+Local tiled rasters (NDVI, fire confidence) for /satellite/analyze.
+
+Layout under RASTER_TILE_DIR:
+
+    <layer>/layer.json          tile_deg, tile_size, dtype, scale, nodata, updated
+    <layer>/<row>_<col>.npy     one tile, north-up, covering
+                                lat [row*tile_deg, (row+1)*tile_deg)
+                                lon [col*tile_deg, (col+1)*tile_deg)
+
+Tiles are opened with mmap_mode="r" and only the window that intersects
+the AOI is read, so a request never loads whole scenes. Open tiles are
+kept in a small LRU keyed on the file's mtime and size, so tiles replaced
+by a later ingest are remapped on the next read. Products are converted offline, so requests never
+touch the network:
+
+    python raster_tiles.py ingest-tiff ndvi --scale 0.0001 MOD13Q1_ndvi.tif
+    python raster_tiles.py ingest-firms fire_archive_M-C61.csv
+
+MOSDAC / MODIS HDF products should be exported to GeoTIFF (EPSG:4326)
+first, e.g. with gdal_translate.
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_TILE_DIR = os.getenv("RASTER_TILE_DIR", "")
+DEFAULT_CACHE_TILES = int(os.getenv("RASTER_TILE_CACHE", "64"))
+FIRE_CONFIDENCE_MIN = int(os.getenv("FIRE_CONFIDENCE_MIN", "50"))
+
+# Per-layer storage defaults: NDVI as MODIS-style scaled int16, fire as 0-100 confidence
+LAYER_DEFAULTS = {
+    "ndvi": {"tile_deg": 1.0, "tile_size": 400, "dtype": "int16", "scale": 0.0001, "nodata": -32768},
+    "fire": {"tile_deg": 1.0, "tile_size": 100, "dtype": "uint8", "scale": 1.0, "nodata": 0},
+}
+
+# VIIRS reports confidence as low/nominal/high
+FIRMS_CONFIDENCE = {"l": 30, "low": 30, "n": 60, "nominal": 60, "h": 90, "high": 90}
+
+
+def _signature(path: str) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of a file, None if absent; changes when an ingest replaces it"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def firms_confidence(raw: Optional[str]) -> int:
+    """FIRMS confidence as 1-100 (MODIS numeric or VIIRS l/n/h; unknown -> 50)"""
+    raw = (raw or "").strip().lower()
+    if raw in FIRMS_CONFIDENCE:
+        return FIRMS_CONFIDENCE[raw]
+    try:
+        return max(1, min(100, int(float(raw))))
+    except ValueError:
+        return 50
+
+
+class TileStore:
+    """Windowed, memory-mapped reads over per-layer tile directories"""
+
+    def __init__(self, root: str, cache_tiles: int = DEFAULT_CACHE_TILES):
+        self.root = root
+        self.cache_tiles = cache_tiles
+        self._tiles = OrderedDict()  # (layer, row, col) -> (memmap, file signature)
+        # Sync routes (threadpool) and the watchlist (to_thread) share the LRU
+        self._lock = threading.Lock()
+        self._layers: Dict[str, Tuple[dict, Tuple[int, int]]] = {}  # layer -> (info, signature)
+        self.tile_hits = 0
+        self.tile_loads = 0
+
+    @classmethod
+    def open_if_configured(cls) -> Optional["TileStore"]:
+        if not DEFAULT_TILE_DIR or not os.path.isdir(DEFAULT_TILE_DIR):
+            return None
+        store = cls(DEFAULT_TILE_DIR)
+        print(f"[OK] Raster tiles: {DEFAULT_TILE_DIR} (layers: {', '.join(store.layers()) or 'none'})")
+        return store
+
+    def layers(self):
+        return [name for name in sorted(os.listdir(self.root))
+                if os.path.exists(os.path.join(self.root, name, "layer.json"))]
+
+    def layer_info(self, layer: str) -> Optional[dict]:
+        path = os.path.join(self.root, layer, "layer.json")
+        signature = _signature(path)
+        if signature is None:
+            return None
+        cached = self._layers.get(layer)
+        if cached is None or cached[1] != signature:
+            with open(path) as f:
+                cached = (json.load(f), signature)
+            self._layers[layer] = cached
+        return cached[0]
+
+    def _tile(self, layer: str, row: int, col: int) -> Optional[np.ndarray]:
+        key = (layer, row, col)
+        path = os.path.join(self.root, layer, f"{row}_{col}.npy")
+        # One stat per lookup: a re-ingest (os.replace) changes the signature,
+        # and an absent tile is never cached, so new tiles show up immediately
+        signature = _signature(path)
+        if signature is None:
+            return None
+        with self._lock:
+            cached = self._tiles.get(key)
+            if cached is not None and cached[1] == signature:
+                self.tile_hits += 1
+                self._tiles.move_to_end(key)
+                return cached[0]
+        try:
+            tile = np.load(path, mmap_mode="r")
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self.tile_loads += 1
+            self._tiles[key] = (tile, signature)
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.cache_tiles:
+                self._tiles.popitem(last=False)
+        return tile
+
+    def windows(self, layer: str, aoi: dict) -> Iterator[np.ndarray]:
+        """Yield the array window of every tile intersecting the AOI"""
+        info = self.layer_info(layer)
+        if info is None:
+            return
+        tile_deg, size = info["tile_deg"], info["tile_size"]
+        pixel = tile_deg / size
+        for row in range(math.floor(aoi["minLat"] / tile_deg), math.ceil(aoi["maxLat"] / tile_deg)):
+            for col in range(math.floor(aoi["minLon"] / tile_deg), math.ceil(aoi["maxLon"] / tile_deg)):
+                tile = self._tile(layer, row, col)
+                if tile is None:
+                    continue
+                top, left = (row + 1) * tile_deg, col * tile_deg
+                r0 = max(0, math.floor((top - aoi["maxLat"]) / pixel))
+                r1 = min(size, math.ceil((top - aoi["minLat"]) / pixel))
+                c0 = max(0, math.floor((aoi["minLon"] - left) / pixel))
+                c1 = min(size, math.ceil((aoi["maxLon"] - left) / pixel))
+                if r1 > r0 and c1 > c0:
+                    yield tile[r0:r1, c0:c1]
+
+    def mean_ndvi(self, aoi: dict) -> Optional[float]:
+        info = self.layer_info("ndvi")
+        if info is None:
+            return None
+        total, count = 0.0, 0
+        for window in self.windows("ndvi", aoi):
+            valid = window != info["nodata"]
+            total += float(window.sum(where=valid, dtype=np.float64))
+            count += int(np.count_nonzero(valid))
+        if count == 0:
+            return None
+        return total / count * info["scale"]
+
+    def hotspot_count(self, aoi: dict, min_confidence: int = FIRE_CONFIDENCE_MIN) -> Optional[int]:
+        if self.layer_info("fire") is None:
+            return None
+        return sum(int(np.count_nonzero(window >= min_confidence))
+                   for window in self.windows("fire", aoi))
+
+    def last_update(self, layers) -> Optional[str]:
+        stamps = [self.layer_info(l).get("updated") for l in layers if self.layer_info(l)]
+        stamps = [s for s in stamps if s]
+        return max(stamps) if stamps else None
+
+    def stats(self) -> dict:
+        return {
+            "root": self.root,
+            "layers": {name: self.layer_info(name) for name in self.layers()},
+            "open_tiles": len(self._tiles),
+            "tile_hits": self.tile_hits,
+            "tile_loads": self.tile_loads,
+        }
+
+
+# --- offline ingest -------------------------------------------------------
+
+def _layer_dir(root: str, layer: str, **overrides) -> Tuple[str, dict]:
+    path = os.path.join(root, layer)
+    os.makedirs(path, exist_ok=True)
+    meta_path = os.path.join(path, "layer.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            info = json.load(f)
+    else:
+        info = dict(LAYER_DEFAULTS.get(layer, LAYER_DEFAULTS["ndvi"]))
+        info.update({k: v for k, v in overrides.items() if v is not None})
+    return path, info
+
+
+def _write_layer_info(path: str, info: dict):
+    info["updated"] = datetime.now().isoformat()
+    # Readers re-read layer.json when it changes, so never expose a partial file
+    final = os.path.join(path, "layer.json")
+    with open(final + ".tmp", "w") as f:
+        json.dump(info, f, indent=2)
+    os.replace(final + ".tmp", final)
+
+
+def _load_tile_for_write(path: str, row: int, col: int, info: dict) -> np.ndarray:
+    tile_path = os.path.join(path, f"{row}_{col}.npy")
+    if os.path.exists(tile_path):
+        return np.load(tile_path)
+    return np.full((info["tile_size"], info["tile_size"]), info["nodata"], dtype=info["dtype"])
+
+
+def _save_tile(path: str, row: int, col: int, tile: np.ndarray):
+    # Write-then-rename so readers never map a half-written tile
+    final = os.path.join(path, f"{row}_{col}.npy")
+    temp = final + ".tmp.npy"
+    np.save(temp, tile)
+    os.replace(temp, final)
+
+
+def read_geotiff(tiff_path: str):
+    """Single-band GeoTIFF (EPSG:4326) -> (float32 array, max_lat, min_lon, pixel_lat, pixel_lon)"""
+    from PIL import Image
+
+    Image.MAX_IMAGE_PIXELS = None
+    image = Image.open(tiff_path)
+    scale = image.tag_v2.get(33550)     # ModelPixelScaleTag
+    tiepoint = image.tag_v2.get(33922)  # ModelTiepointTag
+    if not scale or not tiepoint:
+        raise ValueError("GeoTIFF is missing ModelPixelScale/ModelTiepoint tags")
+    pixel_lon, pixel_lat = float(scale[0]), float(scale[1])
+    min_lon = float(tiepoint[3]) - float(tiepoint[0]) * pixel_lon
+    max_lat = float(tiepoint[4]) + float(tiepoint[1]) * pixel_lat
+    return np.asarray(image.convert("F"), dtype=np.float32), max_lat, min_lon, pixel_lat, pixel_lon
+
+
+def ingest_geotiff(root: str, layer: str, tiff_path: str, value_scale: float = 1.0,
+                   source_nodata: Optional[float] = None) -> int:
+    """
+    Resample a GeoTIFF onto the layer's tile grid (nearest neighbour) and merge
+    it into existing tiles. Stored value = round(source * value_scale / layer scale).
+    Returns the number of tiles written.
+    """
+    path, info = _layer_dir(root, layer)
+    data, max_lat, min_lon, pixel_lat, pixel_lon = read_geotiff(tiff_path)
+    rows, cols = data.shape
+    min_lat, max_lon = max_lat - rows * pixel_lat, min_lon + cols * pixel_lon
+    tile_deg, size = info["tile_deg"], info["tile_size"]
+    pixel = tile_deg / size
+    limits = np.iinfo(info["dtype"]) if np.dtype(info["dtype"]).kind in "iu" else None
+
+    written = 0
+    for row in range(math.floor(min_lat / tile_deg), math.ceil(max_lat / tile_deg)):
+        for col in range(math.floor(min_lon / tile_deg), math.ceil(max_lon / tile_deg)):
+            top, left = (row + 1) * tile_deg, col * tile_deg
+            centre_lats = top - (np.arange(size) + 0.5) * pixel
+            centre_lons = left + (np.arange(size) + 0.5) * pixel
+            src_rows = np.floor((max_lat - centre_lats) / pixel_lat).astype(np.int64)
+            src_cols = np.floor((centre_lons - min_lon) / pixel_lon).astype(np.int64)
+            row_ok = (src_rows >= 0) & (src_rows < rows)
+            col_ok = (src_cols >= 0) & (src_cols < cols)
+            if not row_ok.any() or not col_ok.any():
+                continue
+            sample = data[np.clip(src_rows, 0, rows - 1)[:, None], np.clip(src_cols, 0, cols - 1)[None, :]]
+            valid = row_ok[:, None] & col_ok[None, :] & np.isfinite(sample)
+            if source_nodata is not None:
+                valid &= sample != source_nodata
+            if not valid.any():
+                continue
+            values = np.rint(sample * value_scale / info["scale"])
+            if limits is not None:
+                values = np.clip(values, limits.min, limits.max)
+            tile = _load_tile_for_write(path, row, col, info)
+            tile[valid] = values[valid].astype(info["dtype"])
+            _save_tile(path, row, col, tile)
+            written += 1
+    _write_layer_info(path, info)
+    return written
+
+
+def ingest_firms_csv(root: str, csv_path: str) -> int:
+    """Rasterize FIRMS hotspots into the fire layer (max confidence per pixel)"""
+    path, info = _layer_dir(root, "fire")
+    tile_deg, size = info["tile_deg"], info["tile_size"]
+    pixel = tile_deg / size
+    tiles: Dict[Tuple[int, int], np.ndarray] = {}
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for record in csv.DictReader(f):
+            try:
+                lat, lon = float(record["latitude"]), float(record["longitude"])
+            except (KeyError, ValueError):
+                continue
+            confidence = firms_confidence(record.get("confidence"))
+            row, col = math.floor(lat / tile_deg), math.floor(lon / tile_deg)
+            if (row, col) not in tiles:
+                tiles[(row, col)] = _load_tile_for_write(path, row, col, info)
+            r = min(size - 1, int(((row + 1) * tile_deg - lat) / pixel))
+            c = min(size - 1, int((lon - col * tile_deg) / pixel))
+            tiles[(row, col)][r, c] = max(tiles[(row, col)][r, c], confidence)
+    for (row, col), tile in tiles.items():
+        _save_tile(path, row, col, tile)
+    _write_layer_info(path, info)
+    return len(tiles)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build local NDVI / fire raster tiles")
+    parser.add_argument("--root", default=DEFAULT_TILE_DIR or "data/tiles")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    tiff = sub.add_parser("ingest-tiff", help="Merge a GeoTIFF into a layer")
+    tiff.add_argument("layer", choices=sorted(LAYER_DEFAULTS))
+    tiff.add_argument("tiff_path")
+    tiff.add_argument("--scale", type=float, default=1.0,
+                      help="Multiply source values to physical units (e.g. 0.0001 for MODIS NDVI)")
+    tiff.add_argument("--nodata", type=float, default=None)
+
+    firms = sub.add_parser("ingest-firms", help="Rasterize a FIRMS hotspot CSV into the fire layer")
+    firms.add_argument("csv_path")
+
+    args = parser.parse_args(argv)
+    if args.command == "ingest-tiff":
+        count = ingest_geotiff(args.root, args.layer, args.tiff_path, args.scale, args.nodata)
+    else:
+        count = ingest_firms_csv(args.root, args.csv_path)
+    print(f"Wrote {count} tiles under {args.root}")
+
+
+if __name__ == "__main__":
+    main()
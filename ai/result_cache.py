@@ -0,0 +1,150 @@
+"""
+Content-addressed cache for image classification results.
+
+Keys are sha256 over the model id/revision and the uploaded bytes, so a
+model swap never serves stale verdicts. A bounded in-memory LRU sits in
+front of an optional SQLite store that survives restarts.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_SIZE", "1024"))
+DEFAULT_DB_PATH = os.getenv("IMAGE_CACHE_DB") or None
+DEFAULT_DB_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_DB_SIZE", "100000"))
+
+
+class ResultCache:
+    """Memory LRU backed by an optional SQLite tier"""
+
+    def __init__(self, namespace: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 db_path: Optional[str] = DEFAULT_DB_PATH,
+                 db_max_entries: int = DEFAULT_DB_MAX_ENTRIES):
+        self.namespace = namespace
+        self.max_entries = max(0, max_entries)
+        self.db_max_entries = db_max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        self.db_path = db_path
+        self._db = None
+        self._open_db()
+        # A connection must not cross fork (gunicorn preload); children open their own
+        os.register_at_fork(after_in_child=self._open_db)
+
+    def _open_db(self):
+        self._db = None
+        if not self.db_path:
+            return
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"[ERROR] Result cache disk tier disabled: {e}")
+            self._db = None
+
+    def make_key(self, content_digest: str, kind: str = "probabilities") -> str:
+        """Cache key from the sha256 hex digest of the uploaded bytes"""
+        return hashlib.sha256(
+            f"{self.namespace}\0{kind}\0{content_digest}".encode()
+        ).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        value = self._disk_get(key)
+        if value is not None:
+            with self._lock:
+                self.disk_hits += 1
+            self._memory_put(key, value)
+            return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: Any):
+        self._memory_put(key, value)
+        self._disk_put(key, value)
+
+    def _memory_put(self, key: str, value: Any):
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.evictions += 1
+
+    def _disk_get(self, key: str) -> Optional[Any]:
+        if self._db is None:
+            return None
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT value FROM results WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Result cache read error: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def _disk_put(self, key: str, value: Any):
+        if self._db is None:
+            return
+        try:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), time.time()),
+                )
+                # Trim oldest rows once the store grows past its bound
+                # (checked periodically, COUNT(*) is a full scan)
+                self._writes += 1
+                overflow = 0
+                if self._writes % 256 == 0:
+                    count = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+                    overflow = count - self.db_max_entries
+                if overflow > 0:
+                    self._db.execute(
+                        "DELETE FROM results WHERE key IN "
+                        "(SELECT key FROM results ORDER BY created LIMIT ?)",
+                        (overflow,),
+                    )
+                    self.evictions += overflow
+                self._db.commit()
+        except sqlite3.Error as e:
+            print(f"Result cache write error: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "disk_enabled": self._db is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.disk_hits) / lookups, 4) if lookups else None,
+        }
@@ -0,0 +1,177 @@
+"""
+Grid cells for /gbif/riskmap.
+
+Tiles either a rectangular AOI or a buffer along the Ganga main stem
+(ai/data/ganga_river.geojson, clipped to the Gangetic plain) into fixed
+lat/lon cells. Cell centres sit on
+a global grid (multiples of cell_deg), so the same cell always gets the
+same centre and per-cell results stay cacheable across requests.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+
+KM_PER_DEG = 111.32
+GANGA_GEOJSON = os.path.join(os.path.dirname(__file__), "data", "ganga_river.geojson")
+# Cells tested against the corridor (segment bounding boxes), bounds the work per request
+MAX_CANDIDATE_CELLS = int(os.getenv("RISKMAP_MAX_CANDIDATE_CELLS", "1000000"))
+# (minLat, minLon, maxLat, maxLon) of the default corridor: the geojson line runs on
+# past the delta (~92E, 21.8N) into Myanmar and the South China Sea
+CORRIDOR_BBOX = (21.0, 77.0, 31.5, 89.5)
+
+_corridors = {}
+
+
+class TooManyCells(ValueError):
+    """A grid would exceed the cell limit (raised before anything is allocated)"""
+
+    def __init__(self, cells: int, limit: int):
+        super().__init__(f"{cells} cells exceeds {limit}")
+        self.cells = cells
+        self.limit = limit
+
+
+def load_corridor(path: str = GANGA_GEOJSON) -> np.ndarray:
+    """All LineString vertices as an (N, 2) array of (lon, lat); segments never cross features"""
+    if path not in _corridors:
+        with open(path) as f:
+            collection = json.load(f)
+        lines = []
+        for feature in collection.get("features", []):
+            geometry = feature.get("geometry") or {}
+            if geometry.get("type") == "LineString":
+                lines.append(geometry["coordinates"])
+            elif geometry.get("type") == "MultiLineString":
+                lines.extend(geometry["coordinates"])
+        # Keep line breaks as NaN rows so no segment bridges two lines
+        parts = []
+        for line in lines:
+            parts.append(np.asarray(line, dtype=np.float64)[:, :2])
+            parts.append(np.full((1, 2), np.nan))
+        _corridors[path] = np.concatenate(parts[:-1]) if parts else np.empty((0, 2))
+    return _corridors[path]
+
+
+def _index_range(low: float, high: float, cell_deg: float) -> Tuple[int, int]:
+    """[first, stop) global cell indices covering low..high"""
+    return math.floor(low / cell_deg), max(math.ceil(high / cell_deg), math.floor(low / cell_deg))
+
+
+def grid_size(min_lat: float, max_lat: float, min_lon: float, max_lon: float, cell_deg: float) -> int:
+    """Number of cells _grid_centres would return, from the bounds alone"""
+    row0, row1 = _index_range(min_lat, max_lat, cell_deg)
+    col0, col1 = _index_range(min_lon, max_lon, cell_deg)
+    return (row1 - row0) * (col1 - col0)
+
+
+def _grid_centres(min_lat: float, max_lat: float, min_lon: float, max_lon: float,
+                  cell_deg: float) -> Tuple[np.ndarray, np.ndarray]:
+    rows = np.arange(*_index_range(min_lat, max_lat, cell_deg))
+    cols = np.arange(*_index_range(min_lon, max_lon, cell_deg))
+    lats, lons = np.meshgrid((rows + 0.5) * cell_deg, (cols + 0.5) * cell_deg, indexing="ij")
+    return np.round(lats.ravel(), 6), np.round(lons.ravel(), 6)
+
+
+def aoi_cells(aoi: dict, cell_deg: float, max_cells: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Cell centres covering {minLat, maxLat, minLon, maxLon}; TooManyCells past max_cells"""
+    bounds = (aoi["minLat"], aoi["maxLat"], aoi["minLon"], aoi["maxLon"])
+    cells = grid_size(*bounds, cell_deg)
+    if max_cells is not None and cells > max_cells:
+        raise TooManyCells(cells, max_cells)
+    return _grid_centres(*bounds, cell_deg)
+
+
+@lru_cache(maxsize=8)
+def _default_corridor_cells(cell_deg: float, buffer_km: float, max_candidates: int):
+    return corridor_cells(cell_deg, buffer_km, load_corridor(), max_candidates, CORRIDOR_BBOX)
+
+
+def corridor_cells(cell_deg: float, buffer_km: float, line: Optional[np.ndarray] = None,
+                   max_candidates: int = MAX_CANDIDATE_CELLS,
+                   bbox: Optional[Tuple[float, float, float, float]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cell centres within buffer_km of the corridor polyline, and inside bbox
+    (minLat, minLon, maxLat, maxLon) when given; the default line is clipped
+    to CORRIDOR_BBOX. Only cells in each segment's padded bounding box are
+    tested; TooManyCells when those boxes hold more than max_candidates cells.
+    """
+    if line is None:
+        return _default_corridor_cells(cell_deg, buffer_km, max_candidates)
+    start, end = line[:-1], line[1:]
+    keep = ~(np.isnan(start[:, 0]) | np.isnan(end[:, 0]))
+    start, end = start[keep], end[keep]
+    if len(start) == 0:
+        return np.empty(0), np.empty(0)
+
+    pad = buffer_km / KM_PER_DEG + cell_deg
+    seg_lat = np.stack([start[:, 1], end[:, 1]], axis=1)
+    seg_lon = np.stack([start[:, 0], end[:, 0]], axis=1)
+    # Longitude degrees shrink with latitude; pad using the segment's poleward end
+    lon_pad = pad / np.maximum(np.cos(np.radians(np.abs(seg_lat).max(axis=1))), 1e-6)
+    row0 = np.floor((seg_lat.min(axis=1) - pad) / cell_deg).astype(np.int64)
+    row1 = np.ceil((seg_lat.max(axis=1) + pad) / cell_deg).astype(np.int64)
+    col0 = np.floor((seg_lon.min(axis=1) - lon_pad) / cell_deg).astype(np.int64)
+    col1 = np.ceil((seg_lon.max(axis=1) + lon_pad) / cell_deg).astype(np.int64)
+    if bbox is not None:
+        # Clamp the boxes first so segments outside bbox add no candidates
+        row0 = np.maximum(row0, math.floor(bbox[0] / cell_deg))
+        row1 = np.minimum(row1, math.ceil(bbox[2] / cell_deg))
+        col0 = np.maximum(col0, math.floor(bbox[1] / cell_deg))
+        col1 = np.minimum(col1, math.ceil(bbox[3] / cell_deg))
+        inside = (row1 > row0) & (col1 > col0)
+        start, end = start[inside], end[inside]
+        row0, row1, col0, col1 = row0[inside], row1[inside], col0[inside], col1[inside]
+        if len(start) == 0:
+            return np.empty(0), np.empty(0)
+    candidates = int(((row1 - row0) * (col1 - col0)).sum())
+    if candidates > max_candidates:
+        raise TooManyCells(candidates, max_candidates)
+
+    near = []
+    for i in range(len(start)):
+        rows, cols = np.meshgrid(np.arange(row0[i], row1[i]), np.arange(col0[i], col1[i]), indexing="ij")
+        rows, cols = rows.ravel(), cols.ravel()
+        plat, plon = (rows + 0.5) * cell_deg, (cols + 0.5) * cell_deg
+        # Distance from each centre to the segment, in local km
+        kx = KM_PER_DEG * np.cos(np.radians(plat))
+        ax, ay = (start[i, 0] - plon) * kx, (start[i, 1] - plat) * KM_PER_DEG
+        bx, by = (end[i, 0] - plon) * kx, (end[i, 1] - plat) * KM_PER_DEG
+        dx, dy = bx - ax, by - ay
+        length2 = np.maximum(dx * dx + dy * dy, 1e-12)
+        t = np.clip(-(ax * dx + ay * dy) / length2, 0.0, 1.0)
+        cx, cy = ax + t * dx, ay + t * dy
+        hit = cx * cx + cy * cy <= buffer_km * buffer_km
+        if bbox is not None:
+            hit &= (plat >= bbox[0]) & (plat <= bbox[2]) & (plon >= bbox[1]) & (plon <= bbox[3])
+        near.append(np.stack([rows[hit], cols[hit]], axis=1))
+    cells = np.unique(np.concatenate(near), axis=0)  # row-major, as _grid_centres
+    return np.round((cells[:, 0] + 0.5) * cell_deg, 6), np.round((cells[:, 1] + 0.5) * cell_deg, 6)
+
+
+def cell_radius_km(cell_deg: float, lat: float) -> int:
+    """Search radius (km) that covers a cell from its centre"""
+    half_height = cell_deg / 2 * KM_PER_DEG
+    half_width = half_height * math.cos(math.radians(lat))
+    return max(1, int(math.ceil(math.hypot(half_height, half_width))))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the default corridor grid stays in CORRIDOR_BBOX")
+    parser.add_argument("--cell-deg", type=float, default=0.2)
+    parser.add_argument("--buffer-km", type=float, default=10.0)
+    args = parser.parse_args(argv)
+    lats, lons = corridor_cells(args.cell_deg, args.buffer_km)
+    min_lat, min_lon, max_lat, max_lon = CORRIDOR_BBOX
+    outside = ~((lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon))
+    print(f"{len(lats)} corridor cells at {args.cell_deg} deg, {int(outside.sum())} outside {CORRIDOR_BBOX}")
+    return 1 if outside.any() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
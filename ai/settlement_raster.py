@@ -0,0 +1,229 @@
+"""
+Precomputed human-proximity raster for calculate_human_proximity.
+
+The raster is a plain .npy array (uint8, 0-255 => proximity 0-1) opened with
+mmap_mode="r", plus a small JSON header holding its geotransform. A lookup
+is one index into the mapped array; every uvicorn worker maps the same file
+so the pages are shared through the OS page cache.
+
+Build it offline from a settlements CSV (lat, lon, population) or from a
+population GeoTIFF (GHSL / WorldPop style, read with Pillow):
+
+    python settlement_raster.py from-csv settlements.csv --out data/settlement_proximity
+    python settlement_raster.py from-tiff worldpop.tif --out data/settlement_proximity
+
+and point SETTLEMENT_RASTER at the output prefix.
+"""
+import argparse
+import csv
+import json
+import math
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+KM_PER_DEG = 111.32
+DEFAULT_CELL_DEG = 0.01  # ~1.1 km
+DEFAULT_DECAY_KM = 5.0
+REFERENCE_POPULATION = 1_000_000  # a settlement this size saturates proximity at its centre
+
+# Gangetic plain (minLat, minLon, maxLat, maxLon), matches occurrence_store
+GANGETIC_PLAIN_BBOX = (21.5, 77.0, 31.5, 89.0)
+
+
+class SettlementRaster:
+    """Memory-mapped proximity grid with O(1) point lookups"""
+
+    def __init__(self, prefix: str):
+        with open(prefix + ".json") as f:
+            header = json.load(f)
+        self.max_lat = header["max_lat"]
+        self.min_lon = header["min_lon"]
+        self.cell_deg = header["cell_deg"]
+        self.source = header.get("source")
+        self.grid = np.load(prefix + ".npy", mmap_mode="r")
+        self.rows, self.cols = self.grid.shape
+        self.min_lat = self.max_lat - self.rows * self.cell_deg
+        self.max_lon = self.min_lon + self.cols * self.cell_deg
+
+    @classmethod
+    def open_if_configured(cls) -> Optional["SettlementRaster"]:
+        prefix = os.getenv("SETTLEMENT_RASTER")
+        if not prefix:
+            return None
+        try:
+            raster = cls(prefix)
+            print(f"[OK] Settlement raster: {prefix} ({raster.rows}x{raster.cols})")
+            return raster
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[ERROR] Failed to load settlement raster: {e}")
+            return None
+
+    def lookup(self, lat: float, lon: float) -> Optional[float]:
+        """Proximity 0-1 at a point, None outside the raster"""
+        row = int((self.max_lat - lat) / self.cell_deg)
+        col = int((lon - self.min_lon) / self.cell_deg)
+        if lat > self.max_lat or lon < self.min_lon or row >= self.rows or col >= self.cols:
+            return None
+        return int(self.grid[row, col]) / 255.0
+
+    def lookup_many(self, lats, lons) -> np.ndarray:
+        """Vectorized lookup; NaN for points outside the raster"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        rows = np.floor((self.max_lat - lats) / self.cell_deg).astype(np.int64)
+        cols = np.floor((lons - self.min_lon) / self.cell_deg).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+        result = np.full(lats.shape, np.nan)
+        result[inside] = self.grid[rows[inside], cols[inside]] / 255.0
+        return result
+
+
+def save_raster(prefix: str, proximity: np.ndarray, max_lat: float, min_lon: float,
+                cell_deg: float, source: str):
+    """Quantize a 0-1 float grid to uint8 and write .npy + .json header"""
+    os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+    grid = np.clip(np.rint(proximity * 255.0), 0, 255).astype(np.uint8)
+    np.save(prefix + ".npy", grid)
+    with open(prefix + ".json", "w") as f:
+        json.dump({
+            "max_lat": max_lat,
+            "min_lon": min_lon,
+            "cell_deg": cell_deg,
+            "rows": grid.shape[0],
+            "cols": grid.shape[1],
+            "dtype": "uint8",
+            "scale": 1 / 255.0,
+            "source": source,
+        }, f, indent=2)
+
+
+def build_from_settlements(csv_path: str, bbox: Tuple[float, float, float, float],
+                           cell_deg: float = DEFAULT_CELL_DEG,
+                           decay_km: float = DEFAULT_DECAY_KM) -> np.ndarray:
+    """
+    Proximity = max over settlements of size_weight * exp(-distance / decay_km),
+    where size_weight = log10(population) / log10(REFERENCE_POPULATION), capped at 1.
+    """
+    min_lat, min_lon, max_lat, max_lon = bbox
+    rows = int(math.ceil((max_lat - min_lat) / cell_deg))
+    cols = int(math.ceil((max_lon - min_lon) / cell_deg))
+    proximity = np.zeros((rows, cols), dtype=np.float32)
+    reach_km = decay_km * 5  # exp(-5) < 1%, below uint8 resolution once weighted
+
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for record in csv.DictReader(f):
+            try:
+                lat = float(record.get("lat") or record["latitude"])
+                lon = float(record.get("lon") or record["longitude"])
+                population = float(record.get("population") or 1)
+            except (KeyError, ValueError):
+                continue
+            weight = min(1.0, math.log10(max(population, 1.0)) / math.log10(REFERENCE_POPULATION))
+            if weight <= 0:
+                continue
+
+            # Only touch the window of cells within reach of this settlement
+            dlat = reach_km / KM_PER_DEG
+            dlon = reach_km / (KM_PER_DEG * max(math.cos(math.radians(lat)), 1e-6))
+            r0 = max(0, int((max_lat - (lat + dlat)) / cell_deg))
+            r1 = min(rows, int((max_lat - (lat - dlat)) / cell_deg) + 1)
+            c0 = max(0, int((lon - dlon - min_lon) / cell_deg))
+            c1 = min(cols, int((lon + dlon - min_lon) / cell_deg) + 1)
+            if r0 >= r1 or c0 >= c1:
+                continue
+
+            cell_lats = max_lat - (np.arange(r0, r1) + 0.5) * cell_deg
+            cell_lons = min_lon + (np.arange(c0, c1) + 0.5) * cell_deg
+            dy = (cell_lats[:, None] - lat) * KM_PER_DEG
+            dx = (cell_lons[None, :] - lon) * KM_PER_DEG * math.cos(math.radians(lat))
+            influence = weight * np.exp(-np.sqrt(dx * dx + dy * dy) / decay_km)
+            np.maximum(proximity[r0:r1, c0:c1], influence, out=proximity[r0:r1, c0:c1])
+
+    return proximity
+
+
+def _box_blur(values: np.ndarray, radius: int) -> np.ndarray:
+    """Mean over a (2r+1)^2 window via cumulative sums (separable)"""
+    if radius <= 0:
+        return values
+    for axis in (0, 1):
+        padded = np.pad(values, [(radius, radius) if a == axis else (0, 0) for a in (0, 1)], mode="edge")
+        cumulative = np.cumsum(padded, axis=axis, dtype=np.float64)
+        cumulative = np.insert(cumulative, 0, 0, axis=axis)
+        width = 2 * radius + 1
+        upper = np.take(cumulative, np.arange(width, cumulative.shape[axis]), axis=axis)
+        lower = np.take(cumulative, np.arange(0, cumulative.shape[axis] - width), axis=axis)
+        values = ((upper - lower) / width).astype(np.float32)
+    return values
+
+
+def build_from_population_tiff(tiff_path: str, decay_km: float = DEFAULT_DECAY_KM,
+                               people_per_km2: float = 1000.0):
+    """
+    Population-count GeoTIFF (north-up, EPSG:4326) -> proximity grid on its own
+    geotransform. Density is smoothed over ~decay_km and mapped through
+    1 - exp(-density / people_per_km2). Returns (grid, max_lat, min_lon, cell_deg).
+    """
+    from PIL import Image
+
+    Image.MAX_IMAGE_PIXELS = None
+    image = Image.open(tiff_path)
+    scale = image.tag_v2.get(33550)     # ModelPixelScaleTag (sx, sy, sz)
+    tiepoint = image.tag_v2.get(33922)  # ModelTiepointTag (i, j, k, x, y, z)
+    if not scale or not tiepoint:
+        raise ValueError("GeoTIFF is missing ModelPixelScale/ModelTiepoint tags")
+    cell_deg = float(scale[0])
+    min_lon = float(tiepoint[3]) - float(tiepoint[0]) * cell_deg
+    max_lat = float(tiepoint[4]) + float(tiepoint[1]) * float(scale[1])
+
+    population = np.asarray(image.convert("F"), dtype=np.float32)
+    population = np.where(np.isfinite(population) & (population > 0), population, 0)
+
+    cell_km = cell_deg * KM_PER_DEG
+    density = population / (cell_km * cell_km)
+    density = _box_blur(density, int(round(decay_km / cell_km)))
+    proximity = 1.0 - np.exp(-density / people_per_km2)
+    return proximity, max_lat, min_lon, cell_deg
+
+
+def _parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    parts = [float(p) for p in value.split(",")]
+    if len(parts) != 4:
+        raise argparse.ArgumentTypeError("bbox must be minLat,minLon,maxLat,maxLon")
+    return tuple(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the settlement proximity raster")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    from_csv = sub.add_parser("from-csv", help="Settlement points: lat,lon,population")
+    from_csv.add_argument("csv_path")
+    from_csv.add_argument("--bbox", type=_parse_bbox, default=GANGETIC_PLAIN_BBOX)
+    from_csv.add_argument("--cell-deg", type=float, default=DEFAULT_CELL_DEG)
+
+    from_tiff = sub.add_parser("from-tiff", help="Population count GeoTIFF (EPSG:4326)")
+    from_tiff.add_argument("tiff_path")
+    from_tiff.add_argument("--people-per-km2", type=float, default=1000.0)
+
+    for command in (from_csv, from_tiff):
+        command.add_argument("--out", default="data/settlement_proximity", help="Output prefix")
+        command.add_argument("--decay-km", type=float, default=DEFAULT_DECAY_KM)
+
+    args = parser.parse_args(argv)
+    if args.command == "from-csv":
+        proximity = build_from_settlements(args.csv_path, args.bbox, args.cell_deg, args.decay_km)
+        save_raster(args.out, proximity, args.bbox[2], args.bbox[1], args.cell_deg,
+                    os.path.basename(args.csv_path))
+    else:
+        proximity, max_lat, min_lon, cell_deg = build_from_population_tiff(
+            args.tiff_path, args.decay_km, args.people_per_km2)
+        save_raster(args.out, proximity, max_lat, min_lon, cell_deg,
+                    os.path.basename(args.tiff_path))
+    print(f"Wrote {args.out}.npy ({proximity.shape[0]}x{proximity.shape[1]}) and {args.out}.json")
+
+
+if __name__ == "__main__":
+    main()
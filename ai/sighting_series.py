@@ -0,0 +1,460 @@
+"""
+Weekly sighting counts per species and grid cell, with rolling trend windows.
+
+Each (species, 0.1 degree cell) series keeps its weekly counts plus two
+running sums over completed weeks:
+
+    recent    the last TREND_RECENT_WEEKS weeks (default 13, ~90 days)
+    baseline  the TREND_BASELINE_WEEKS weeks before that (default 52)
+
+New sightings adjust the sums as they arrive, and a series rolls its windows
+forward lazily (a few additions per elapsed week) the next time it is
+touched, so a trend lookup is O(1) per cell and needs no network I/O. The
+trend ratio compares weekly rates (recent / R against baseline / B), so
+the two windows are comparable regardless of their lengths.
+
+Fed from GBIF downloads, an existing occurrence store, incremental GBIF
+pulls, or records the API fetched; gbifIDs already counted are skipped:
+
+    python sighting_series.py ingest --db series.db 0012345-240101.zip
+    python sighting_series.py backfill --db series.db --occurrences occurrences.db
+    python sighting_series.py pull --db series.db --species "Panthera tigris"
+    python sighting_series.py stats --db series.db
+
+A running API reloads the in-memory series when the CLI has written the
+database (checked every SIGHTING_SERIES_REFRESH_S seconds).
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from occurrence_store import (
+    CELL_DEG, GANGETIC_PLAIN_BBOX, KM_PER_DEG, _iter_rows, _parse_bbox, _records,
+    cell_index, normalize_species, parse_event_date,
+)
+
+RECENT_WEEKS = int(os.getenv("TREND_RECENT_WEEKS", "13"))
+BASELINE_WEEKS = int(os.getenv("TREND_BASELINE_WEEKS", "52"))
+REFRESH_S = float(os.getenv("SIGHTING_SERIES_REFRESH_S", "60"))
+PULL_PAGE_SIZE = 300
+PULL_MAX_RECORDS = 100000  # GBIF search paging limit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS weekly (
+    species TEXT NOT NULL,
+    cell_y INTEGER NOT NULL,
+    cell_x INTEGER NOT NULL,
+    week INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (species, cell_y, cell_x, week)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS seen (
+    gbif_id INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# (gbif_id or None, species, lat, lon, yyyy-mm-dd)
+Sighting = Tuple[Optional[int], str, float, float, str]
+
+
+def week_of(day: str) -> int:
+    """Week number (Monday-based, since 0001-01-01) of an ISO date"""
+    return date.fromisoformat(day[:10]).toordinal() // 7
+
+
+def current_week() -> int:
+    return date.today().toordinal() // 7
+
+
+def sightings_from_gbif(results: Iterable[dict]) -> List[Sighting]:
+    """Sightings from GBIF occurrence/search result records"""
+    sightings = []
+    for row in results:
+        try:
+            lat = float(row["decimalLatitude"])
+            lon = float(row["decimalLongitude"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        name = row.get("species") or row.get("scientificName") or ""
+        day = parse_event_date({k: str(row.get(k) or "") for k in ("eventDate", "year", "month", "day")})
+        if name.strip() and day:
+            key = row.get("gbifID") or row.get("key")
+            sightings.append((int(key) if key else None, name, lat, lon, day))
+    return sightings
+
+
+class _Series:
+    """Weekly counts of one species in one cell and its window sums as of a week"""
+    __slots__ = ("weeks", "recent", "baseline", "as_of")
+
+    def __init__(self, as_of: int):
+        self.weeks: Dict[int, int] = {}
+        self.recent = 0
+        self.baseline = 0
+        self.as_of = as_of
+
+
+class SightingSeries:
+    """In-memory weekly series with rolling window sums, persisted to SQLite"""
+
+    def __init__(self, path: str, recent_weeks: int = RECENT_WEEKS,
+                 baseline_weeks: int = BASELINE_WEEKS, now_week: Optional[int] = None):
+        self.path = path
+        self.recent_weeks = max(1, recent_weeks)
+        self.baseline_weeks = max(1, baseline_weeks)
+        self._now_week = now_week  # fixed clock for tests / replays
+        self._series: Dict[Tuple[str, int, int], _Series] = {}
+        self._species = set()  # every species with weekly rows, including ones outside the windows
+        self._lock = threading.Lock()
+        self._region = None
+        self._next_refresh = time.monotonic() + REFRESH_S
+        self._writes = 0
+        self._open_db()
+        self._version = self._data_version()
+        self._load()
+        # A connection must not cross fork (gunicorn preload); children open their own
+        os.register_at_fork(after_in_child=self._open_db)
+
+    @classmethod
+    def open_if_configured(cls) -> Optional["SightingSeries"]:
+        """Series from SIGHTING_SERIES_DB, or None when unset/missing"""
+        path = os.getenv("SIGHTING_SERIES_DB")
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            series = cls(path)
+            print(f"[OK] Sighting series: {path} ({len(series._series)} series, region {series.region})")
+            return series
+        except sqlite3.Error as e:
+            print(f"[ERROR] Failed to open sighting series: {e}")
+            return None
+
+    def _open_db(self):
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    @property
+    def window_weeks(self) -> int:
+        return self.recent_weeks + self.baseline_weeks
+
+    def now(self) -> int:
+        return self._now_week if self._now_week is not None else current_week()
+
+    def _data_version(self) -> int:
+        # Changes whenever another connection (ingest / pull CLI) commits
+        with self._lock:
+            return self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _load(self):
+        """Weekly rows still inside the windows (older history stays on disk), swapped in whole"""
+        now = self.now()
+        writes = self._writes
+        # Own short-lived connection: the shared one stays free for writers meanwhile
+        db = sqlite3.connect(self.path)
+        try:
+            rows = db.execute(
+                "SELECT species, cell_y, cell_x, week, count FROM weekly WHERE week >= ?",
+                (now - self.window_weeks,),
+            ).fetchall()
+            row = db.execute("SELECT value FROM meta WHERE key = 'region'").fetchone()
+            species = {name for (name,) in db.execute("SELECT DISTINCT species FROM weekly")}
+        finally:
+            db.close()
+        loaded: Dict[Tuple[str, int, int], _Series] = {}
+        for species, cell_y, cell_x, week, count in rows:
+            key = (species, cell_y, cell_x)
+            series = loaded.get(key)
+            if series is None:
+                series = loaded[key] = _Series(now)
+            self._add(series, week, count)
+        with self._lock:
+            self._series = loaded
+            self._species = species
+            self._region = tuple(json.loads(row[0])) if row else None
+            if self._writes != writes:
+                self._version = None  # in-process additions raced the read; reload again next time
+
+    def refresh_due(self) -> bool:
+        """True (once per SIGHTING_SERIES_REFRESH_S) when refresh() should run"""
+        now = time.monotonic()
+        if now < self._next_refresh:
+            return False
+        self._next_refresh = now + REFRESH_S
+        return True
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload when another process wrote the database since the last load"""
+        version = self._data_version()
+        if not force and version == self._version:
+            return False
+        self._version = version
+        self._load()
+        return True
+
+    # --- rolling windows ---------------------------------------------------
+
+    def _get(self, key: Tuple[str, int, int], now: int) -> _Series:
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(now)
+        else:
+            self._advance(series, now)
+        return series
+
+    def _advance(self, series: _Series, now: int):
+        """Roll both windows forward to now (windows cover completed weeks only)"""
+        if now <= series.as_of:
+            return
+        R, B = self.recent_weeks, self.baseline_weeks
+        if now - series.as_of >= R + B:
+            for week in [w for w in series.weeks if w < now - R - B]:
+                del series.weeks[week]
+            series.recent = sum(c for w, c in series.weeks.items() if now - R <= w < now)
+            series.baseline = sum(c for w, c in series.weeks.items() if now - R - B <= w < now - R)
+        else:
+            for step in range(series.as_of + 1, now + 1):
+                entering = series.weeks.get(step - 1, 0)        # newly completed week
+                crossing = series.weeks.get(step - 1 - R, 0)    # recent -> baseline
+                leaving = series.weeks.pop(step - 1 - R - B, 0)  # drops out of baseline
+                series.recent += entering - crossing
+                series.baseline += crossing - leaving
+        series.as_of = now
+
+    def _add(self, series: _Series, week: int, count: int):
+        now = series.as_of
+        R, B = self.recent_weeks, self.baseline_weeks
+        if week < now - R - B:
+            return  # older than both windows: history only, kept on disk
+        series.weeks[week] = series.weeks.get(week, 0) + count
+        if now - R <= week < now:
+            series.recent += count
+        elif now - R - B <= week < now - R:
+            series.baseline += count
+
+    # --- updates -------------------------------------------------------------
+
+    def add_sightings(self, sightings: Iterable[Sighting]) -> int:
+        """Count new sightings (gbifIDs seen before are skipped); returns how many were added"""
+        now = self.now()
+        weekly: Dict[Tuple[str, int, int, int], int] = {}
+        with self._lock, self._db:
+            for gbif_id, species, lat, lon, day in sightings:
+                if gbif_id is not None:
+                    cursor = self._db.execute("INSERT OR IGNORE INTO seen VALUES (?)", (gbif_id,))
+                    if cursor.rowcount == 0:
+                        continue
+                try:
+                    week = week_of(day)
+                except ValueError:
+                    continue
+                key = (normalize_species(species), cell_index(lat), cell_index(lon), week)
+                weekly[key] = weekly.get(key, 0) + 1
+            self._db.executemany(
+                "INSERT INTO weekly VALUES (?, ?, ?, ?, ?) ON CONFLICT (species, cell_y, cell_x, week)"
+                " DO UPDATE SET count = count + excluded.count",
+                [(*key, count) for key, count in weekly.items()],
+            )
+            for (species, cell_y, cell_x, week), count in weekly.items():
+                self._species.add(species)
+                self._add(self._get((species, cell_y, cell_x), now), week, count)
+            self._writes += 1
+        return sum(weekly.values())
+
+    def add_gbif_results(self, results: Iterable[dict]) -> int:
+        return self.add_sightings(sightings_from_gbif(results))
+
+    def extend_region(self, bbox: Tuple[float, float, float, float]):
+        """Mark bbox as fully covered (trend lookups there no longer need GBIF)"""
+        region = self._region
+        if region is not None:
+            bbox = (min(region[0], bbox[0]), min(region[1], bbox[1]),
+                    max(region[2], bbox[2]), max(region[3], bbox[3]))
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('region', ?)", (json.dumps(list(bbox)),))
+        self._region = tuple(bbox)
+
+    # --- lookups -------------------------------------------------------------
+
+    @property
+    def region(self) -> Optional[Tuple[float, float, float, float]]:
+        return self._region
+
+    def covers(self, lat: float, lon: float) -> bool:
+        region = self._region
+        return region is not None and region[0] <= lat <= region[2] and region[1] <= lon <= region[3]
+
+    def has_species(self, species: str) -> bool:
+        """True if the series ever counted the species (a zero trend is then real absence)"""
+        return normalize_species(species) in self._species
+
+    def trend(self, species: str, lat: float, lon: float, radius_km: float) -> dict:
+        """
+        Recent and baseline counts of the cells whose centres lie within
+        radius_km (at least the cell containing the point), their weekly
+        rates and the recent / baseline rate ratio.
+        """
+        now = self.now()
+        species = normalize_species(species)
+        dlat = radius_km / KM_PER_DEG
+        lon_scale = KM_PER_DEG * max(math.cos(math.radians(lat)), 1e-6)
+        dlon = radius_km / lon_scale
+        own = (cell_index(lat), cell_index(lon))
+        recent = baseline = 0
+        with self._lock:
+            for cell_y in range(cell_index(lat - dlat), cell_index(lat + dlat) + 1):
+                for cell_x in range(cell_index(lon - dlon), cell_index(lon + dlon) + 1):
+                    series = self._series.get((species, cell_y, cell_x))
+                    if series is None:
+                        continue
+                    dy = ((cell_y + 0.5) * CELL_DEG - lat) * KM_PER_DEG
+                    dx = ((cell_x + 0.5) * CELL_DEG - lon) * lon_scale
+                    if (cell_y, cell_x) != own and dy * dy + dx * dx > radius_km * radius_km:
+                        continue
+                    self._advance(series, now)
+                    recent += series.recent
+                    baseline += series.baseline
+        recent_rate = recent / self.recent_weeks
+        # At least one baseline sighting, as the count scorer's max(historical, 1)
+        baseline_rate = max(baseline, 1) / self.baseline_weeks
+        return {
+            "recent": recent,
+            "baseline": baseline,
+            "recent_per_week": round(recent_rate, 4),
+            "baseline_per_week": round(baseline / self.baseline_weeks, 4),
+            "trend_ratio": recent_rate / baseline_rate,
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            series = len(self._series)
+            species = len({key[0] for key in self._series})
+        return {
+            "path": self.path,
+            "region": self._region,
+            "series": series,
+            "species": species,
+            "recent_weeks": self.recent_weeks,
+            "baseline_weeks": self.baseline_weeks,
+            "sightings_seen": self._db.execute("SELECT COUNT(*) FROM seen").fetchone()[0],
+            "last_pull": dict(self._db.execute(
+                "SELECT substr(key, 6), value FROM meta WHERE key LIKE 'pull:%'").fetchall()),
+        }
+
+
+# --- feeding -----------------------------------------------------------------
+
+def ingest_files(series: SightingSeries, paths: List[str],
+                 bbox: Optional[Tuple[float, float, float, float]]) -> int:
+    """GBIF simple CSV / DwC-A downloads (same formats as occurrence_store.py)"""
+    total = 0
+    for path in paths:
+        records = _records(_iter_rows(path), bbox)
+        added = series.add_sightings(
+            (gbif_id, species, lat, lon, day) for gbif_id, species, _, lat, lon, _, _, day in records if day
+        )
+        print(f"{path}: {added} sightings")
+        total += added
+    if bbox:
+        series.extend_region(bbox)
+    return total
+
+
+def backfill(series: SightingSeries, occurrences_db: str) -> int:
+    """Everything in an occurrence store, covering the store's region"""
+    from occurrence_store import OccurrenceStore
+
+    store = OccurrenceStore(occurrences_db, readonly=True)
+    cursor = store.connection.execute(
+        "SELECT gbif_id, species, lat, lon, event_date FROM occurrences WHERE event_date IS NOT NULL")
+    total = 0
+    while True:
+        rows = cursor.fetchmany(10000)
+        if not rows:
+            break
+        total += series.add_sightings(rows)
+    if store.region:
+        series.extend_region(store.region)
+    return total
+
+
+async def pull(series: SightingSeries, species: str, bbox: Tuple[float, float, float, float]) -> int:
+    """Records GBIF indexed since the last pull for this species / bbox, newest windows only"""
+    from gbif_client import GBIFClient
+
+    key = f"pull:{normalize_species(species)}:{','.join(map(str, bbox))}"
+    row = series._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    started = date.today().isoformat()
+    since = (date.today() - timedelta(weeks=series.window_weeks + 1)).isoformat()
+    params = {
+        "scientificName": species,
+        "decimalLatitude": f"{bbox[0]},{bbox[2]}",
+        "decimalLongitude": f"{bbox[1]},{bbox[3]}",
+        "eventDate": f"{since},*",
+        "limit": PULL_PAGE_SIZE,
+    }
+    if row:
+        params["lastInterpreted"] = f"{row[0]},*"
+    client = GBIFClient()
+    added = 0
+    try:
+        offset = 0
+        while offset < PULL_MAX_RECORDS:
+            page = await client.get_json("occurrence/search", {**params, "offset": offset})
+            added += series.add_gbif_results(page.get("results", []))
+            offset += PULL_PAGE_SIZE
+            if page.get("endOfRecords", True):
+                break
+    finally:
+        await client.aclose()
+    with series._db:
+        series._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, started))
+    return added
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="BioSentinel weekly sighting series")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest = sub.add_parser("ingest", help="Count sightings from GBIF CSV / DwC-A downloads")
+    ingest.add_argument("files", nargs="+")
+    ingest.add_argument("--bbox", type=_parse_bbox, default=GANGETIC_PLAIN_BBOX,
+                        help="minLat,minLon,maxLat,maxLon (default: Gangetic plain)")
+
+    fill = sub.add_parser("backfill", help="Count everything in an occurrence store")
+    fill.add_argument("--occurrences", default=os.getenv("OCCURRENCE_DB", "occurrences.db"))
+
+    fetch = sub.add_parser("pull", help="Fetch records GBIF indexed since the last pull")
+    fetch.add_argument("--species", action="append", required=True)
+    fetch.add_argument("--bbox", type=_parse_bbox, default=GANGETIC_PLAIN_BBOX)
+
+    sub.add_parser("stats", help="Show series contents")
+
+    for command in sub.choices.values():
+        command.add_argument("--db", default=os.getenv("SIGHTING_SERIES_DB", "series.db"))
+    args = parser.parse_args(argv)
+
+    series = SightingSeries(args.db)
+    if args.command == "ingest":
+        ingest_files(series, args.files, args.bbox)
+    elif args.command == "backfill":
+        print(f"{args.occurrences}: {backfill(series, args.occurrences)} sightings")
+    elif args.command == "pull":
+        for species in args.species:
+            print(f"{species}: {asyncio.run(pull(series, species, args.bbox))} new sightings")
+    print(json.dumps(series.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Offline taxonomy index for species search and name resolution.
+
+Built once from the GBIF backbone (DwC-A with Taxon.tsv / VernacularName.tsv)
+and optionally an IUCN Red List export (assessments.csv), into SQLite:
+
+    python taxonomy_index.py build --backbone backbone.zip --iucn assessments.csv \\
+        --kingdom Animalia --languages en --out taxonomy.db
+
+Every canonical name, synonym and vernacular name becomes a row pointing at
+its accepted taxon key. At startup the normalised names are loaded as one
+sorted array, so exact resolution and prefix autocomplete are a bisect plus
+a short scan. Fuzzy matching uses character trigrams: posting lists are
+precomputed at build time, stored as int32 blobs and read on demand, and
+candidates are ranked by trigram similarity (as pg_trgm does).
+"""
+import argparse
+import csv
+import io
+import os
+import sqlite3
+import sys
+import threading
+import unicodedata
+import zipfile
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+KIND_RANK = {"canonical": 0, "synonym": 1, "vernacular": 2}
+PREFIX_SCAN_LIMIT = 2000   # names examined per autocomplete query
+FUZZY_POSTING_BUDGET = 50000    # ids gathered per fuzzy query, rarest trigrams first
+POSTING_CACHE_SIZE = 50000     # trigram posting lists kept in memory
+FUZZY_MIN_SIMILARITY = float(os.getenv("TAXONOMY_FUZZY_MIN", "0.4"))
+IUCN_CODES = {
+    "extinct": "EX", "extinct in the wild": "EW", "critically endangered": "CR",
+    "endangered": "EN", "vulnerable": "VU", "near threatened": "NT",
+    "least concern": "LC", "data deficient": "DD",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS taxa (
+    key INTEGER PRIMARY KEY,
+    scientific_name TEXT,
+    canonical_name TEXT,
+    rank TEXT,
+    kingdom TEXT,
+    family TEXT,
+    iucn TEXT
+);
+CREATE TABLE IF NOT EXISTS names (
+    id INTEGER PRIMARY KEY,     -- position in normalised sort order
+    norm TEXT NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,         -- canonical / synonym / vernacular
+    key INTEGER NOT NULL        -- accepted taxon key
+);
+CREATE TABLE IF NOT EXISTS trigrams (
+    gram TEXT PRIMARY KEY,
+    ids BLOB NOT NULL           -- int32 name ids, ascending
+);
+"""
+
+
+def normalize_name(name: str) -> str:
+    """Lower case, accents stripped, punctuation to spaces, single-spaced"""
+    decomposed = unicodedata.normalize("NFKD", name)
+    chars = [c.lower() if c.isalnum() else " " for c in decomposed if not unicodedata.combining(c)]
+    return " ".join("".join(chars).split())
+
+
+def trigrams(norm: str) -> set:
+    padded = f"  {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Taxon(NamedTuple):
+    key: int
+    scientific_name: str
+    canonical_name: str
+    rank: str
+    kingdom: str
+    family: str
+    iucn: Optional[str]
+
+
+class Match(NamedTuple):
+    taxon: Taxon
+    name: str          # the name that matched
+    kind: str          # canonical / synonym / vernacular
+    match_type: str    # EXACT / PREFIX / FUZZY
+    confidence: int    # 0-100
+
+
+class TaxonomyIndex:
+    """Sorted name array + trigram postings over a built taxonomy database"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._postings: Dict[str, np.ndarray] = {}
+        # Connections must not cross fork (gunicorn preload); children open their own
+        os.register_at_fork(after_in_child=self._reset_connections)
+        conn = self.connection
+        self.taxa = {row[0]: Taxon(*row) for row in conn.execute(
+            "SELECT key, scientific_name, canonical_name, rank, kingdom, family, iucn FROM taxa")}
+        self.norms: List[str] = []
+        self.names: List[str] = []
+        self.kinds: List[str] = []
+        self.keys: List[int] = []
+        for norm, name, kind, key in conn.execute("SELECT norm, name, kind, key FROM names ORDER BY id"):
+            self.norms.append(norm)
+            self.names.append(name)
+            self.kinds.append(kind)
+            self.keys.append(key)
+
+    @classmethod
+    def open_if_configured(cls) -> Optional["TaxonomyIndex"]:
+        """Index from TAXONOMY_DB, or None when unset/missing"""
+        path = os.getenv("TAXONOMY_DB")
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            index = cls(path)
+            print(f"[OK] Taxonomy index: {path} ({len(index.taxa)} taxa, {len(index.norms)} names)")
+            return index
+        except sqlite3.Error as e:
+            print(f"[ERROR] Failed to open taxonomy index: {e}")
+            return None
+
+    def _reset_connections(self):
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def _match(self, i: int, match_type: str, confidence: int) -> Match:
+        return Match(self.taxa[self.keys[i]], self.names[i], self.kinds[i], match_type, confidence)
+
+    def resolve(self, name: str) -> Optional[Match]:
+        """Exact (normalised) canonical, synonym or vernacular name -> accepted taxon"""
+        norm = normalize_name(name)
+        i = bisect_left(self.norms, norm)
+        best = None
+        while i < len(self.norms) and self.norms[i] == norm:
+            if best is None or KIND_RANK[self.kinds[i]] < KIND_RANK[self.kinds[best]]:
+                best = i
+            i += 1
+        return None if best is None else self._match(best, "EXACT", 100)
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Match]:
+        """Taxa with a name starting with prefix; canonical names first, then shorter names"""
+        norm = normalize_name(prefix)
+        if not norm:
+            return []
+        start = bisect_left(self.norms, norm)
+        best: Dict[int, int] = {}  # taxon key -> name index
+        for i in range(start, min(start + PREFIX_SCAN_LIMIT, len(self.norms))):
+            if not self.norms[i].startswith(norm):
+                break
+            current = best.get(self.keys[i])
+            if current is None or KIND_RANK[self.kinds[i]] < KIND_RANK[self.kinds[current]]:
+                best[self.keys[i]] = i
+        ranked = sorted(best.values(), key=lambda i: (self.norms[i] != norm, KIND_RANK[self.kinds[i]],
+                                                      len(self.norms[i]), self.norms[i]))
+        return [self._match(i, "EXACT" if self.norms[i] == norm else "PREFIX",
+                            100 if self.norms[i] == norm else 90) for i in ranked[:limit]]
+
+    def _posting(self, gram: str) -> Optional[np.ndarray]:
+        if gram in self._postings:
+            return self._postings[gram]
+        row = self.connection.execute("SELECT ids FROM trigrams WHERE gram = ?", (gram,)).fetchone()
+        posting = np.frombuffer(row[0], dtype=np.int32) if row else None
+        if len(self._postings) > POSTING_CACHE_SIZE:
+            self._postings.clear()
+        self._postings[gram] = posting
+        return posting
+
+    def fuzzy(self, name: str, limit: int = 10, min_similarity: float = FUZZY_MIN_SIMILARITY) -> List[Match]:
+        """Closest names by trigram similarity (|shared| / |union|), best first, one per taxon"""
+        norm = normalize_name(name)
+        grams = trigrams(norm)
+        postings = sorted((p for p in map(self._posting, grams) if p is not None), key=len)
+        if not postings:
+            return []
+        # Rarest trigrams carry the signal; very common ones only add candidates
+        chosen, total = [], 0
+        for posting in postings:
+            if chosen and total + len(posting) > FUZZY_POSTING_BUDGET:
+                break
+            chosen.append(posting)
+            total += len(posting)
+        # Count only the candidate ids, never an array the size of the name table
+        top, shared = np.unique(np.concatenate(chosen), return_counts=True)
+        shortlist = max(limit * 20, 50)
+        if len(top) > shortlist:
+            # Counts are small integers with many ties: cut at the count where the
+            # shortlist fills (a histogram, cheaper than argpartition here)
+            at_least = np.cumsum(np.bincount(shared)[::-1])[::-1]
+            threshold = int(np.flatnonzero(at_least >= shortlist)[-1])
+            above = top[shared > threshold]
+            top = np.concatenate([above, top[shared == threshold][:shortlist - len(above)]])
+
+        scored = []
+        for i in top.tolist():
+            other = trigrams(self.norms[i])
+            similarity = len(grams & other) / len(grams | other)
+            if similarity >= min_similarity:
+                scored.append((similarity, i))
+        scored.sort(key=lambda x: (-x[0], KIND_RANK[self.kinds[x[1]]], len(self.norms[x[1]])))
+        matches, seen = [], set()
+        for similarity, i in scored:
+            if self.keys[i] in seen:
+                continue
+            seen.add(self.keys[i])
+            matches.append(self._match(i, "FUZZY", int(round(similarity * 100))))
+            if len(matches) == limit:
+                break
+        return matches
+
+    def search(self, q: str, limit: int = 10) -> List[Match]:
+        """
+        Autocomplete, falling back to fuzzy matches when nothing starts with q
+        (async callers: complete() is microseconds, run fuzzy() in a thread)
+        """
+        return self.complete(q, limit) or self.fuzzy(q, limit)
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "taxa": len(self.taxa),
+            "names": len(self.norms),
+            "cached_trigrams": len(self._postings),
+        }
+
+
+# --- build -------------------------------------------------------------------
+
+def _tsv(archive: zipfile.ZipFile, suffix: str) -> Iterator[dict]:
+    member = next((n for n in archive.namelist() if n.endswith(suffix)), None)
+    if member is None:
+        return
+    csv.field_size_limit(sys.maxsize)
+    with io.TextIOWrapper(archive.open(member), encoding="utf-8", newline="") as stream:
+        yield from csv.DictReader(stream, delimiter="\t", quoting=csv.QUOTE_NONE)
+
+
+def _iucn_categories(path: str) -> Dict[str, str]:
+    """normalised scientific name -> IUCN code from a Red List assessments/summary CSV"""
+    categories = {}
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            name = row.get("scientificName") or row.get("scientific_name") or ""
+            category = (row.get("redlistCategory") or row.get("category") or "").strip()
+            code = IUCN_CODES.get(category.lower(), category.upper() if len(category) == 2 else None)
+            if name and code:
+                categories[normalize_name(name)] = code
+    return categories
+
+
+def build(backbone: str, out: str, iucn: Optional[str] = None, kingdoms: Optional[List[str]] = None,
+          ranks: Optional[List[str]] = None, languages: Optional[List[str]] = None) -> dict:
+    """Write a taxonomy database from a GBIF backbone archive (and IUCN export)"""
+    kingdoms = {k.lower() for k in kingdoms or []}
+    ranks = {r.lower() for r in ranks or ["species"]}
+    languages = {l.lower() for l in languages or []}
+    categories = _iucn_categories(iucn) if iucn else {}
+
+    archive = zipfile.ZipFile(backbone)
+    taxa, synonyms = {}, []
+    for row in _tsv(archive, "Taxon.tsv"):
+        if kingdoms and (row.get("kingdom") or "").lower() not in kingdoms:
+            continue
+        if (row.get("taxonRank") or "").lower() not in ranks:
+            continue
+        key = int(row["taxonID"])
+        canonical = row.get("canonicalName") or row.get("scientificName") or ""
+        status = (row.get("taxonomicStatus") or "").lower()
+        if status == "accepted":
+            taxa[key] = (key, row.get("scientificName") or canonical, canonical, row.get("taxonRank"),
+                         row.get("kingdom"), row.get("family"), categories.get(normalize_name(canonical)))
+        elif "synonym" in status and row.get("acceptedNameUsageID"):
+            synonyms.append((canonical, int(row["acceptedNameUsageID"])))
+
+    names = [(canonical, "canonical", key) for key, (_, _, canonical, *_rest) in taxa.items()]
+    names += [(name, "synonym", key) for name, key in synonyms if key in taxa]
+    # An IUCN category listed under a synonym still applies to the accepted taxon
+    for name, key in synonyms:
+        code = categories.get(normalize_name(name))
+        if key in taxa and code and not taxa[key][6]:
+            taxa[key] = taxa[key][:6] + (code,)
+    for row in _tsv(archive, "VernacularName.tsv"):
+        if languages and (row.get("language") or "").lower() not in languages:
+            continue
+        key = int(row["taxonID"])
+        if key in taxa and row.get("vernacularName"):
+            names.append((row["vernacularName"], "vernacular", key))
+
+    rows = sorted({(normalize_name(name), name, kind, key) for name, kind, key in names if normalize_name(name)})
+    postings = defaultdict(list)
+    for i, (norm, *_rest) in enumerate(rows):
+        for gram in trigrams(norm):
+            postings[gram].append(i)
+
+    if os.path.exists(out):
+        os.remove(out)
+    conn = sqlite3.connect(out)
+    with conn:
+        conn.executescript(SCHEMA)
+        conn.executemany("INSERT INTO taxa VALUES (?, ?, ?, ?, ?, ?, ?)", taxa.values())
+        conn.executemany("INSERT INTO names VALUES (?, ?, ?, ?, ?)",
+                         ((i, *row) for i, row in enumerate(rows)))
+        conn.executemany("INSERT INTO trigrams VALUES (?, ?)",
+                         ((gram, np.asarray(ids, dtype=np.int32).tobytes()) for gram, ids in postings.items()))
+    conn.execute("VACUUM")
+    conn.close()
+    return {"taxa": len(taxa), "names": len(rows), "trigrams": len(postings),
+            "iucn_assessed": sum(1 for t in taxa.values() if t[6])}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="BioSentinel offline taxonomy index")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    make = sub.add_parser("build", help="Build from a GBIF backbone archive")
+    make.add_argument("--backbone", required=True, help="GBIF backbone DwC-A (backbone.zip)")
+    make.add_argument("--iucn", help="IUCN Red List assessments.csv")
+    make.add_argument("--kingdom", action="append", help="Keep only these kingdoms (repeatable)")
+    make.add_argument("--rank", action="append", help="Taxon ranks to index (default: species)")
+    make.add_argument("--languages", default="en", help="Vernacular name languages, comma separated ('' = all)")
+    make.add_argument("--out", default=os.getenv("TAXONOMY_DB", "taxonomy.db"))
+
+    query = sub.add_parser("search", help="Try a query against a built index")
+    query.add_argument("q")
+    query.add_argument("--db", default=os.getenv("TAXONOMY_DB", "taxonomy.db"))
+    query.add_argument("--limit", type=int, default=10)
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        languages = [l.strip() for l in args.languages.split(",") if l.strip()]
+        print(build(args.backbone, args.out, args.iucn, args.kingdom, args.rank, languages))
+    else:
+        index = TaxonomyIndex(args.db)
+        for match in index.search(args.q, args.limit):
+            print(f"{match.match_type:6s} {match.confidence:3d}  {match.name!r} ({match.kind}) -> "
+                  f"{match.taxon.key} {match.taxon.canonical_name} {match.taxon.iucn or ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Background precompute of risk results for a fixed watchlist.
+
+The alert flow asks the same species x location questions over and over,
+and the answers change at most daily. WatchlistScheduler recomputes every
+watchlist item on a jittered interval, from an asyncio task started in the
+app lifespan. Item starts are spaced (rate_per_s) and capped (concurrency),
+so a cycle never bursts GBIF. Each finished cycle is published as a new
+immutable snapshot in a single assignment; readers take the current
+snapshot with one dict lookup and never see a half-built cycle. Items that
+fail in a cycle keep their previous result (and its age).
+
+With several workers only one computes: the process holding an exclusive
+lock on WATCHLIST_SNAPSHOT + ".lock" runs the cycles and writes each
+snapshot to WATCHLIST_SNAPSHOT (atomic rename). The other workers reload
+that file when it changes and take over the lock if the leader exits.
+"""
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, NamedTuple, Optional
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): every process computes its own snapshot
+    fcntl = None
+
+DEFAULT_INTERVAL_S = float(os.getenv("WATCHLIST_INTERVAL_S", str(6 * 3600)))
+DEFAULT_JITTER = float(os.getenv("WATCHLIST_JITTER", "0.1"))      # +/- fraction of the interval
+DEFAULT_RATE_PER_S = float(os.getenv("WATCHLIST_RATE_PER_S", "2"))  # item starts per second
+DEFAULT_CONCURRENCY = int(os.getenv("WATCHLIST_CONCURRENCY", "4"))
+DEFAULT_START_DELAY_S = float(os.getenv("WATCHLIST_START_DELAY_S", "5"))
+DEFAULT_MAX_AGE_S = float(os.getenv("WATCHLIST_MAX_AGE_S", str(2 * DEFAULT_INTERVAL_S)))
+DEFAULT_SNAPSHOT_PATH = os.getenv("WATCHLIST_SNAPSHOT") or os.path.join(
+    tempfile.gettempdir(), "biosentinel-watchlist.json")
+DEFAULT_FOLLOW_S = float(os.getenv("WATCHLIST_FOLLOW_S", "30"))  # follower reload / takeover check
+
+# Ganga main stem sampling points (CPCB monitoring stations), source to delta
+GANGA_STRETCH_POINTS = [
+    {"name": "Haridwar", "lat": 29.9457, "lon": 78.1642},
+    {"name": "Kanpur", "lat": 26.4475, "lon": 80.4456},
+    {"name": "Allahabad", "lat": 25.4358, "lon": 81.8464},
+    {"name": "Varanasi", "lat": 25.3176, "lon": 83.0103},
+    {"name": "Patna", "lat": 25.5941, "lon": 85.1376},
+    {"name": "Kolkata", "lat": 22.5726, "lon": 88.3639},
+]
+
+
+def load_points(path: Optional[str] = None) -> List[dict]:
+    """Watch points from WATCHLIST_POINTS_FILE ([{"name", "lat", "lon"}, ...]) or the Ganga stretch"""
+    path = path or os.getenv("WATCHLIST_POINTS_FILE")
+    if not path:
+        return GANGA_STRETCH_POINTS
+    try:
+        with open(path) as f:
+            return [{"name": p.get("name"), "lat": float(p["lat"]), "lon": float(p["lon"])} for p in json.load(f)]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"[ERROR] Bad watchlist points file {path}: {e}; using the Ganga stretch")
+        return GANGA_STRETCH_POINTS
+
+
+class Entry(NamedTuple):
+    result: dict
+    computed_at: float  # time.time()
+
+
+def _to_key(value):
+    """JSON lists back to the (nested) tuple keys they were written from"""
+    return tuple(_to_key(v) for v in value) if isinstance(value, list) else value
+
+
+class WatchlistScheduler:
+    """Periodic recompute of keyed results into an atomically swapped snapshot"""
+
+    def __init__(self, items: List[Hashable], compute: Callable[[Hashable], Awaitable[dict]],
+                 interval_s: float = DEFAULT_INTERVAL_S, jitter: float = DEFAULT_JITTER,
+                 rate_per_s: float = DEFAULT_RATE_PER_S, concurrency: int = DEFAULT_CONCURRENCY,
+                 start_delay_s: float = DEFAULT_START_DELAY_S, max_age_s: float = DEFAULT_MAX_AGE_S,
+                 snapshot_path: Optional[str] = DEFAULT_SNAPSHOT_PATH, follow_s: float = DEFAULT_FOLLOW_S):
+        self.items = list(dict.fromkeys(items))
+        self.compute = compute
+        self.interval_s = interval_s
+        self.jitter = max(0.0, min(jitter, 1.0))
+        self.rate_per_s = rate_per_s
+        self.concurrency = max(1, concurrency)
+        self.start_delay_s = start_delay_s
+        self.max_age_s = max_age_s
+        self.snapshot: Dict[Hashable, Entry] = {}
+        self.cycles = 0
+        self.failures = 0
+        self.last_cycle_s = None
+        self.last_cycle_at = None
+        self.next_cycle_at = None
+        self.snapshot_path = snapshot_path
+        self.follow_s = follow_s
+        self.role = None  # "leader" computes, "follower" reads the leader's snapshot file
+        self._lock_file = None
+        self._snapshot_mtime = None
+        self._task = None
+
+    def get(self, key: Hashable) -> Optional[Entry]:
+        """Current entry for key if it is fresh enough to serve"""
+        entry = self.snapshot.get(key)
+        if entry is None or time.time() - entry.computed_at > self.max_age_s:
+            return None
+        return entry
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    # --- shared snapshot file --------------------------------------------------
+
+    def _try_lead(self) -> bool:
+        """Take the leader lock if no other process holds it"""
+        if fcntl is None or not self.snapshot_path:
+            return True
+        handle = open(self.snapshot_path + ".lock", "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._lock_file = handle  # held (open) for the life of the process
+        return True
+
+    def _write_snapshot(self):
+        if not self.snapshot_path:
+            return
+        payload = {"items": [[key, entry.result, entry.computed_at] for key, entry in self.snapshot.items()],
+                   "cycles": self.cycles, "last_cycle_s": self.last_cycle_s}
+        tmp = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(payload, f)
+            os.replace(tmp, self.snapshot_path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"[WARNING] Could not write watchlist snapshot: {e}")
+
+    def _read_snapshot(self) -> bool:
+        """Load the leader's snapshot file if it changed; True when loaded"""
+        try:
+            mtime = os.stat(self.snapshot_path).st_mtime
+            if mtime == self._snapshot_mtime:
+                return False
+            with open(self.snapshot_path) as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return False
+        wanted = set(self.items)
+        self.snapshot = {key: Entry(result, computed_at) for key, result, computed_at in
+                         ((_to_key(k), r, t) for k, r, t in payload.get("items", [])) if key in wanted}
+        self.cycles = payload.get("cycles", self.cycles)
+        self.last_cycle_s = payload.get("last_cycle_s")
+        self._snapshot_mtime = mtime
+        return True
+
+    # --- compute ---------------------------------------------------------------
+
+    async def refresh(self):
+        """One cycle over every item; publishes a new snapshot when done"""
+        started = time.perf_counter()
+        previous = self.snapshot
+        fresh: Dict[Hashable, Entry] = {}
+        skipped = set()
+        limit = asyncio.Semaphore(self.concurrency)
+        spacing = 1.0 / self.rate_per_s if self.rate_per_s > 0 else 0.0
+
+        async def run(key: Hashable):
+            async with limit:
+                try:
+                    result = await self.compute(key)
+                    if result is None:
+                        skipped.add(key)  # nothing worth caching (e.g. simulated data)
+                    else:
+                        fresh[key] = Entry(result, time.time())
+                except Exception as e:
+                    self.failures += 1
+                    print(f"[WARNING] Watchlist item {key} failed: {e}")
+
+        tasks = []
+        # Shuffled so a slow or failing item does not always delay the same ones
+        for key in random.sample(self.items, len(self.items)):
+            tasks.append(asyncio.ensure_future(run(key)))
+            if spacing:
+                await asyncio.sleep(spacing)
+        await asyncio.gather(*tasks)
+
+        # Failed items keep their last good result
+        self.snapshot = {key: fresh.get(key) or previous[key]
+                         for key in self.items if key in fresh or (key in previous and key not in skipped)}
+        self.cycles += 1
+        self.last_cycle_s = round(time.perf_counter() - started, 2)
+        self.last_cycle_at = time.time()
+        self._write_snapshot()
+
+    async def _follow(self):
+        """Reload the leader's snapshot file until the lock frees up"""
+        self.role = "follower"
+        while not self._try_lead():
+            self._read_snapshot()
+            await asyncio.sleep(self._jittered(self.follow_s))
+        self.role = "leader"
+
+    async def _run(self):
+        if self._try_lead():
+            self.role = "leader"
+        else:
+            await self._follow()
+        # Serve the previous leader's (or previous run's) results until the first cycle
+        if self.snapshot_path:
+            self._read_snapshot()
+        await asyncio.sleep(self._jittered(self.start_delay_s))
+        while True:
+            try:
+                await self.refresh()
+                print(f"[OK] Watchlist refreshed: {len(self.snapshot)}/{len(self.items)} items "
+                      f"in {self.last_cycle_s}s")
+            except Exception as e:
+                print(f"[ERROR] Watchlist refresh failed: {e}")
+            delay = self._jittered(self.interval_s)
+            self.next_cycle_at = time.time() + delay
+            await asyncio.sleep(delay)
+
+    def start(self):
+        if self._task is None and self.items:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def stats(self) -> dict:
+        now = time.time()
+        ages = [now - entry.computed_at for entry in self.snapshot.values()]
+        return {
+            "role": self.role,
+            "items": len(self.items),
+            "ready": len(self.snapshot),
+            "cycles": self.cycles,
+            "failures": self.failures,
+            "interval_s": self.interval_s,
+            "last_cycle_s": self.last_cycle_s,
+            "oldest_age_s": round(max(ages), 1) if ages else None,
+            "next_cycle_in_s": round(self.next_cycle_at - now, 1) if self.next_cycle_at else None,
+        }
@@ -0,0 +1,119 @@
+"""
+Resident memory per server process, from /proc/<pid>/smaps_rollup (Linux).
+
+RSS counts shared pages in every process that maps them, so N workers that
+share the model weights copy-on-write still "use" N copies by RSS. PSS
+splits each shared page between the processes mapping it, so the sum of
+PSS over the master and its workers is the real footprint:
+
+    python worker_memory.py <gunicorn-master-pid>
+    python worker_memory.py --match gbif_ml_api --json
+
+Compare a run with PRELOAD_MODEL=1 against PRELOAD_MODEL=0 (see
+gunicorn.conf.py) after sending each worker at least one image request.
+"""
+import argparse
+import json
+import os
+from typing import Dict, List
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Swap")
+
+
+def _read_smaps(pid: int) -> Dict[str, int]:
+    """Summed smaps fields in kB; smaps_rollup when available, else the full smaps"""
+    totals = dict.fromkeys(FIELDS, 0)
+    for name in ("smaps_rollup", "smaps"):
+        path = f"/proc/{pid}/{name}"
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in totals and rest.strip().endswith("kB"):
+                    totals[key] += int(rest.split()[0])
+        return totals
+    raise FileNotFoundError(f"/proc/{pid}/smaps not available")
+
+
+def process_memory(pid: int) -> dict:
+    """RSS / PSS / shared / private memory of one process, in MB"""
+    kb = _read_smaps(pid)
+    mb = lambda value: round(value / 1024, 1)
+    return {
+        "pid": pid,
+        "rss_mb": mb(kb["Rss"]),
+        "pss_mb": mb(kb["Pss"]),
+        "shared_mb": mb(kb["Shared_Clean"] + kb["Shared_Dirty"]),
+        "private_mb": mb(kb["Private_Clean"] + kb["Private_Dirty"]),
+        "swap_mb": mb(kb["Swap"]),
+    }
+
+
+def _cmdline(pid: int) -> str:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().replace(b"\0", b" ").decode(errors="replace").strip()
+    except OSError:
+        return ""
+
+
+def _parent(pid: int) -> int:
+    with open(f"/proc/{pid}/stat") as f:
+        # comm may contain spaces; ppid is the second field after the closing paren
+        return int(f.read().rsplit(")", 1)[1].split()[1])
+
+
+def children(pid: int) -> List[int]:
+    result = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                if _parent(int(entry)) == pid:
+                    result.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    return sorted(result)
+
+
+def report(pids: List[int]) -> dict:
+    processes = []
+    for pid in pids:
+        try:
+            processes.append(dict(process_memory(pid), cmd=_cmdline(pid)[:80]))
+        except OSError:
+            continue
+    return {
+        "processes": processes,
+        "total_rss_mb": round(sum(p["rss_mb"] for p in processes), 1),
+        "total_pss_mb": round(sum(p["pss_mb"] for p in processes), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-worker RSS/PSS of a server process tree")
+    parser.add_argument("pid", nargs="?", type=int, help="Master pid (its children are included)")
+    parser.add_argument("--match", help="Instead of a pid, every process whose command line contains this")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.match:
+        pids = sorted(int(p) for p in os.listdir("/proc")
+                      if p.isdigit() and int(p) != os.getpid() and args.match in _cmdline(int(p)))
+    elif args.pid:
+        pids = [args.pid] + children(args.pid)
+    else:
+        parser.error("give a pid or --match")
+
+    result = report(pids)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{'pid':>8} {'rss MB':>9} {'pss MB':>9} {'shared':>9} {'private':>9}  cmd")
+    for p in result["processes"]:
+        print(f"{p['pid']:>8} {p['rss_mb']:>9} {p['pss_mb']:>9} {p['shared_mb']:>9} {p['private_mb']:>9}  {p['cmd']}")
+    print(f"{'total':>8} {result['total_rss_mb']:>9} {result['total_pss_mb']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 from fastapi import FastAPI, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 import os
+from ai.metrics import MetricsMiddleware, PROMETHEUS_CONTENT_TYPE, REGISTRY
 
 app = FastAPI()
 
@@ -15,6 +16,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency / status / in-flight metrics, served on /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Serve static files from frontend/dist
 frontend_path = os.path.join(os.path.dirname(__file__), "frontend", "dist")
 if os.path.exists(frontend_path):
@@ -28,6 +32,10 @@ async def serve_frontend():
             return HTMLResponse(content=f.read())
     return {"message": "BioSentinel API", "status": "running"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.get("/api/health")
 def health_check():
     return {"status": "healthy", "service": "BioSentinel AI"}